@@ -0,0 +1 @@
+# bench - أدوات قياس الأداء المحلية (مصدر اصطناعي + Bot API محاكي)
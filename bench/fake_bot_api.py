@@ -0,0 +1,161 @@
+# fake_bot_api.py - خادم محلي يحاكي Bot API لقياس الأداء بدون شبكة
+#
+# يحاكي زمن الاستجابة وعرض نطاق الرفع وأخطاء 429 (RetryAfter) و 403 (Forbidden)،
+# ويعرض إحصاءاته على /bench/stats ليقرأها مشغل القياس.
+#
+#   python -m bench.fake_bot_api --port 8081 --latency 0.15 --upload-mbps 40 \
+#       --rate-limit 0.01 --forbidden 0.02
+import argparse
+import asyncio
+import itertools
+import random
+import time
+import zlib
+from aiohttp import web
+
+FILE_FIELDS = {"sendVideo": "video", "sendAudio": "audio", "sendDocument": "document"}
+
+
+class FakeBotAPI:
+    """حالة الخادم المحاكي وإحصاءاته"""
+
+    def __init__(self, latency=0.15, upload_mbps=40.0, rate_limit=0.0, forbidden=0.0, retry_after=1, seed=1):
+        self.latency = latency
+        self.upload_bytes_per_second = upload_mbps * 1_000_000 / 8
+        self.rate_limit = rate_limit
+        self.forbidden = forbidden
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.message_ids = itertools.count(1)
+        self.file_ids = itertools.count(1)
+        self.started_at = time.time()
+        self.stats = {
+            "calls": {},
+            "uploads": 0,
+            "upload_bytes": 0,
+            "file_id_sends": 0,
+            "rate_limited": 0,
+            "forbidden": 0,
+            "deliveries": 0,
+        }
+
+    def is_forbidden(self, chat_id):
+        """نسبة ثابتة من المحادثات الخاصة حظرت البوت (نفس النتيجة لكل طلب)"""
+        if not self.forbidden or str(chat_id).startswith(("-", "@")):
+            return False
+        return (zlib.crc32(str(chat_id).encode()) % 10_000) / 10_000 < self.forbidden
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        self.stats["calls"][method] = self.stats["calls"].get(method, 0) + 1
+
+        params, upload_bytes = await self._read_params(request)
+        await asyncio.sleep(self.latency + upload_bytes / self.upload_bytes_per_second)
+
+        if method == "getMe":
+            return self._ok({"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"})
+
+        chat_id = params.get("chat_id", "0")
+        if self.rate_limit and self.random.random() < self.rate_limit:
+            self.stats["rate_limited"] += 1
+            return self._error(429, f"Too Many Requests: retry after {self.retry_after}",
+                               {"retry_after": self.retry_after})
+        if self.is_forbidden(chat_id):
+            self.stats["forbidden"] += 1
+            return self._error(403, "Forbidden: bot was blocked by the user")
+
+        message = {
+            "message_id": next(self.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id) if str(chat_id).lstrip("-").isdigit() else 0,
+                     "type": "channel" if str(chat_id).startswith("-") else "private"},
+        }
+        field = FILE_FIELDS.get(method)
+        if field:
+            if upload_bytes:
+                self.stats["uploads"] += 1
+                self.stats["upload_bytes"] += upload_bytes
+                file_id = f"bench-file-{next(self.file_ids)}"
+            else:
+                self.stats["file_id_sends"] += 1
+                file_id = params.get(field, "bench-file-0")
+            message[field] = {"file_id": file_id, "file_unique_id": file_id, "duration": 0}
+            if field == "video":
+                message[field].update({"width": 0, "height": 0})
+            self.stats["deliveries"] += 1
+        else:
+            message["text"] = params.get("text", "")
+        return self._ok(message)
+
+    async def _read_params(self, request):
+        """قراءة معاملات الطلب (JSON أو form أو multipart) وحجم الملف المرفوع"""
+        if request.content_type == "application/json":
+            return await request.json(), 0
+
+        params = {}
+        upload_bytes = 0
+        if request.content_type == "multipart/form-data":
+            reader = await request.multipart()
+            async for part in reader:
+                data = await part.read()
+                if part.filename:
+                    upload_bytes += len(data)
+                else:
+                    params[part.name] = data.decode(errors="replace")
+        else:
+            params = dict(await request.post())
+        return params, upload_bytes
+
+    async def handle_stats(self, request):
+        stats = dict(self.stats)
+        stats["elapsed"] = round(time.time() - self.started_at, 2)
+        return web.json_response(stats)
+
+    @staticmethod
+    def _ok(result):
+        return web.json_response({"ok": True, "result": result})
+
+    @staticmethod
+    def _error(code, description, parameters=None):
+        body = {"ok": False, "error_code": code, "description": description}
+        if parameters:
+            body["parameters"] = parameters
+        return web.json_response(body, status=code)
+
+
+def build_app(api):
+    app = web.Application(client_max_size=60 * 1024 * 1024)
+    app.router.add_get("/bench/stats", api.handle_stats)
+    app.router.add_route("*", "/bot{token}/{method}", api.handle)
+    return app
+
+
+async def serve(port, **options):
+    runner = web.AppRunner(build_app(FakeBotAPI(**options)))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    print(f"fake Bot API: http://127.0.0.1:{port}/bot", flush=True)
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Telegram Bot API stub")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.15, help="seconds added to every call")
+    parser.add_argument("--upload-mbps", type=float, default=40.0, help="simulated upload bandwidth")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--forbidden", type=float, default=0.0, help="fraction of private chats that blocked the bot")
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(serve(
+        args.port,
+        latency=args.latency,
+        upload_mbps=args.upload_mbps,
+        rate_limit=args.rate_limit,
+        forbidden=args.forbidden,
+        retry_after=args.retry_after
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# run_bench.py - قياس أداء البث من البداية للنهاية بدون شبكة
+#
+# يشغل مصدراً اصطناعياً (bench.synthetic_source) وخادم Bot API محاكياً
+# (bench.fake_bot_api) كعمليتين منفصلتين حتى لا يُحسب استهلاكهما على البوت،
+# ثم يشغل BroadcastController الحقيقي لمدة محددة ويطبع التقرير.
+#
+#   python -m bench.run_bench --duration 120 --subscribers 200 --clip-seconds 6 \
+#       --rate-limit 0.01 --forbidden 0.02 --json bench_output.json
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from aiohttp import ClientSession
+from telegram import Bot
+from python_src.config_manager import ConfigManager
+from python_src.logging_setup import setup_logging
+from python_src.streaming import BroadcastController
+from python_src.subscribers import SubscriberStore
+
+# العمليات المساعدة تُشغل بـ -m من جذر المستودع (البوت نفسه ينتقل لمجلد عمل مؤقت)
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class BenchController(BroadcastController):
+    """BroadcastController مع تسجيل زمن كل مقطع من الالتقاط حتى التسليم"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connected_at = None
+        self.latencies = []
+
+    async def _start_recorder(self, clip_duration, inherit=None):
+        run = await super()._start_recorder(clip_duration, inherit)
+        if self.connected_at is None:
+            # موضع البث 0 = بداية أول اتصال بالمصدر (مصدر -re بالزمن الحقيقي)
+            self.connected_at = time.time()
+        return run
+
+    async def _consume_clip(self, task, start, end, counter, captured_at=None):
+        sent_before = self.stats["clips_sent"]
+        await super()._consume_clip(task, start, end, counter, captured_at)
+        if self.stats["clips_sent"] > sent_before and self.connected_at is not None:
+            delivered = time.time()
+            self.latencies.append({
+                # من التقاط أول إطار في المقطع، ومن آخر إطار (زمن خط المعالجة وحده)
+                "glass_to_delivery": delivered - (self.connected_at + start),
+                "end_to_delivery": delivered - (self.connected_at + end),
+            })
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_port(port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"port {port} did not open within {timeout}s")
+
+
+async def spawn(module, *args):
+    return await asyncio.create_subprocess_exec(
+        sys.executable, "-m", module, *map(str, args),
+        stdin=asyncio.subprocess.DEVNULL,
+        cwd=REPO_ROOT
+    )
+
+
+class FFmpegMemory:
+    """أعلى مجموع VmRSS لعمليات ffmpeg التي شغلها البوت (من /proc لكل PID)
+
+    RUSAGE_CHILDREN يشمل العمليات المساعدة (Python) فلا يقيس FFmpeg وحده. العينات
+    دورية فقد تفوت عملية قصيرة جداً بين عينتين. None على أنظمة بلا /proc.
+    """
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak_kb = 0 if os.path.isdir("/proc") else None
+
+    def current_kb(self):
+        parent = os.getpid()
+        total = 0
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit():
+                continue
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    stat = f.read()
+                name, fields = stat[stat.index("(") + 1:stat.rindex(")")], stat[stat.rindex(")") + 2:].split()
+                if name != "ffmpeg" or int(fields[1]) != parent:
+                    continue
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total += int(line.split()[1])
+            except (OSError, ValueError, IndexError):
+                # العملية انتهت أثناء القراءة
+                continue
+        return total
+
+    async def sample(self):
+        if self.peak_kb is None:
+            return
+        while True:
+            self.peak_kb = max(self.peak_kb, self.current_kb())
+            await asyncio.sleep(self.interval)
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def cpu_seconds(usage):
+    return usage.ru_utime + usage.ru_stime
+
+
+async def run_bench(args):
+    """تشغيل القياس في مجلد عمل مؤقت يُحذف بعد انتهائه"""
+    home = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    os.chdir(workdir)
+    try:
+        return await measure(args, workdir)
+    finally:
+        os.chdir(home)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+async def measure(args, workdir):
+    listener = setup_logging(log_dir="logs", level="DEBUG" if args.verbose else "WARNING")
+
+    source_port, api_port = free_port(), free_port()
+    source = await spawn("bench.synthetic_source", "--port", source_port, "--size", args.size, "--rate", args.rate)
+    api = await spawn(
+        "bench.fake_bot_api", "--port", api_port,
+        "--latency", args.latency, "--upload-mbps", args.upload_mbps,
+        "--rate-limit", args.rate_limit, "--forbidden", args.forbidden
+    )
+    try:
+        await wait_for_port(source_port)
+        await wait_for_port(api_port)
+
+        config = ConfigManager(os.path.join(workdir, "config.json"))
+        for key, value in {
+            "SOURCE_URL": f"http://127.0.0.1:{source_port}/live.ts",
+            "CHANNEL_ID": "-1001",
+            "CLIP_SECONDS": args.clip_seconds,
+            "BUFFER_SIZE": args.buffer,
+            "ENCODER_PROFILE": args.profile,
+            "BOTTOM_WATERMARK_ENABLED": not args.no_watermark,
+            "LOW_LATENCY": args.low_latency,
+            "MEMORY_CLIPS": args.memory_clips,
+            "RENDITIONS": args.renditions,
+            "SEND_GLOBAL_RATE": args.global_rate,
+            "SUBSCRIBERS_DB": os.path.join(workdir, "subscribers.db"),
+        }.items():
+            config.set(key, value)
+
+        subscribers = SubscriberStore(config.get("SUBSCRIBERS_DB"))
+        for i in range(args.subscribers):
+            subscribers.add(100_000 + i)
+
+        stats = {"clips_sent": 0, "clips_failed": 0, "uptime_start": time.time()}
+        bot = Bot(token="1:bench", base_url=f"http://127.0.0.1:{api_port}/bot")
+
+        async with bot:
+            controller = BenchController(config, bot, stats, subscribers)
+            ffmpeg_memory = FFmpegMemory()
+            sampler = asyncio.create_task(ffmpeg_memory.sample())
+            cpu_start = time.process_time()
+            children_start = cpu_seconds(resource.getrusage(resource.RUSAGE_CHILDREN))
+            started = time.monotonic()
+
+            await controller.start_broadcast()
+            await asyncio.sleep(args.duration)
+            await controller.stop_broadcast()
+            sampler.cancel()
+            await asyncio.gather(sampler, return_exceptions=True)
+
+            elapsed = time.monotonic() - started
+            # المسجل وعمليات الفحص انتهت فدخل استهلاكها في RUSAGE_CHILDREN
+            children = resource.getrusage(resource.RUSAGE_CHILDREN)
+            cpu_total = (time.process_time() - cpu_start) + (cpu_seconds(children) - children_start)
+            self_usage = resource.getrusage(resource.RUSAGE_SELF)
+
+        async with ClientSession() as session:
+            async with session.get(f"http://127.0.0.1:{api_port}/bench/stats") as response:
+                api_stats = await response.json()
+    finally:
+        for process in (source, api):
+            if process.returncode is None:
+                process.terminate()
+                await process.wait()
+        listener.stop()
+
+    clips = stats["clips_sent"]
+    glass = [item["glass_to_delivery"] for item in controller.latencies]
+    pipeline = [item["end_to_delivery"] for item in controller.latencies]
+    # ru_maxrss بالكيلوبايت على Linux وبالبايت على macOS
+    rss_scale = 1 if sys.platform == "darwin" else 1024
+
+    return {
+        "config": {key: getattr(args, key) for key in (
+            "duration", "subscribers", "clip_seconds", "low_latency", "memory_clips", "profile", "renditions",
+            "latency", "upload_mbps", "rate_limit", "forbidden"
+        )},
+        "clips_sent": clips,
+        "clips_failed": stats["clips_failed"],
+        "clips_per_minute": round(clips / elapsed * 60, 2),
+        "glass_to_delivery_p50": percentile(glass, 0.5),
+        "glass_to_delivery_p95": percentile(glass, 0.95),
+        "end_to_delivery_p50": percentile(pipeline, 0.5),
+        "end_to_delivery_p95": percentile(pipeline, 0.95),
+        "end_to_delivery_mean": statistics.fmean(pipeline) if pipeline else None,
+        "cpu_seconds_per_clip": round(cpu_total / clips, 3) if clips else None,
+        "peak_rss_mb_bot": round(self_usage.ru_maxrss * rss_scale / 1048576, 1),
+        "peak_rss_mb_ffmpeg": round(ffmpeg_memory.peak_kb / 1024, 1) if ffmpeg_memory.peak_kb is not None else None,
+        "source_gaps": controller.monitor.gaps,
+        "api": api_stats,
+    }
+
+
+def print_report(report):
+    print("=" * 60)
+    for key, value in report.items():
+        if isinstance(value, float):
+            value = round(value, 3)
+        print(f"{key:>24}: {value}")
+    print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end broadcast benchmark (no network)")
+    parser.add_argument("--duration", type=float, default=120, help="seconds to broadcast")
+    parser.add_argument("--subscribers", type=int, default=100)
+    parser.add_argument("--clip-seconds", type=float, default=6)
+    parser.add_argument("--buffer", type=int, default=5)
+    parser.add_argument("--profile", default="balanced")
+    parser.add_argument("--renditions", nargs="*", default=[])
+    parser.add_argument("--no-watermark", action="store_true", help="allow the stream-copy fast path")
+    parser.add_argument("--low-latency", action="store_true", help="short GOP-aligned segments (LOW_LATENCY)")
+    parser.add_argument("--memory-clips", action="store_true", help="fMP4 over a pipe, upload from memory (MEMORY_CLIPS)")
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--rate", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.15)
+    parser.add_argument("--upload-mbps", type=float, default=40.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--forbidden", type=float, default=0.0)
+    parser.add_argument("--global-rate", type=float, default=30)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    # المسارات النسبية (--json) من مجلد التشغيل قبل الانتقال لمجلد العمل المؤقت
+    output = os.path.abspath(args.json) if args.json else None
+    report = asyncio.run(run_bench(args))
+    print_report(report)
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
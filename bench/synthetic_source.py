@@ -0,0 +1,113 @@
+# synthetic_source.py - مصدر بث مباشر اصطناعي محلي (testsrc2 + sine) عبر HTTP
+#
+# FFmpeg يولد بثاً بالزمن الحقيقي (-re) بصيغة MPEG-TS إلى stdout، وخادم aiohttp
+# يوزعه على كل عميل متصل بـ /live.ts (بدءاً من اللحظة الحالية كأي بث حي)،
+# فيمكن للمسجل إعادة الاتصال وفتح اتصال بديل كما مع مصدر حقيقي.
+#
+#   python -m bench.synthetic_source --port 8090 --size 1280x720 --rate 30
+import argparse
+import asyncio
+from aiohttp import web
+
+# حزم TS كاملة في كل قراءة
+CHUNK_SIZE = 188 * 64
+
+
+def source_command(size="1280x720", rate=30, video_kbps=2500):
+    """أمر FFmpeg لمصدر H.264/AAC بالزمن الحقيقي"""
+    return [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-re",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={rate}",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+        "-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency",
+        "-b:v", f"{video_kbps}k", "-g", str(rate * 2), "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "128k",
+        "-f", "mpegts", "pipe:1"
+    ]
+
+
+class SyntheticSource:
+    """يشغل المولد ويوزع مخرجه على عملاء HTTP"""
+
+    def __init__(self, size="1280x720", rate=30, video_kbps=2500):
+        self.command = source_command(size, rate, video_kbps)
+        self.clients = set()
+        self.process = None
+        self.bytes_out = 0
+        self._pump_task = None
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE
+        )
+        self._pump_task = asyncio.create_task(self._pump())
+
+    async def _pump(self):
+        while True:
+            chunk = await self.process.stdout.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            for client in list(self.clients):
+                # عميل بطيء يفقد البيانات بدل إبطاء البقية (كمصدر حي حقيقي)
+                if client.qsize() < 512:
+                    client.put_nowait(chunk)
+        for client in list(self.clients):
+            client.put_nowait(b"")
+
+    async def handle_live(self, request):
+        response = web.StreamResponse(headers={"Content-Type": "video/mp2t"})
+        await response.prepare(request)
+        client = asyncio.Queue()
+        self.clients.add(client)
+        try:
+            while True:
+                chunk = await client.get()
+                if not chunk:
+                    break
+                await response.write(chunk)
+                self.bytes_out += len(chunk)
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            self.clients.discard(client)
+        return response
+
+    async def stop(self):
+        if self.process and self.process.returncode is None:
+            self.process.terminate()
+            await self.process.wait()
+
+
+async def serve(port, size, rate, video_kbps):
+    source = SyntheticSource(size, rate, video_kbps)
+    await source.start()
+
+    app = web.Application()
+    app.router.add_get("/live.ts", source.handle_live)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    print(f"synthetic source: http://127.0.0.1:{port}/live.ts ({size}@{rate})", flush=True)
+
+    try:
+        await source.process.wait()
+    finally:
+        await source.stop()
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local synthetic live source")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--rate", type=int, default=30)
+    parser.add_argument("--video-kbps", type=int, default=2500)
+    args = parser.parse_args()
+    asyncio.run(serve(args.port, args.size, args.rate, args.video_kbps))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,29 @@
 # bot_commands.py - أوامر البوت
-import asyncio
 import time
 from telegram import Update
 from telegram.ext import ContextTypes
+from python_src.video_processor import DEFAULT_TIER, ENCODER_PROFILES
 
 class BotCommands:
-    def __init__(self, config, stats, active_users, broadcast_controller):
+    def __init__(self, config, stats, subscribers, broadcast_controller, sessions=None):
         self.config = config
         self.stats = stats
-        self.active_users = active_users
+        self.subscribers = subscribers
         self.broadcast_controller = broadcast_controller
+        self.sessions = sessions
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not update.effective_user or not update.message:
             return
 
         user_id = str(update.effective_user.id)
-        if user_id not in self.active_users:
-            self.active_users.append(user_id)
+        self.subscribers.add(user_id)
 
         status = "🟢 يعمل" if self.broadcast_controller.is_running() else "🔴 متوقف"
         await update.message.reply_text(
             f"✅ أهلاً بك\n\n"
             f"البث: {status}\n"
-            f"المشتركين: {len(self.active_users)}\n\n"
+            f"المشتركين: {len(self.subscribers)}\n\n"
             f"/help - عرض الأوامر"
         )
     
@@ -43,13 +43,12 @@ class BotCommands:
 
         await update.message.reply_text("🎬 جاري بدء البث الذكي...")
         
-        # بدء البث
-        asyncio.create_task(self.broadcast_controller.start_broadcast())
-        await asyncio.sleep(2)
+        # بدء البث (تُنشأ مهامه في الخلفية)
+        await self.broadcast_controller.start_broadcast()
         
         await update.message.reply_text(
-            f"✅ البث نشط (Python + Bash 🚀)\n"
-            f"المشتركين: {len(self.active_users)}\n"
+            f"✅ البث نشط (Python + FFmpeg 🚀)\n"
+            f"المشتركين: {len(self.subscribers)}\n"
             f"المدة: {self.config.get('CLIP_SECONDS')}ث\n"
             f"Buffer: {self.config.get('BUFFER_SIZE')} مقاطع"
         )
@@ -69,8 +68,7 @@ class BotCommands:
             return
 
         await update.message.reply_text("🛑 جاري الإيقاف...")
-        self.broadcast_controller.stop_broadcast()
-        await asyncio.sleep(2)
+        await self.broadcast_controller.stop_broadcast()
         await update.message.reply_text("✅ تم إيقاف البث")
     
     async def setbottom_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -91,6 +89,9 @@ class BotCommands:
 
         new_text = " ".join(context.args)
         self.config.set("BOTTOM_WATERMARK_TEXT", new_text)
+        if not await self._refresh_watermarks():
+            await update.message.reply_text("⚠️ تعذر رسم العلامة - ستُستخدم عند نجاح الرسم")
+            return
         await update.message.reply_text(f"✅ تم تغيير العلامة السفلية إلى:\n{new_text}")
     
     async def wbottom_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -105,10 +106,149 @@ class BotCommands:
         current = self.config.get('BOTTOM_WATERMARK_ENABLED', True)
         new_status = not current
         self.config.set('BOTTOM_WATERMARK_ENABLED', new_status)
+        await self._refresh_watermarks()
 
         status_text = "🟢 مفعلة" if new_status else "🔴 معطلة"
         await update.message.reply_text(f"✅ العلامة السفلية: {status_text}")
     
+    async def _refresh_watermarks(self):
+        """رسم شريط العلامة الجديد مرة واحدة وإعادة تشغيل مسجلات الجلسات العاملة"""
+        controllers = [self.sessions.get(name) for name in self.sessions.names()] if self.sessions else [self.broadcast_controller]
+        ok = True
+        for controller in controllers:
+            ok = await controller.refresh_watermark() and ok
+        return ok
+    
+    async def profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not update.effective_user or not update.message:
+            return
+
+        user_id = str(update.effective_user.id)
+        if user_id != self.config.get("YOUR_USER_ID"):
+            await update.message.reply_text("❌ للمالك فقط")
+            return
+
+        if not context.args or context.args[0] not in ENCODER_PROFILES:
+            await update.message.reply_text(
+                f"ملف الترميز: {self.broadcast_controller.get_encoder_status()}\n\n"
+                f"المتاح: {' | '.join(ENCODER_PROFILES)}\n"
+                "مثال: /profile latency"
+            )
+            return
+
+        self.broadcast_controller.set_encoder_profile(context.args[0])
+        await update.message.reply_text(f"✅ ملف الترميز: {context.args[0]}")
+    
+    async def quality_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not update.effective_user or not update.message:
+            return
+
+        user_id = str(update.effective_user.id)
+        if user_id not in self.subscribers:
+            await update.message.reply_text("⚠️ أرسل /start للتسجيل أولاً")
+            return
+
+        tiers = self.broadcast_controller.get_tiers()
+        if not context.args or context.args[0] not in tiers:
+            current = self.subscribers.tier(user_id) or DEFAULT_TIER
+            await update.message.reply_text(
+                f"الجودة الحالية: {current}\n\n"
+                f"المتاح: {' | '.join(tiers)}\n"
+                "مثال: /quality 480p"
+            )
+            return
+
+        tier = context.args[0]
+        self.subscribers.set_tier(user_id, None if tier == DEFAULT_TIER else tier)
+        await update.message.reply_text(f"✅ الجودة: {tier}")
+    
+    async def sessions_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not update.effective_user or not update.message:
+            return
+
+        user_id = str(update.effective_user.id)
+        if user_id != self.config.get("YOUR_USER_ID") or not self.sessions:
+            return
+
+        lines = []
+        for name in self.sessions.names():
+            session = self.sessions.get(name)
+            status = "🟢" if session.is_running() else "🔴"
+            lines.append(
+                f"{status} {name}: {session.get_stream_position():.1f}ث"
+                f" | Q:{session.get_queue_size()} | {', '.join(map(str, session.get_destinations()))}"
+            )
+
+        await update.message.reply_text(
+            "📡 الجلسات\n\n" + "\n".join(lines) + "\n\n"
+            f"🧮 الترميز: {self.sessions.encode_budget.describe()}"
+        )
+    
+    async def session_start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        await self._session_action(update, context, start=True)
+    
+    async def session_stop_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        await self._session_action(update, context, start=False)
+    
+    async def _session_action(self, update, context, start):
+        if not update.effective_user or not update.message:
+            return
+
+        user_id = str(update.effective_user.id)
+        if user_id != self.config.get("YOUR_USER_ID"):
+            await update.message.reply_text("❌ للمالك فقط")
+            return
+
+        if not self.sessions:
+            return
+
+        command = "/session_start" if start else "/session_stop"
+        if not context.args or self.sessions.get(context.args[0]) is None:
+            await update.message.reply_text(
+                f"الجلسات: {' | '.join(self.sessions.names())}\n\n"
+                f"مثال: {command} main"
+            )
+            return
+
+        name = context.args[0]
+        if start:
+            changed = await self.sessions.start(name)
+            await update.message.reply_text(f"✅ الجلسة {name} نشطة" if changed else f"⚠️ الجلسة {name} تعمل")
+        else:
+            changed = await self.sessions.stop(name)
+            await update.message.reply_text(f"✅ تم إيقاف الجلسة {name}" if changed else f"⚠️ الجلسة {name} متوقفة")
+    
+    async def replay_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not update.effective_user or not update.message:
+            return
+
+        user_id = str(update.effective_user.id)
+        if user_id != self.config.get("YOUR_USER_ID"):
+            await update.message.reply_text("❌ للمالك فقط")
+            return
+
+        args = list(context.args or [])
+        try:
+            seconds = float(args.pop(0)) if args else 60
+        except ValueError:
+            seconds = 0
+        controller = self.sessions.get(args[0]) if args and self.sessions else self.broadcast_controller
+        if seconds <= 0 or controller is None:
+            await update.message.reply_text(
+                f"الإعادة المتاحة: {self.broadcast_controller.get_replay_status()}\n\n"
+                "مثال: /replay 60 أو /replay 30 main"
+            )
+            return
+
+        await update.message.reply_text(f"⏪ جاري تجهيز آخر {seconds:.0f}ث...")
+        try:
+            duration = await controller.send_replay(update.effective_chat.id, seconds)
+        except Exception as e:
+            await update.message.reply_text(f"❌ تعذر إرسال الإعادة: {str(e)[:100]}")
+            return
+        if duration is None:
+            await update.message.reply_text("⚠️ لا توجد مقاطع في حلقة الإعادة")
+    
     async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not update.effective_user or not update.message:
             return
@@ -130,14 +270,24 @@ class BotCommands:
             f"📊 الإحصائيات\n\n"
             f"البث: {status}\n"
             f"الموضع: {self.broadcast_controller.get_stream_position():.1f}ث\n"
+            f"المصدر: {self.broadcast_controller.get_source_status()}\n"
             f"Buffer: {queue_size}/{self.config.get('BUFFER_SIZE')}\n"
-            f"المشتركين: {len(self.active_users)}\n"
+            f"💾 المقاطع المؤقتة: {self.broadcast_controller.get_spool_status()}\n"
+            f"⏪ الإعادة: {self.broadcast_controller.get_replay_status()}\n"
+            f"✂️ الحدود: {self.broadcast_controller.get_boundary_status()}\n"
+            f"🧬 التكرار: {self.broadcast_controller.get_dedup_status()}\n"
+            f"المشتركين: {len(self.subscribers)}\n"
             f"المقاطع: {self.stats['clips_sent']}\n"
+            f"📬 التسليم: {self.broadcast_controller.get_delivery_status()}\n"
             f"فشل: {self.stats['clips_failed']}\n"
+            f"زمن التوزيع: {self.stats.get('last_delivery_seconds', 0)}ث\n"
+            f"التأخير (التقاط → تسليم): {self.stats.get('last_latency_seconds', '-')}ث"
+            f"{' ⚡' if self.config.get('LOW_LATENCY') else ''}\n"
             f"الوقت: {hours}س {minutes}د\n\n"
             f"العلامة المائية:\n"
             f"{bottom_status} السفلية: {self.config.get('BOTTOM_WATERMARK_TEXT')}\n\n"
-            f"🔧 Bash Integration: Active"
+            f"🎛️ الترميز: {self.broadcast_controller.get_encoder_status()}\n"
+            f"🔧 FFmpeg Runner: Active"
         )
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -148,15 +298,21 @@ class BotCommands:
             "📋 قائمة الأوامر\n\n"
             "للجميع:\n"
             "/start - بدء البوت\n"
+            "/quality - اختيار جودة المقاطع 📶\n"
             "/help - قائمة الأوامر\n\n"
             "للمالك فقط:\n"
             "/startLIVE - تشغيل البث 🟢\n"
-            "/stopLIVE - إيقاف البث 🔴\n\n"
+            "/stopLIVE - إيقاف البث 🔴\n"
+            "/sessions - حالة جلسات البث 📡\n"
+            "/session_start - تشغيل جلسة بالاسم\n"
+            "/session_stop - إيقاف جلسة بالاسم\n"
+            "/replay - إعادة آخر ثوانٍ من البث ⏪\n\n"
             "العلامة المائية:\n"
             "/setbottom - تغيير نص العلامة المتحركة 🔄\n"
             "/wbottom - تفعيل/تعطيل العلامة\n"
+            "/profile - ملف الترميز (latency/balanced/size)\n"
             "/stats - الإحصائيات\n\n"
-            "✨ بث ذكي: Python + Bash 🚀"
+            "✨ بث ذكي: Python + FFmpeg 🚀"
         )
     
     async def any_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -164,8 +320,7 @@ class BotCommands:
             return
 
         user_id = str(update.effective_user.id)
-        if user_id not in self.active_users:
-            self.active_users.append(user_id)
+        if self.subscribers.add(user_id):
             await update.message.reply_text("✅ تم تسجيلك في البث")
         else:
             await update.message.reply_text("✅ أنت مسجل")
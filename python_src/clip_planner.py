@@ -0,0 +1,176 @@
+# clip_planner.py - حدود مقاطع حسب المحتوى: تجميع مقاطع المسجل القصيرة عند تغير المشهد أو الصمت
+import bisect
+import os
+
+
+class AnalysisLog:
+    """قراءة تدريجية لمخرجات فرع التحليل (metadata=print لـ scdet و silencedetect)
+
+    الأزمنة من بداية تشغيل المسجل (setpts=PTS-STARTPTS) فتوافق أزمنة قائمة المقاطع.
+    """
+
+    def __init__(self, scene_file, silence_file=None):
+        self.offsets = {scene_file: 0}
+        if silence_file:
+            self.offsets[silence_file] = 0
+        self.has_audio = silence_file is not None
+        self.score_times = []
+        self.scores = []
+        self.cuts = []
+        # [(بداية، نهاية أو None ما دام الصمت مستمراً)]
+        self.silences = []
+        # آخر زمن حُلل من الفيديو (الصوت لا يكتب سطراً إلا عند بداية صمت أو نهايته)
+        self.analyzed_until = 0.0
+        self._frame_time = None
+
+    def read(self):
+        for path, offset in self.offsets.items():
+            if not os.path.exists(path):
+                continue
+            with open(path, "r") as f:
+                f.seek(offset)
+                data = f.read()
+            complete = data[:data.rfind("\n") + 1]
+            self.offsets[path] = offset + len(complete.encode())
+            self._parse(complete.splitlines())
+
+    def _parse(self, lines):
+        # سطر الإطار ثم سطر لكل مفتاح؛ زمن الإطار يبقى بين قراءتين
+        for line in lines:
+            if line.startswith("frame:"):
+                self._frame_time = None
+                for field in line.split():
+                    if field.startswith("pts_time:"):
+                        try:
+                            self._frame_time = float(field[len("pts_time:"):])
+                        except ValueError:
+                            pass
+                continue
+            key, _, value = line.strip().partition("=")
+            try:
+                value = float(value)
+            except ValueError:
+                continue
+            time = self._frame_time
+            if key == "lavfi.scd.score" and time is not None:
+                self.score_times.append(time)
+                self.scores.append(value)
+                self.analyzed_until = max(self.analyzed_until, time)
+            elif key == "lavfi.scd.time":
+                self.cuts.append(value)
+            elif key == "lavfi.silence_start":
+                self.silences.append((value, None))
+            elif key == "lavfi.silence_end" and self.silences and self.silences[-1][1] is None:
+                self.silences[-1] = (self.silences[-1][0], value)
+
+    def scene_cut_near(self, time, tolerance):
+        index = bisect.bisect_left(self.cuts, time - tolerance)
+        return index < len(self.cuts) and self.cuts[index] <= time + tolerance
+
+    def silent_at(self, time):
+        return any(start <= time and (end is None or time <= end) for start, end in self.silences)
+
+    def is_static(self, start, end, max_score):
+        """صورة شبه ثابتة (متوسط تغير الإطارات تحت max_score) بلا صوت مسموع"""
+        first = bisect.bisect_left(self.score_times, start)
+        last = bisect.bisect_left(self.score_times, end)
+        if last <= first:
+            return False
+        if sum(self.scores[first:last]) / (last - first) >= max_score:
+            return False
+        if not self.has_audio:
+            return True
+        # الصمت يغطي المقطع كله تقريباً
+        covered = 0.0
+        for silence_start, silence_end in self.silences:
+            silence_end = end if silence_end is None else silence_end
+            covered += max(0.0, min(end, silence_end) - max(start, silence_start))
+        return covered >= 0.9 * (end - start)
+
+    def forget(self, before):
+        """حذف إشارات ما قبل before (مقاطع حُسمت) حتى لا تكبر القوائم طوال البث"""
+        index = bisect.bisect_left(self.score_times, before)
+        del self.score_times[:index]
+        del self.scores[:index]
+        del self.cuts[:bisect.bisect_left(self.cuts, before)]
+        self.silences = [s for s in self.silences if s[1] is None or s[1] >= before]
+
+
+class ClipPlan:
+    """مقطع مخطط: مقاطع مسجل متتالية [(الاسم، البداية، النهاية)] وسبب القطع"""
+
+    def __init__(self, segments, reason, static=False):
+        self.segments = segments
+        self.reason = reason
+        self.static = static
+
+    @property
+    def start(self):
+        return self.segments[0][1]
+
+    @property
+    def end(self):
+        return self.segments[-1][2]
+
+
+class ClipPlanner:
+    """اختيار حدود المقاطع من مقاطع المسجل القصيرة (كل منها يبدأ بإطار مفتاحي)
+
+    بعد min_seconds يُقطع عند أول حد يقع عليه تغير مشهد أو صمت (لا يبدأ المقطع
+    وسط جملة أو لقطة)؛ إذا بلغ التجميع max_seconds دون إشارة يُقطع عند الحد
+    الأقرب إلى المدة المطلوبة. الحد لا يُحسم قبل أن يصل التحليل إلى ما بعده.
+    """
+
+    def __init__(self, target, max_seconds, step, static_score=0.3, skip_static=True):
+        self.target = target
+        self.min_seconds = target * 0.75
+        self.max_seconds = max(max_seconds, target)
+        # هامش انتظار التحليل وسماحية مطابقة تغير المشهد للحد
+        self.tolerance = step / 2
+        self.static_score = static_score
+        self.skip_static = skip_static
+        self.segments = []
+
+    def add(self, entries):
+        self.segments.extend(entries)
+
+    def take_all(self):
+        segments, self.segments = self.segments, []
+        return segments
+
+    def plan(self, analysis, final=False):
+        """المقاطع التي حُسمت حدودها الآن (final: خروج المسجل، يُرسل المتبقي كما هو)"""
+        plans = []
+        while self.segments:
+            cut = self._choose_cut(analysis, final)
+            if cut is None:
+                break
+            index, reason = cut
+            plan = ClipPlan(self.segments[:index + 1], reason)
+            del self.segments[:index + 1]
+            plan.static = self.skip_static and analysis.is_static(plan.start, plan.end, self.static_score)
+            analysis.forget(plan.end - self.tolerance)
+            plans.append(plan)
+        return plans
+
+    def _choose_cut(self, analysis, final):
+        start = self.segments[0][1]
+        candidates = []
+        for index, (_, _, end) in enumerate(self.segments):
+            length = end - start
+            if length < self.min_seconds:
+                continue
+            candidates.append((abs(length - self.target), index))
+            if length > self.max_seconds or analysis.analyzed_until < end + self.tolerance:
+                break
+            if analysis.scene_cut_near(end, self.tolerance):
+                return index, "scene"
+            if analysis.silent_at(end):
+                return index, "silence"
+
+        if self.segments[-1][2] - start >= self.max_seconds:
+            # لا إشارة ضمن النافذة (أو التحليل متأخر): أقرب حد إلى المدة المطلوبة
+            return min(candidates)[1] if candidates else 0, "target"
+        if final:
+            return len(self.segments) - 1, "final"
+        return None
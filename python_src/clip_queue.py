@@ -0,0 +1,70 @@
+# clip_queue.py - قائمة المقاطع بين المنتج والمستهلك بعمق يتغير أثناء البث
+import asyncio
+from collections import deque
+
+
+class ResizableQueue:
+    """قائمة FIFO محدودة يمكن تغيير حدها أثناء التشغيل (BUFFER_SIZE)
+
+    نفس واجهة asyncio.Queue المستخدمة (put/get/get_nowait/qsize/empty)، والتكبير
+    يوقظ المنتج المنتظر فوراً؛ التصغير لا يحذف شيئاً بل يمنع الإضافة حتى ينزل العمق.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = deque()
+        self._getters = deque()
+        self._putters = deque()
+
+    def qsize(self):
+        return len(self._items)
+
+    def empty(self):
+        return not self._items
+
+    def full(self):
+        return len(self._items) >= self.maxsize
+
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        # كل منتظر يعيد فحص الحد الجديد
+        self._wake(self._putters, everyone=True)
+
+    def _wake(self, waiters, everyone=False):
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                if not everyone:
+                    return
+
+    async def _wait(self, waiters, blocked):
+        while blocked():
+            waiter = asyncio.get_running_loop().create_future()
+            waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # إيقاظ ضاع مع الإلغاء: ينتقل إلى المنتظر التالي
+                if waiter.done() and not waiter.cancelled():
+                    self._wake(waiters)
+                raise
+            finally:
+                if waiter in waiters:
+                    waiters.remove(waiter)
+
+    async def put(self, item):
+        await self._wait(self._putters, self.full)
+        self._items.append(item)
+        self._wake(self._getters)
+
+    async def get(self):
+        await self._wait(self._getters, self.empty)
+        return self.get_nowait()
+
+    def get_nowait(self):
+        if not self._items:
+            raise asyncio.QueueEmpty
+        item = self._items.popleft()
+        self._wake(self._putters)
+        return item
@@ -0,0 +1,144 @@
+# clip_spool.py - مجلد المقاطع المؤقتة: حصة بايتات، ضغط عكسي على المنتج، وتنظيف بعد الانهيار
+import asyncio
+import logging
+import os
+from python_src import metrics, utils
+
+logger = logging.getLogger(__name__)
+
+# ملفات المسجل في المجلد: {session}_clip_{run}_... و {session}_segments_{run}...
+# وملفات الإعادة المدمجة: {session}_replay_... وأشرطة العلامة المائية: watermark_...
+SPOOL_PATTERNS = ("*_clip_*", "*_segments_*", "*_replay_*", "watermark_*")
+
+# مجلد في الذاكرة (tmpfs) لتسليم أسرع بين المسجل والإرسال
+TMPFS_ROOT = "/dev/shm"
+
+
+class ClipSpool:
+    """مجلد مقاطع مشترك بين الجلسات بحد أقصى للحجم وحد أدنى لمساحة القرص الحرة
+
+    أرقام تشغيلات المسجل تُحفظ في ملف داخل المجلد فلا تتكرر أسماء الملفات بعد
+    إعادة تشغيل البوت، وملفات التشغيلات السابقة (بعد انهيار) تُحذف عند البداية.
+    مقاطع الذاكرة (MemoryClip) لها سقف بايتات مستقل (hold/release).
+    """
+
+    def __init__(self, directory="temp_clips", max_bytes=512 * 1024 * 1024, min_free_mb=200,
+                 max_memory_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_free_mb = min_free_mb
+        self.max_memory_bytes = max_memory_bytes
+        self.memory_bytes = 0
+        self.dropped = 0
+        self._held = {}
+        self._sequence_file = os.path.join(directory, ".run_sequence")
+        self._space_freed = asyncio.Event()
+
+        os.makedirs(directory, exist_ok=True)
+        self.swept = self.sweep()
+        if self.swept:
+            logger.info(f"🧹 حذف {self.swept} ملفات متبقية من تشغيل سابق في {directory}/")
+        metrics.SPOOL_BYTES.set_function(self.usage)
+
+    @classmethod
+    def from_config(cls, config):
+        directory = config.get("SPOOL_DIR") or "temp_clips"
+        if config.get("SPOOL_TMPFS", False):
+            if os.path.isdir(TMPFS_ROOT):
+                directory = os.path.join(TMPFS_ROOT, os.path.basename(os.path.abspath(directory)))
+            else:
+                logger.warning(f"⚠️ {TMPFS_ROOT} غير متوفر - المقاطع على القرص في {directory}/")
+        return cls(
+            directory,
+            max_bytes=int(float(config.get("SPOOL_MAX_MB", 512)) * 1024 * 1024),
+            min_free_mb=int(config.get("SPOOL_MIN_FREE_MB", 200)),
+            max_memory_bytes=int(float(config.get("MEMORY_CLIPS_MAX_MB", 256)) * 1024 * 1024)
+        )
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def next_run_id(self):
+        """رقم تشغيل جديد للمسجل لا يتكرر بين مرات تشغيل البوت"""
+        try:
+            with open(self._sequence_file, "r") as f:
+                run_id = int(f.read().strip() or 0) + 1
+        except (OSError, ValueError):
+            run_id = 1
+        # كتابة ذرية: ملف مؤقت ثم استبدال
+        temp_file = self._sequence_file + ".tmp"
+        with open(temp_file, "w") as f:
+            f.write(str(run_id))
+        os.replace(temp_file, self._sequence_file)
+        return run_id
+
+    def sweep(self):
+        """حذف ملفات المسجل المتبقية (لا تُستأنف: البث الحي تجاوزها) وإرجاع عددها"""
+        return sum(utils.cleanup_temp_files(self.directory, pattern) for pattern in SPOOL_PATTERNS)
+
+    def usage(self):
+        """حجم ملفات المجلد الحالية بالبايت (بما فيها المقطع الذي يكتبه المسجل الآن)"""
+        total = 0
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file():
+                            total += entry.stat().st_size
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return total
+
+    def has_space(self):
+        if self.usage() > self.max_bytes:
+            return False
+        return utils.check_disk_space(self.directory) >= self.min_free_mb
+
+    async def wait_for_space(self, timeout):
+        """انتظار تحرير مساحة (بحذف مقاطع مرسلة) حتى timeout ثانية؛ يرجع False إذا بقي المجلد ممتلئاً"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not self.has_space():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            self._space_freed.clear()
+            try:
+                # المسجل يغير الحجم دون إشعار، فنعيد الفحص دورياً أيضاً
+                await asyncio.wait_for(self._space_freed.wait(), min(remaining, 0.5))
+            except asyncio.TimeoutError:
+                pass
+        return True
+
+    def hold(self, clip):
+        """حجز حصة مقطع في الذاكرة حتى release؛ False إذا تجاوز سقف الذاكرة"""
+        if self.memory_bytes + clip.size > self.max_memory_bytes:
+            return False
+        self._held[clip] = clip.size
+        self.memory_bytes += clip.size
+        return True
+
+    def release(self, clip):
+        """تحرير حصة مقطع في الذاكرة (لا أثر لمقطع غير محجوز)"""
+        size = self._held.pop(clip, None)
+        if size is not None:
+            self.memory_bytes -= size
+
+    def discard(self, path):
+        """حذف ملف من المجلد وإيقاظ المنتج المنتظر للمساحة"""
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError:
+            pass
+        self._space_freed.set()
+
+    def describe(self):
+        return (
+            f"{self.usage() / 1048576:.1f}/{self.max_bytes / 1048576:.0f}MB"
+            f" | حر: {utils.check_disk_space(self.directory)}MB"
+            f" | ذاكرة: {self.memory_bytes / 1048576:.1f}/{self.max_memory_bytes / 1048576:.0f}MB"
+            f" | متخطى: {self.dropped}"
+        )
@@ -1,7 +1,13 @@
-# config_manager.py - إدارة الإعدادات
+# config_manager.py - إدارة الإعدادات: لقطات ثابتة، تحقق من القيم، حفظ ذري وإعادة تحميل حية
+import asyncio
 import json
+import logging
 import os
 import threading
+from types import MappingProxyType
+from python_src.video_processor import ENCODER_PROFILES, RENDITION_LADDER
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_CONFIG = {
     "BOT_TOKEN": os.environ.get("BOT_TOKEN", ""),
@@ -9,43 +15,305 @@ DEFAULT_CONFIG = {
     "CHANNEL_ID": os.environ.get("CHANNEL_ID", ""),
     "SOURCE_URL": os.environ.get("SOURCE_URL", ""),
     "CLIP_SECONDS": 14,
+    "LOW_LATENCY": False,
+    "LOW_LATENCY_CLIP_SECONDS": 2,
+    "MEMORY_CLIPS": False,
+    "MEMORY_CLIPS_MAX_MB": 256,
+    "ADAPTIVE_CLIPS": False,
+    "ADAPTIVE_STEP_SECONDS": 2,
+    "ADAPTIVE_MAX_SECONDS": 20,
+    "SCENE_THRESHOLD": 10,
+    "STATIC_SCORE": 0.3,
+    "SKIP_STATIC": True,
+    "DEDUP_CLIPS": False,
+    "DEDUP_HISTORY": 16,
+    "DEDUP_MAX_SUPPRESSED": 10,
     "SLEEP_BETWEEN": 0,
     "BOTTOM_WATERMARK_TEXT": "Telegram | @media_ayham",
     "BOTTOM_WATERMARK_ENABLED": True,
+    "WATERMARK_FONT": "",
+    "WATERMARK_FONT_SIZE": 32,
     "BUFFER_SIZE": 5,
-    "KEYFRAME_INTERVAL": 2
+    "KEYFRAME_INTERVAL": 2,
+    "SEND_CONCURRENCY": 8,
+    "SEND_GLOBAL_RATE": 30,
+    "RETRY_DEADLINE_SECONDS": 30,
+    "RETRY_QUEUE_MAX": 500,
+    "PRODUCER_WORKERS": 1,
+    "STREAM_COPY": "auto",
+    "CRF": 26,
+    "ENCODER_PROFILE": "balanced",
+    "ADAPTIVE_ENCODER": True,
+    "MAX_CLIP_MB": 20,
+    "SOURCE_STALL_SECONDS": 3,
+    "SUBSCRIBERS_DB": "data/subscribers.db",
+    "SPOOL_DIR": "temp_clips",
+    "SPOOL_MAX_MB": 512,
+    "SPOOL_MIN_FREE_MB": 200,
+    "SPOOL_TMPFS": False,
+    "REPLAY_SECONDS": 300,
+    "REPLAY_MAX_MB": 150,
+    "MAX_ENCODERS": 0,
+    "RENDITIONS": [],
+    "SESSIONS": {},
+    "LOG_LEVEL": "INFO",
+    "LOG_MAX_MB": 10,
+    "DEBUG_TOKEN": os.environ.get("DEBUG_TOKEN", "")
+}
+
+
+def _number(minimum=None, maximum=None, integer=False):
+    def check(value):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return "يجب أن يكون رقماً"
+        if integer and value != int(value):
+            return "يجب أن يكون عدداً صحيحاً"
+        if minimum is not None and value < minimum:
+            return f"أقل من {minimum}"
+        if maximum is not None and value > maximum:
+            return f"أكبر من {maximum}"
+        return None
+    return check
+
+
+def _of_type(*types):
+    def check(value):
+        if isinstance(value, bool) and bool not in types:
+            return f"نوع غير صحيح ({type(value).__name__})"
+        return None if isinstance(value, types) else f"نوع غير صحيح ({type(value).__name__})"
+    return check
+
+
+def _choice(options):
+    def check(value):
+        return None if value in options else f"غير معروف (المتاح: {', '.join(map(str, options))})"
+    return check
+
+
+def _renditions(value):
+    if not isinstance(value, list):
+        return "يجب أن يكون قائمة"
+    unknown = [tier for tier in value if tier not in RENDITION_LADDER]
+    return f"مستويات غير معروفة: {unknown}" if unknown else None
+
+
+# قيود القيم المعروفة؛ المفاتيح غير المذكورة تُقبل كما هي
+CONFIG_SCHEMA = {
+    "BOT_TOKEN": _of_type(str),
+    "YOUR_USER_ID": _of_type(str, int),
+    "CHANNEL_ID": _of_type(str, int),
+    "SOURCE_URL": _of_type(str),
+    "CLIP_SECONDS": _number(1, 600),
+    "LOW_LATENCY": _of_type(bool),
+    "LOW_LATENCY_CLIP_SECONDS": _number(0.5, 10),
+    "MEMORY_CLIPS": _of_type(bool),
+    "MEMORY_CLIPS_MAX_MB": _number(16),
+    "ADAPTIVE_CLIPS": _of_type(bool),
+    "ADAPTIVE_STEP_SECONDS": _number(0.5, 10),
+    "ADAPTIVE_MAX_SECONDS": _number(1, 600),
+    "SCENE_THRESHOLD": _number(0, 100),
+    "STATIC_SCORE": _number(0, 100),
+    "SKIP_STATIC": _of_type(bool),
+    "DEDUP_CLIPS": _of_type(bool),
+    "DEDUP_HISTORY": _number(1, 256, integer=True),
+    "DEDUP_MAX_SUPPRESSED": _number(0, integer=True),
+    "SLEEP_BETWEEN": _number(0),
+    "BOTTOM_WATERMARK_TEXT": _of_type(str),
+    "BOTTOM_WATERMARK_ENABLED": _of_type(bool),
+    "WATERMARK_FONT": _of_type(str),
+    "WATERMARK_FONT_SIZE": _number(8, 200, integer=True),
+    "BUFFER_SIZE": _number(1, 100, integer=True),
+    "KEYFRAME_INTERVAL": _number(0.5, 60),
+    "SEND_CONCURRENCY": _number(1, integer=True),
+    "SEND_GLOBAL_RATE": _number(0.1),
+    "RETRY_DEADLINE_SECONDS": _number(0),
+    "RETRY_QUEUE_MAX": _number(0, integer=True),
+    "PRODUCER_WORKERS": _number(1, integer=True),
+    "STREAM_COPY": _of_type(str, bool),
+    "CRF": _number(0, 51, integer=True),
+    "ENCODER_PROFILE": _choice(list(ENCODER_PROFILES)),
+    "ADAPTIVE_ENCODER": _of_type(bool),
+    "MAX_CLIP_MB": _number(1, 2000),
+    "SOURCE_STALL_SECONDS": _number(0.5),
+    "SUBSCRIBERS_DB": _of_type(str),
+    "SPOOL_DIR": _of_type(str),
+    "SPOOL_MAX_MB": _number(16),
+    "SPOOL_MIN_FREE_MB": _number(0),
+    "SPOOL_TMPFS": _of_type(bool),
+    "REPLAY_SECONDS": _number(0, 3600),
+    "REPLAY_MAX_MB": _number(0),
+    "MAX_ENCODERS": _number(0, integer=True),
+    "RENDITIONS": _renditions,
+    "SESSIONS": _of_type(dict),
+    "DESTINATIONS": _of_type(list),
+    "SEND_TO_SUBSCRIBERS": _of_type(bool),
+    "LOG_LEVEL": _choice(["DEBUG", "INFO", "WARNING", "ERROR"]),
+    "LOG_MAX_MB": _number(1),
+    "DEBUG_TOKEN": _of_type(str),
 }
 
+
+def validate(key, value):
+    """رسالة الخطأ إن كانت القيمة غير صالحة للمفتاح، وإلا None"""
+    check = CONFIG_SCHEMA.get(key)
+    return check(value) if check else None
+
+
 class ConfigManager:
+    """إعدادات البوت كلقطة ثابتة تُستبدل كاملة عند كل تغيير
+
+    القراءة بلا قفل (اللقطة لا تتغير بعد إنشائها)، والتغييرات من الأوامر تُحفظ
+    في config.json بكتابة ذرية، وتعديل الملف يدوياً يُطبق دون إعادة تشغيل (watch).
+    ترتيب الأولوية: DEFAULT_CONFIG (ومتغيرات البيئة) ← config.json ← قيم التشغيل غير المحفوظة.
+    """
+
     def __init__(self, config_file="config.json"):
         self.config_file = config_file
-        self.config = self.load_config()
         self.lock = threading.Lock()
+        # حفظ واحد في كل مرة، ومهام الحفظ الجارية محفوظة حتى لا تُجمع قبل انتهائها
+        self._save_lock = threading.Lock()
+        self._saves = set()
+        # قيم ضُبطت أثناء التشغيل دون حفظ (مثل CHANNEL_ID بعد تصحيح صيغته)
+        self._runtime = {}
+        self._listeners = []
+        self._file_values, self._mtime = self._read_file()
+        self._snapshot = self._build()
 
-    def load_config(self):
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r') as f:
-                    loaded = json.load(f)
-                    return {**DEFAULT_CONFIG, **loaded}
-            except:
-                pass
-        return DEFAULT_CONFIG.copy()
+    def _read_file(self):
+        """قيم config.json الصالحة وزمن تعديله"""
+        try:
+            mtime = os.stat(self.config_file).st_mtime_ns
+        except OSError:
+            return {}, None
+        try:
+            with open(self.config_file, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ تعذر قراءة {self.config_file}: {e}")
+            return None, mtime
+        if not isinstance(loaded, dict):
+            logger.error(f"❌ {self.config_file} ليس كائن JSON")
+            return None, mtime
+
+        values = {}
+        for key, value in loaded.items():
+            error = validate(key, value)
+            if error:
+                logger.warning(f"⚠️ تجاهل {key}={value!r} من {self.config_file}: {error}")
+                continue
+            values[key] = value
+        return values, mtime
+
+    def _build(self):
+        return MappingProxyType({**DEFAULT_CONFIG, **(self._file_values or {}), **self._runtime})
+
+    def snapshot(self):
+        """لقطة ثابتة للإعدادات الحالية (تُقرأ مرة واحدة لكل مقطع/تشغيل)"""
+        return self._snapshot
 
     def get(self, key, default=None):
-        return self.config.get(key, default)
+        return self._snapshot.get(key, default)
+
+    def set(self, key, value, persist=True):
+        """تغيير قيمة بعد التحقق منها (ValueError إن كانت غير صالحة)
+
+        persist=False للقيم المشتقة من البيئة التي لا يجب أن تُكتب في الملف.
+        """
+        error = validate(key, value)
+        if error:
+            raise ValueError(f"{key}: {error}")
+        with self.lock:
+            if persist and self._file_values is None:
+                # config.json تالف: الكتابة فوقه تمسح بقية قيمه، فتبقى القيمة للتشغيل الحالي فقط
+                logger.warning(f"⚠️ {self.config_file} تالف: {key} لن يُحفظ حتى يُصلح الملف")
+                persist = False
+            if persist:
+                self._file_values = {**self._file_values, key: value}
+                self._runtime.pop(key, None)
+            else:
+                self._runtime[key] = value
+            previous, self._snapshot = self._snapshot, self._build()
+        if persist:
+            self._schedule_save()
+        self._notify(previous)
 
-    def set(self, key, value):
+    def _schedule_save(self):
+        """الكتابة و fsync في خيط حتى لا تتوقف حلقة الأحداث على القرص"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # خارج حلقة الأحداث (قبل بدء البوت): كتابة مباشرة
+            self._save()
+            return
+        task = loop.create_task(asyncio.to_thread(self._save))
+        self._saves.add(task)
+        task.add_done_callback(self._saves.discard)
+
+    def _save(self):
+        """كتابة قيم الملف ذرياً (ملف مؤقت ثم استبدال) حتى لا يُقرأ ملف نصف مكتوب
+
+        كل حفظ يكتب أحدث القيم، فلا يهم ترتيب انتهاء الخيوط.
+        """
+        temp_file = f"{self.config_file}.tmp"
+        with self._save_lock:
+            with self.lock:
+                values = self._file_values
+            try:
+                with open(temp_file, "w", encoding="utf-8") as f:
+                    json.dump(values, f, indent=2, ensure_ascii=False)
+                    f.write("\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_file, self.config_file)
+                # تعديلنا نحن لا يُعاد تحميله
+                self._mtime = os.stat(self.config_file).st_mtime_ns
+            except OSError as e:
+                logger.error(f"❌ تعذر حفظ {self.config_file}: {e}")
+
+    def reload(self):
+        """إعادة قراءة config.json وتطبيق القيم الصالحة؛ يرجع المفاتيح المتغيرة"""
+        values, mtime = self._read_file()
         with self.lock:
-            self.config[key] = value
+            self._mtime = mtime
+            if values is None:
+                # ملف تالف (غالباً أثناء تحريره): نبقي الإعدادات الحالية
+                return set()
+            self._file_values = values
+            previous, self._snapshot = self._snapshot, self._build()
+        return self._notify(previous)
+
+    def on_change(self, callback):
+        """callback(changed_keys) بعد كل تغيير في القيم"""
+        self._listeners.append(callback)
+
+    def _notify(self, previous):
+        changed = {key for key in set(previous) | set(self._snapshot) if previous.get(key) != self._snapshot.get(key)}
+        if changed:
+            for callback in self._listeners:
+                try:
+                    callback(changed)
+                except Exception as e:
+                    logger.error(f"❌ خطأ في تطبيق تغيير الإعدادات: {e}", exc_info=True)
+        return changed
+
+    async def watch(self, interval=2.0):
+        """مراقبة زمن تعديل config.json وإعادة تحميله عند تغيره"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                mtime = os.stat(self.config_file).st_mtime_ns
+            except OSError:
+                continue
+            if mtime != self._mtime:
+                changed = self.reload()
+                if changed:
+                    logger.info(f"🔄 إعادة تحميل {self.config_file}: {', '.join(sorted(changed))}")
 
     def validate_required_vars(self):
         required_vars = ["BOT_TOKEN", "YOUR_USER_ID", "CHANNEL_ID", "SOURCE_URL"]
         missing_vars = [var for var in required_vars if not self.get(var)]
         
         if missing_vars:
-            print("❌ المتغيرات المطلوبة:")
-            for var in missing_vars:
-                print(f"   {var}")
+            logger.error(f"❌ المتغيرات المطلوبة: {', '.join(missing_vars)}")
             return False
         return True
@@ -0,0 +1,173 @@
+# delivery.py - سجل تسليم المقاطع لكل وجهة وطابور إعادة المحاولة المحدود بمهل
+import asyncio
+import heapq
+import itertools
+import time
+from collections import OrderedDict, deque
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+
+def is_transient(error):
+    """خطأ مؤقت تستحق وجهته إعادة المحاولة (انقطاع الشبكة أو ضغط الخادم)"""
+    # BadRequest فرع من NetworkError لكنه خطأ دائم في الطلب نفسه
+    if isinstance(error, (BadRequest, Forbidden)):
+        return False
+    return isinstance(error, (TimedOut, NetworkError, RetryAfter))
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class ClipHandle:
+    """مرجع مشترك لملفات مقطع: تُحذف عند تحرير آخر مرجع (الإرسال وكل إعادة محاولة معلقة)"""
+
+    def __init__(self, clip_id, clips, on_release, start=None, end=None):
+        self.clip_id = clip_id
+        self.clips = clips
+        # موضع المقطع في البث (لحلقة الإعادة بعد التحرير)
+        self.start = start
+        self.end = end
+        self.started_at = time.monotonic()
+        # file_id لكل مستوى بعد أول رفع ناجح (إعادة المحاولة لا ترفع الملف مجدداً)
+        self.file_ids = {}
+        self._refs = 1
+        self._on_release = on_release
+
+    def acquire(self):
+        self._refs += 1
+        return self
+
+    def release(self):
+        self._refs -= 1
+        if self._refs == 0:
+            self._on_release(self)
+
+
+class RetryEntry:
+    """وجهة فشل تسليم مقطع إليها مؤقتاً"""
+
+    def __init__(self, handle, tier, chat_id, deadline):
+        self.handle = handle
+        self.tier = tier
+        self.chat_id = chat_id
+        self.deadline = deadline
+        self.attempts = 1
+
+
+class RetryQueue:
+    """طابور محدود لإعادة المحاولة بتأخير أسي؛ ما يتجاوز مهلته يُسقط (المقطع الحي فقد قيمته)"""
+
+    def __init__(self, max_size=500, base_delay=1.0, max_attempts=4):
+        self.max_size = max_size
+        self.base_delay = base_delay
+        self.max_attempts = max_attempts
+        self._heap = []
+        self._order = itertools.count()
+        self._changed = asyncio.Event()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, entry):
+        """جدولة المحاولة التالية؛ False إذا امتلأ الطابور أو انتهت المحاولات أو المهلة"""
+        if len(self._heap) >= self.max_size or entry.attempts >= self.max_attempts:
+            return False
+        next_at = time.monotonic() + self.base_delay * 2 ** (entry.attempts - 1)
+        if next_at > entry.deadline:
+            return False
+        entry.handle.acquire()
+        heapq.heappush(self._heap, (next_at, next(self._order), entry))
+        self._changed.set()
+        return True
+
+    async def next_due(self):
+        """انتظار أقرب محاولة مستحقة وإخراجها"""
+        while True:
+            self._changed.clear()
+            if self._heap:
+                delay = self._heap[0][0] - time.monotonic()
+                if delay <= 0:
+                    return heapq.heappop(self._heap)[2]
+            else:
+                delay = None
+            try:
+                await asyncio.wait_for(self._changed.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def clear(self):
+        """إخراج كل المحاولات المعلقة (إيقاف البث)؛ على المستدعي تحرير مراجع مقاطعها"""
+        entries = [item[2] for item in sorted(self._heap)]
+        self._heap = []
+        return entries
+
+
+class DeliveryLedger:
+    """نتيجة وزمن تسليم كل مقطع لكل وجهة، مع نسب النجاح ومئينات الزمن"""
+
+    def __init__(self, max_clips=200, window=1000):
+        self.max_clips = max_clips
+        # آخر المقاطع فقط: {clip_id: {chat_id: (الحالة، الزمن، المحاولات، الخطأ)}}
+        self.clips = OrderedDict()
+        self.latencies = deque(maxlen=window)
+        self.counts = {"delivered": 0, "failed": 0, "expired": 0, "retried": 0}
+        self.clips_delivered = 0
+        self.clips_undelivered = 0
+
+    def _clip(self, clip_id):
+        outcomes = self.clips.get(clip_id)
+        if outcomes is None:
+            outcomes = self.clips[clip_id] = {}
+            while len(self.clips) > self.max_clips:
+                self.clips.popitem(last=False)
+        return outcomes
+
+    def delivered(self, clip_id, chat_id, latency, attempts=1):
+        """تسجيل تسليم ناجح؛ يرجع True إذا كان أول تسليم لهذا المقطع"""
+        outcomes = self._clip(clip_id)
+        first = not any(outcome[0] == "delivered" for outcome in outcomes.values())
+        outcomes[chat_id] = ("delivered", round(latency, 3), attempts, None)
+        self.latencies.append(latency)
+        self.counts["delivered"] += 1
+        if first:
+            self.clips_delivered += 1
+        return first
+
+    def failed(self, clip_id, chat_id, error, attempts=1, status="failed"):
+        """تسجيل فشل نهائي (status="expired" إذا انتهت مهلة إعادة المحاولة)"""
+        self._clip(clip_id)[chat_id] = (status, None, attempts, type(error).__name__ if error else None)
+        self.counts[status] += 1
+
+    def retrying(self, clip_id, chat_id, error, attempts):
+        self._clip(clip_id)[chat_id] = ("retrying", None, attempts, type(error).__name__)
+        self.counts["retried"] += 1
+
+    def clip_finished(self, clip_id):
+        """بعد انتهاء كل محاولات المقطع: هل وصل لوجهة واحدة على الأقل"""
+        outcomes = self.clips.get(clip_id, {})
+        if outcomes and not any(outcome[0] == "delivered" for outcome in outcomes.values()):
+            self.clips_undelivered += 1
+
+    def outcome(self, clip_id):
+        return dict(self.clips.get(clip_id, {}))
+
+    def success_rate(self):
+        final = self.counts["delivered"] + self.counts["failed"] + self.counts["expired"]
+        return self.counts["delivered"] / final if final else None
+
+    def describe(self):
+        rate = self.success_rate()
+        p50 = percentile(self.latencies, 0.5)
+        p95 = percentile(self.latencies, 0.95)
+        return (
+            f"مقاطع {self.clips_delivered}✓/{self.clips_undelivered}✗"
+            f" | وجهات {f'{rate:.1%}' if rate is not None else '-'}"
+            f" ({self.counts['delivered']}/{self.counts['failed']}/{self.counts['expired']} ✓/✗/⌛)"
+            f" | p50 {f'{p50:.2f}ث' if p50 is not None else '-'}"
+            f" p95 {f'{p95:.2f}ث' if p95 is not None else '-'}"
+            f" | إعادة: {self.counts['retried']}"
+        )
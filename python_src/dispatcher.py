@@ -0,0 +1,135 @@
+# dispatcher.py - موزع الإرسال المتزامن مع احترام حدود Telegram
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """دلو رموز لتحديد معدل الإرسال"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        """إيقاف الدلو مؤقتاً (مثلاً بعد RetryAfter من الخادم)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        """انتظار رمز متاح ثم استهلاكه"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class BatchResult:
+    """نتيجة إرسال دفعة لعدة محادثات"""
+
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+        self.sent = 0
+        self.failed = 0
+        self.elapsed = 0.0
+
+    @property
+    def total(self):
+        return self.sent + self.failed
+
+    def record_success(self, chat_id, value):
+        self.results[chat_id] = value
+        self.sent += 1
+
+    def record_failure(self, chat_id, error):
+        self.results[chat_id] = error
+        self.failed += 1
+        name = type(error).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+
+class SendDispatcher:
+    """إرسال متزامن محدود مع دلو عام ودلو لكل محادثة ومعالجة RetryAfter"""
+
+    # حدود Telegram: ~30 رسالة/ث عامة، 1/ث للمحادثة الخاصة، 20/دقيقة للقنوات والمجموعات
+    GROUP_RATE = 20 / 60
+
+    def __init__(self, max_concurrency=8, global_rate=30, per_chat_rate=1.0, max_retries=3):
+        self.max_concurrency = max_concurrency
+        self.per_chat_rate = per_chat_rate
+        self.max_retries = max_retries
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self.chat_buckets = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _chat_rate(self, chat_id):
+        chat = str(chat_id)
+        return self.GROUP_RATE if chat.startswith("-") or chat.startswith("@") else self.per_chat_rate
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self._chat_rate(chat_id))
+        return bucket
+
+    def batch_interval(self, chat_ids):
+        """أقل زمن بين دفعتين لهذه المحادثات تستطيع الحدود مجاراته (أبطأ محادثة أو الدلو العام)"""
+        if not chat_ids:
+            return 0.0
+        slowest = max(1 / self._chat_rate(chat_id) for chat_id in chat_ids)
+        return max(slowest, len(chat_ids) / self.global_bucket.rate)
+
+    async def send(self, chat_id, send_fn):
+        """إرسال واحد مع احترام الحدود وإعادة المحاولة بعد RetryAfter"""
+        bucket = self._chat_bucket(chat_id)
+        attempts = 0
+
+        while True:
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                return await send_fn(chat_id)
+            except RetryAfter as e:
+                attempts += 1
+                if attempts > self.max_retries:
+                    raise
+
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                bucket.pause(float(retry_after))
+                logger.warning(f"⏳ RetryAfter {retry_after}ث للمحادثة {chat_id}")
+
+    async def dispatch(self, chat_ids, send_fn):
+        """إرسال لعدة محادثات بالتوازي وإرجاع BatchResult مع زمن الدفعة"""
+        result = BatchResult()
+        start_time = time.monotonic()
+
+        async def _send_one(chat_id):
+            async with self._semaphore:
+                try:
+                    result.record_success(chat_id, await self.send(chat_id, send_fn))
+                except Exception as e:
+                    result.record_failure(chat_id, e)
+
+        await asyncio.gather(*(_send_one(chat_id) for chat_id in chat_ids))
+        result.elapsed = time.monotonic() - start_time
+        return result
@@ -0,0 +1,140 @@
+# encoder_tuning.py - ضبط الترميز تلقائياً حسب سرعة FFmpeg واستهلاك المعالج
+import logging
+import os
+import time
+from python_src.video_processor import PRESET_LADDER, HEIGHT_LADDER
+
+logger = logging.getLogger(__name__)
+
+
+def read_process_cpu_seconds(pid):
+    """زمن المعالج (user+system) لعملية من /proc، أو None على الأنظمة الأخرى"""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            # الحقلان 14 و 15 بعد اسم العملية (الذي قد يحتوي مسافات)
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def parse_speed(progress):
+    """قيمة speed من كتلة -progress (مثل 1.02x) أو None"""
+    value = progress.get("speed", "").strip().rstrip("x")
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_out_time(progress):
+    """زمن الإخراج بالثواني من كتلة -progress أو None"""
+    try:
+        return int(progress.get("out_time_us", "")) / 1_000_000
+    except ValueError:
+        return None
+
+
+class AdaptiveEncoder:
+    """يرفع أو يخفض كلفة الترميز ليبقى أسرع من الزمن الحقيقي
+
+    مع مصدر مباشر تبقى speed قرب 1.0x طالما المرمّز يلحق بالمصدر، لذلك
+    يُستخدم أيضاً حمل المعالج لكل ثانية وسائط لمعرفة وجود فائض للتحسين.
+    """
+
+    def __init__(self, settings, cpu_count=None, window=10.0, cooldown=60.0,
+                 low_load=0.35, high_load=0.85, min_speed=0.97):
+        self.settings = settings
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self.window = window
+        self.cooldown = cooldown
+        self.low_load = low_load
+        self.high_load = high_load
+        self.min_speed = min_speed
+
+        self.last_speed = None
+        self.last_load = None
+        self.last_change = time.monotonic()
+        self._reset_window()
+
+    def _reset_window(self):
+        self._window_start = None
+        self._window_media = None
+        self._window_cpu = None
+
+    def observe(self, progress, pid):
+        """تسجيل كتلة تقدم جديدة - يرجع True إذا تغيرت الإعدادات"""
+        now = time.monotonic()
+        media = parse_out_time(progress)
+        cpu = read_process_cpu_seconds(pid)
+        speed = parse_speed(progress)
+        if speed is not None:
+            self.last_speed = speed
+
+        if media is None:
+            return False
+
+        # عملية مسجل جديدة تبدأ زمنها من الصفر
+        if self._window_start is None or media < self._window_media:
+            self._window_start, self._window_media, self._window_cpu = now, media, cpu
+            return False
+
+        if now - self._window_start < self.window:
+            return False
+
+        media_elapsed = media - self._window_media
+        if cpu is not None and self._window_cpu is not None and media_elapsed > 0:
+            # نسبة كل معالجات الجهاز المطلوبة لترميز ثانية وسائط واحدة
+            self.last_load = (cpu - self._window_cpu) / media_elapsed / self.cpu_count
+        self._window_start, self._window_media, self._window_cpu = now, media, cpu
+
+        if now - self.last_change < self.cooldown:
+            return False
+
+        behind = self.last_speed is not None and self.last_speed < self.min_speed
+        if behind or (self.last_load is not None and self.last_load > self.high_load):
+            return self._changed(self.step_down())
+        if not behind and self.last_load is not None and self.last_load < self.low_load:
+            return self._changed(self.step_up())
+        return False
+
+    def _changed(self, changed):
+        if changed:
+            self.last_change = time.monotonic()
+            self._reset_window()
+            logger.info(f"🎛️ ضبط الترميز: {self.settings.describe()} (speed={self.last_speed} load={self.last_load and round(self.last_load, 2)})")
+        return changed
+
+    def step_down(self):
+        """تخفيف الترميز: خيوط أكثر، ثم preset أسرع، ثم دقة أقل"""
+        s = self.settings
+        # الخيوط الإضافية تفيد فقط إذا كانت هناك معالجات غير مشغولة
+        spare_cores = self.last_load is None or self.last_load < self.high_load
+        if s.threads < self.cpu_count and spare_cores:
+            s.threads += 1
+            return True
+
+        index = PRESET_LADDER.index(s.preset)
+        if index > 0:
+            s.preset = PRESET_LADDER[index - 1]
+            return True
+
+        index = HEIGHT_LADDER.index(s.max_height)
+        if index < len(HEIGHT_LADDER) - 1:
+            s.max_height = HEIGHT_LADDER[index + 1]
+            return True
+        return False
+
+    def step_up(self):
+        """استغلال الفائض: استعادة الدقة أولاً، ثم preset أبطأ حتى preset الملف"""
+        s = self.settings
+        index = HEIGHT_LADDER.index(s.max_height)
+        if index > 0:
+            s.max_height = HEIGHT_LADDER[index - 1]
+            return True
+
+        index = PRESET_LADDER.index(s.preset)
+        if index < PRESET_LADDER.index(s.base_preset):
+            s.preset = PRESET_LADDER[index + 1]
+            return True
+        return False
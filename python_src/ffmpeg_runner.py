@@ -0,0 +1,258 @@
+# ffmpeg_runner.py - تشغيل FFmpeg/FFprobe مباشرة بشكل غير متزامن
+import asyncio
+import itertools
+import json
+import logging
+import os
+import shlex
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JobResult:
+    """نتيجة مهمة FFmpeg"""
+    success: bool
+    returncode: int
+    elapsed: float
+    stderr: str = ""
+    progress: dict = field(default_factory=dict)
+    cancelled: bool = False
+    error: str = ""
+    job_id: str = ""
+    command: str = ""
+
+    def diagnostics(self):
+        """حقول سجل الفشل: معرّف المهمة والأمر ورمز الخروج وآخر أسطر stderr"""
+        return {
+            "job_id": self.job_id,
+            "returncode": self.returncode,
+            "elapsed": round(self.elapsed, 2),
+            "cancelled": self.cancelled,
+            "error": self.error,
+            "command": self.command,
+            "stderr": self.stderr,
+        }
+
+
+@dataclass
+class ProbeResult:
+    """نتيجة FFprobe لملف أو رابط"""
+    success: bool
+    duration: float = 0.0
+    size: int = 0
+    format_name: str = ""
+    streams: list = field(default_factory=list)
+    error: str = ""
+
+    def stream(self, codec_type):
+        """أول تدفق من النوع المطلوب (video/audio) أو None"""
+        for stream in self.streams:
+            if stream.get("codec_type") == codec_type:
+                return stream
+        return None
+
+
+class FFmpegJob:
+    """عملية FFmpeg قيد التشغيل مع تقدم مباشر من -progress pipe:1"""
+
+    STDERR_LINES = 50
+    _ids = itertools.count(1)
+
+    def __init__(self, args, on_progress=None, pass_fds=()):
+        # كل مهمة لها stderr خاص في الذاكرة بدل ملف سجل مشترك بين المهام
+        self.job_id = f"ffmpeg-{next(self._ids)}"
+        self.args = args
+        self.on_progress = on_progress
+        self.pass_fds = tuple(pass_fds)
+        self.process = None
+        self.progress = {}
+        self.started_at = 0.0
+        self.cancelled = False
+        self._stderr = deque(maxlen=self.STDERR_LINES)
+        self._readers = []
+
+    @property
+    def command(self):
+        return shlex.join(["ffmpeg"] + [str(arg) for arg in self.args])
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        cmd = ["ffmpeg", "-hide_banner", "-nostats", "-progress", "pipe:1"] + self.args
+        self.started_at = time.monotonic()
+        self.process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            pass_fds=self.pass_fds
+        )
+        logger.debug(f"▶️ {self.job_id} pid={self.process.pid}", extra={"job_id": self.job_id, "command": self.command})
+        self._readers = [
+            asyncio.create_task(self._read_progress()),
+            asyncio.create_task(self._read_stderr())
+        ]
+        return self
+
+    async def _read_progress(self):
+        block = {}
+        async for raw in self.process.stdout:
+            key, _, value = raw.decode(errors="replace").strip().partition("=")
+            if not key:
+                continue
+            block[key] = value
+            # كل كتلة تقدم تنتهي بسطر progress=continue|end
+            if key == "progress":
+                self.progress = block
+                block = {}
+                if self.on_progress:
+                    try:
+                        self.on_progress(self.progress)
+                    except Exception as e:
+                        logger.warning(f"⚠️ on_progress: {str(e)[:50]}", extra={"job_id": self.job_id})
+
+    async def _read_stderr(self):
+        async for raw in self.process.stderr:
+            line = raw.decode(errors="replace").rstrip()
+            if line:
+                self._stderr.append(line)
+
+    async def wait(self, timeout=None):
+        """انتظار انتهاء العملية وإرجاع JobResult (يُلغى المهمة عند انتهاء المهلة)"""
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            await self.cancel()
+            return self._result(error="Timeout expired")
+        except asyncio.CancelledError:
+            await self.cancel()
+            raise
+
+        await asyncio.gather(*self._readers, return_exceptions=True)
+        return self._result()
+
+    async def cancel(self, grace=5):
+        """إيقاف العملية: SIGTERM ليغلق FFmpeg ملفاته، ثم SIGKILL بعد المهلة"""
+        if not self.running:
+            return
+        self.cancelled = True
+        self.process.terminate()
+        try:
+            await asyncio.wait_for(self.process.wait(), grace)
+        except asyncio.TimeoutError:
+            self.process.kill()
+            await self.process.wait()
+        await asyncio.gather(*self._readers, return_exceptions=True)
+
+    def _result(self, error=""):
+        returncode = self.process.returncode if self.process.returncode is not None else -1
+        return JobResult(
+            success=returncode == 0 and not self.cancelled and not error,
+            returncode=returncode,
+            elapsed=time.monotonic() - self.started_at,
+            stderr="\n".join(self._stderr),
+            progress=self.progress,
+            cancelled=self.cancelled,
+            error=error,
+            job_id=self.job_id,
+            command=self.command
+        )
+
+
+class OutputPipe:
+    """أنبوب لمخرج FFmpeg في الذاكرة (stdout محجوز لـ -progress)
+
+    الطرف الكاتب يُمرر للعملية برقمه نفسه (pass_fds)، فالمخرج هو pipe:{write_fd}.
+    """
+
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+
+    @property
+    def url(self):
+        return f"pipe:{self.write_fd}"
+
+    def close_writer(self):
+        """إغلاق نسختنا من الطرف الكاتب بعد بدء العملية (وإلا لا يصل EOF)"""
+        if self.write_fd is not None:
+            os.close(self.write_fd)
+            self.write_fd = None
+
+    async def reader(self, limit=1024 * 1024):
+        """StreamReader غير حاجب للطرف القارئ (يُغلق مع النقل عند EOF)"""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=limit)
+        read_file, self.read_fd = os.fdopen(self.read_fd, "rb", buffering=0), None
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), read_file)
+        return reader
+
+    def close(self):
+        self.close_writer()
+        if self.read_fd is not None:
+            os.close(self.read_fd)
+            self.read_fd = None
+
+
+class FFmpegRunner:
+    """مشغل مهام FFmpeg/FFprobe عبر asyncio"""
+
+    async def start(self, args, on_progress=None, pass_fds=()):
+        """بدء مهمة طويلة (مثل المسجل الدائم) دون انتظارها"""
+        return await FFmpegJob(args, on_progress, pass_fds).start()
+
+    async def run(self, args, on_progress=None, timeout=None):
+        """تشغيل مهمة حتى النهاية وإرجاع JobResult"""
+        try:
+            job = await self.start(args, on_progress)
+        except FileNotFoundError:
+            return JobResult(success=False, returncode=-1, elapsed=0.0, error="FFmpeg not found")
+        return await job.wait(timeout)
+
+    async def probe(self, target, timeout=15):
+        """قراءة معلومات ملف أو رابط عبر ffprobe بصيغة JSON"""
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "ffprobe", "-v", "error",
+                "-show_entries", "format=duration,size,format_name:stream=index,codec_type,codec_name,profile,pix_fmt,width,height,avg_frame_rate,sample_rate,channels",
+                "-of", "json",
+                target,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except FileNotFoundError:
+            return ProbeResult(success=False, error="FFprobe not found")
+
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return ProbeResult(success=False, error="Timeout expired")
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+
+        if process.returncode != 0:
+            return ProbeResult(success=False, error=stderr.decode(errors="replace").strip()[-500:])
+
+        try:
+            data = json.loads(stdout)
+        except json.JSONDecodeError:
+            return ProbeResult(success=False, error="Invalid ffprobe output")
+
+        fmt = data.get("format", {})
+        return ProbeResult(
+            success=True,
+            duration=float(fmt.get("duration") or 0.0),
+            size=int(fmt.get("size") or 0),
+            format_name=fmt.get("format_name", ""),
+            streams=data.get("streams", [])
+        )
@@ -0,0 +1,107 @@
+# fingerprint.py - بصمة إدراكية للمقاطع لكشف الصورة المتجمدة المتكررة قبل الرفع
+from collections import deque
+import numpy as np
+
+# حجم الإطار المصغر (رمادي) وعدد الإطارات المأخوذة ونوافذ طاقة الصوت
+FRAME_SIZE = 16
+FRAME_SAMPLES = 4
+ENERGY_BANDS = 16
+
+# حدود التطابق: نسبة البتات المختلفة، وفرق الطاقة بالديسيبل، وحركة الإطار المتجمد (من 255)
+MAX_BIT_DISTANCE = 0.06
+MAX_ENERGY_DB = 3.0
+FROZEN_MOTION = 0.5
+
+
+class ClipFingerprint:
+    """hash متوسط لإطارات مفتاحية مصغرة + منحنى طاقة الصوت ومقدار الحركة بين الإطارات
+
+    motion=None: إطار مفتاحي واحد (مقطع قصير) فالحركة غير معروفة.
+    """
+
+    def __init__(self, bits, energy=None, motion=None):
+        self.bits = bits
+        self.energy = energy
+        self.motion = motion
+
+    @classmethod
+    def from_raw(cls, video, audio=None):
+        """من إطارات رمادية FRAME_SIZE² (rawvideo) وعينات s16le أحادية؛ None بلا إطارات"""
+        pixels = np.frombuffer(video, dtype=np.uint8)
+        count = len(pixels) // (FRAME_SIZE * FRAME_SIZE)
+        if count == 0:
+            return None
+        frames = pixels[:count * FRAME_SIZE * FRAME_SIZE].reshape(count, -1).astype(np.float32)
+        picks = frames[np.linspace(0, count - 1, FRAME_SAMPLES).round().astype(np.intp)]
+        bits = picks > picks.mean(axis=1, keepdims=True)
+        motion = float(np.abs(np.diff(frames, axis=0)).mean()) if count > 1 else None
+
+        energy = None
+        samples = np.frombuffer(audio[:len(audio) // 2 * 2], dtype="<i2") if audio else np.empty(0)
+        if len(samples) >= ENERGY_BANDS:
+            windows = samples[:len(samples) // ENERGY_BANDS * ENERGY_BANDS].reshape(ENERGY_BANDS, -1)
+            rms = np.sqrt(((windows.astype(np.float32) / 32768) ** 2).mean(axis=1))
+            energy = 20 * np.log10(np.maximum(rms, 1e-4))
+        return cls(bits, energy, motion)
+
+    @property
+    def frozen(self):
+        # حركة غير مقيسة لا تُعد تجمداً: المقطع يُرسل
+        return self.motion is not None and self.motion < FROZEN_MOTION
+
+
+class FingerprintCache:
+    """آخر البصمات المرسلة (LRU صغير) ومقارنة البصمة الجديدة بها كلها دفعة واحدة
+
+    لا يُكبت إلا المقطع المتجمد (حركة تحت FROZEN_MOTION) المطابق لمقطع حديث: البصمة
+    المصغرة تطابق أي بث متحرك بتخطيط ثابت فلا تكفي وحدها للحكم بالتكرار.
+    بعد max_suppressed مقاطع مكبوتة متتالية يُرسل مقطع واحد حتى لا يبدو البث متوقفاً.
+    """
+
+    def __init__(self, size=16, max_suppressed=10):
+        self.entries = deque(maxlen=size)
+        self.max_suppressed = max_suppressed
+        self.checked = 0
+        self.suppressed = 0
+        self.run = 0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            size=max(1, int(config.get("DEDUP_HISTORY", 16))),
+            max_suppressed=int(config.get("DEDUP_MAX_SUPPRESSED", 10))
+        )
+
+    def _find(self, fingerprint):
+        """موضع أول بصمة مطابقة في الذاكرة أو None"""
+        candidates = [i for i, entry in enumerate(self.entries) if entry.bits.shape == fingerprint.bits.shape]
+        if not candidates:
+            return None
+        bits = np.stack([self.entries[i].bits for i in candidates])
+        distance = (bits != fingerprint.bits).mean(axis=(1, 2))
+        for index in np.flatnonzero(distance <= MAX_BIT_DISTANCE):
+            entry = self.entries[candidates[index]]
+            if (entry.energy is None) != (fingerprint.energy is None):
+                continue
+            if entry.energy is None or np.abs(entry.energy - fingerprint.energy).mean() <= MAX_ENERGY_DB:
+                return candidates[index]
+        return None
+
+    def check(self, fingerprint):
+        """سبب كبت المقطع ("frozen") أو None ليُرسل"""
+        self.checked += 1
+        index = self._find(fingerprint) if fingerprint.frozen else None
+        if index is not None and self.run < self.max_suppressed:
+            # المطابق يصبح الأحدث فيبقى في الذاكرة ما دام يتكرر
+            entry = self.entries[index]
+            del self.entries[index]
+            self.entries.append(entry)
+            self.run += 1
+            self.suppressed += 1
+            return "frozen"
+        self.run = 0
+        self.entries.append(fingerprint)
+        return None
+
+    def describe(self):
+        return f"متجمد: {self.suppressed} | من {self.checked} مقاطع"
@@ -0,0 +1,248 @@
+# fmp4.py - تقسيم MP4 المجزأ (fMP4) القادم من أنبوب المسجل إلى مقاطع في الذاكرة
+import struct
+
+
+def box_header(data, offset, end):
+    """(الحجم، النوع، طول الرأس) للصندوق عند offset أو None إذا لم يكتمل رأسه
+
+    الحجم 0 (حتى نهاية الملف) يُرجع None: في الأنبوب لا نعرف النهاية بعد.
+    """
+    if offset + 8 > end:
+        return None
+    size, kind = struct.unpack_from(">I4s", data, offset)
+    if size == 1:
+        if offset + 16 > end:
+            return None
+        return struct.unpack_from(">Q", data, offset + 8)[0], kind, 16
+    if size < 8:
+        return None
+    return size, kind, 8
+
+
+def iter_boxes(data, offset=0, end=None):
+    """(النوع، بداية المحتوى، نهاية الصندوق) لكل صندوق مكتمل في data[offset:end]"""
+    end = len(data) if end is None else end
+    while True:
+        header = box_header(data, offset, end)
+        if header is None or offset + header[0] > end:
+            return
+        size, kind, length = header
+        yield kind, offset + length, offset + size
+        offset += size
+
+
+def find_box(data, path, offset=0, end=None):
+    """بداية ونهاية محتوى أول صندوق على المسار (مثل [b"mdia", b"mdhd"]) أو None"""
+    for kind, start, stop in iter_boxes(data, offset, end):
+        if kind == path[0]:
+            if len(path) == 1:
+                return start, stop
+            found = find_box(data, path[1:], start, stop)
+            if found:
+                return found
+    return None
+
+
+def _full_box_field(data, start, v0_offset, v1_offset, v1_wide=False):
+    """قراءة حقل من FullBox حسب نسخته (0 = حقول 32 بت، 1 = 64 بت)"""
+    version = data[start]
+    if version == 1:
+        return struct.unpack_from(">Q" if v1_wide else ">I", data, start + v1_offset)[0]
+    return struct.unpack_from(">I", data, start + v0_offset)[0]
+
+
+def read_tracks(moov):
+    """{track_id: (handler, timescale)} من صندوق moov كامل"""
+    tracks = {}
+    for kind, start, stop in iter_boxes(moov, 8):
+        if kind != b"trak":
+            continue
+        tkhd = find_box(moov, [b"tkhd"], start, stop)
+        mdhd = find_box(moov, [b"mdia", b"mdhd"], start, stop)
+        hdlr = find_box(moov, [b"mdia", b"hdlr"], start, stop)
+        if not (tkhd and mdhd and hdlr):
+            continue
+        track_id = _full_box_field(moov, tkhd[0], 12, 20)
+        timescale = _full_box_field(moov, mdhd[0], 12, 20)
+        handler = bytes(moov[hdlr[0] + 8:hdlr[0] + 12])
+        tracks[track_id] = (handler, timescale)
+    return tracks
+
+
+def read_fragment_time(moof, track_id):
+    """baseMediaDecodeTime لمسار معين في صندوق moof أو None"""
+    for kind, start, stop in iter_boxes(moof, 8):
+        if kind != b"traf":
+            continue
+        tfhd = find_box(moof, [b"tfhd"], start, stop)
+        if not tfhd or struct.unpack_from(">I", moof, tfhd[0] + 4)[0] != track_id:
+            continue
+        tfdt = find_box(moof, [b"tfdt"], start, stop)
+        if tfdt:
+            return _full_box_field(moof, tfdt[0], 4, 4, v1_wide=True)
+    return None
+
+
+def read_sample_defaults(moov):
+    """{track_id: default_sample_duration} من صناديق trex (moov فارغ في fMP4)"""
+    defaults = {}
+    mvex = find_box(moov, [b"mvex"], 8)
+    if not mvex:
+        return defaults
+    for kind, start, _ in iter_boxes(moov, *mvex):
+        if kind == b"trex":
+            track_id, _, duration = struct.unpack_from(">III", moov, start + 4)
+            defaults[track_id] = duration
+    return defaults
+
+
+def read_fragment_duration(moof, track_id, default_duration=0):
+    """مجموع مدد عينات مسار في صندوق moof (بوحدة timescale) أو None
+
+    المدة من trun لكل عينة إن وُجدت، وإلا المدة الافتراضية من tfhd أو trex.
+    """
+    for kind, start, stop in iter_boxes(moof, 8):
+        if kind != b"traf":
+            continue
+        tfhd = find_box(moof, [b"tfhd"], start, stop)
+        if not tfhd or struct.unpack_from(">I", moof, tfhd[0] + 4)[0] != track_id:
+            continue
+        flags = struct.unpack_from(">I", moof, tfhd[0])[0] & 0xFFFFFF
+        # base-data-offset (8) و sample-description-index (4) قبل default-sample-duration
+        offset = tfhd[0] + 8 + (8 if flags & 0x01 else 0) + (4 if flags & 0x02 else 0)
+        if flags & 0x08:
+            default_duration = struct.unpack_from(">I", moof, offset)[0]
+        total = 0
+        for box_kind, box_start, _ in iter_boxes(moof, start, stop):
+            if box_kind != b"trun":
+                continue
+            flags = struct.unpack_from(">I", moof, box_start)[0] & 0xFFFFFF
+            count = struct.unpack_from(">I", moof, box_start + 4)[0]
+            if not flags & 0x100:
+                total += count * default_duration
+                continue
+            # data-offset و first-sample-flags، ثم حقول كل عينة (المدة أولها)
+            offset = box_start + 8 + (4 if flags & 0x01 else 0) + (4 if flags & 0x04 else 0)
+            stride = 4 * bin(flags & 0xF00).count("1")
+            total += sum(struct.unpack_from(">I", moof, offset + i * stride)[0] for i in range(count))
+        return total or None
+    return None
+
+
+class MemoryClip:
+    """مقطع MP4 كامل في الذاكرة (init + أجزاء) جاهز للرفع دون ملف"""
+
+    def __init__(self, name, data, start, end):
+        self.name = name
+        self.data = data
+        self.start = start
+        self.end = end
+
+    @property
+    def size(self):
+        return len(self.data)
+
+    def spill(self, path):
+        """كتابة المقطع إلى ملف (لمعالجة تحتاج مساراً مثل إعادة الضغط)"""
+        with open(path, "wb") as f:
+            f.write(self.data)
+        return path
+
+
+class FragmentSplitter:
+    """يجمع أجزاء fMP4 (moof+mdat يبدأ كل منها بإطار مفتاحي) في مقاطع بمدة clip_duration
+
+    يُخرج المقطع فور وصول mdat الجزء الذي تبلغ به مدته المطلوبة (نهاية الجزء من
+    مدد عيناته) دون انتظار moof التالي، أي دون انتظار GOP كامل إضافي. كل مقطع
+    يبدأ بنسخة من init (ftyp+moov) فيُشغل وحده.
+    """
+
+    def __init__(self, clip_duration, name_prefix):
+        self.clip_duration = clip_duration
+        self.name_prefix = name_prefix
+        self.init = b""
+        self.track_id = None
+        self.timescale = None
+        self.default_duration = 0
+        self.clips = 0
+        self._buffer = bytearray()
+        self._parts = []
+        self._clip_start = None
+        self._last_fragment = None
+        self._fragment_span = clip_duration
+        # نهاية آخر جزء بدأ (بداية moof + مدة عيناته)
+        self._fragment_end = None
+
+    def feed(self, data):
+        """إضافة بيانات من الأنبوب وإرجاع المقاطع التي اكتملت بها"""
+        self._buffer += data
+        ready = []
+        offset = 0
+        while True:
+            header = box_header(self._buffer, offset, len(self._buffer))
+            if header is None or offset + header[0] > len(self._buffer):
+                break
+            size, kind, _ = header
+            clip = self._on_box(kind, bytes(self._buffer[offset:offset + size]))
+            offset += size
+            if clip:
+                ready.append(clip)
+        del self._buffer[:offset]
+        return ready
+
+    def _on_box(self, kind, box):
+        if kind in (b"ftyp", b"moov"):
+            self.init += box
+            if kind == b"moov":
+                self._select_track(box)
+            return None
+
+        if kind == b"moof" and self.timescale:
+            time = read_fragment_time(box, self.track_id)
+            if time is not None:
+                time /= self.timescale
+                duration = read_fragment_duration(box, self.track_id, self.default_duration)
+                if duration:
+                    self._fragment_span = duration / self.timescale
+                elif self._last_fragment is not None and time > self._last_fragment:
+                    # بلا مدد عينات: تقدير بالمسافة بين الجزأين الأخيرين
+                    self._fragment_span = time - self._last_fragment
+                self._last_fragment = time
+                self._fragment_end = time + self._fragment_span
+                if self._clip_start is None:
+                    self._clip_start = time
+        self._parts.append(box)
+
+        if (kind == b"mdat" and self._clip_start is not None and self._fragment_end is not None
+                and self._fragment_end - self._clip_start >= self.clip_duration - 0.001):
+            clip = self._emit(self._fragment_end)
+            self._clip_start = None
+            return clip
+        return None
+
+    def _select_track(self, moov):
+        tracks = read_tracks(moov)
+        # القطع على أجزاء مسار الفيديو (أجزاؤه تبدأ بإطارات مفتاحية)، أو أول مسار
+        for track_id, (handler, timescale) in sorted(tracks.items()):
+            if handler == b"vide" or self.track_id is None:
+                self.track_id, self.timescale = track_id, timescale
+                if handler == b"vide":
+                    break
+        self.default_duration = read_sample_defaults(moov).get(self.track_id, 0)
+
+    def _emit(self, end):
+        self.clips += 1
+        clip = MemoryClip(
+            f"{self.name_prefix}_{self.clips:05d}.mp4",
+            b"".join([self.init] + self._parts),
+            self._clip_start,
+            end
+        )
+        self._parts = []
+        return clip
+
+    def flush(self):
+        """المقطع الأخير الناقص بعد انتهاء الأنبوب (نهايته تقديرية بطول آخر جزء)"""
+        if not self._parts or self._clip_start is None or not self.init:
+            return None
+        return self._emit(self._fragment_end)
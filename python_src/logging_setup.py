@@ -0,0 +1,127 @@
+# logging_setup.py - تسجيل غير حاجب: طابور + JSON Lines مع معرّف ربط لكل مقطع/مهمة
+import contextlib
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+# معرّف الربط الحالي (مقطع أو مهمة)، يُنسخ تلقائياً إلى مهام asyncio المنشأة بعده
+_correlation_id = contextvars.ContextVar("correlation_id", default=None)
+
+# حقول LogRecord القياسية؛ كل ما عداها (من extra=) يُكتب في سطر JSON
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "correlation_id"}
+
+
+def get_correlation_id():
+    return _correlation_id.get()
+
+
+@contextlib.contextmanager
+def correlation(correlation_id):
+    """ربط كل السجلات داخل الكتلة (والمهام المنشأة فيها) بمعرّف واحد"""
+    token = _correlation_id.set(correlation_id)
+    try:
+        yield correlation_id
+    finally:
+        _correlation_id.reset(token)
+
+
+class CorrelationFilter(logging.Filter):
+    """يضيف معرّف الربط للسجل في خيط المستدعي قبل دخوله الطابور"""
+
+    def filter(self, record):
+        if not hasattr(record, "correlation_id"):
+            record.correlation_id = _correlation_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """سطر JSON لكل سجل مع الحقول الإضافية (مثل stderr الخاص بمهمة FFmpeg)"""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "correlation_id", None):
+            entry["cid"] = record.correlation_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """سطر مختصر للطرفية كما كانت رسائل print مع معرّف الربط إن وُجد"""
+
+    def format(self, record):
+        message = record.getMessage()
+        if record.exc_text:
+            message = f"{message}\n{record.exc_text}"
+        cid = getattr(record, "correlation_id", None)
+        return f"[{cid}] {message}" if cid else message
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler يبقي الاستثناء في exc_text بدل دمجه في نص الرسالة
+
+    prepare الأصلي ينسق السجل كاملاً ثم يحذف exc_info، فلا يصل الاستثناء
+    إلى JsonFormatter كحقل منفصل.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(log_dir="logs", level="INFO", max_bytes=10 * 1024 * 1024, backups=5, console=True):
+    """تهيئة التسجيل: المستدعي يضع السجل في طابور فقط، وخيط مستقل يكتب الملف والطرفية
+
+    يرجع QueueListener (يجب إيقافه عند الخروج لتفريغ الطابور).
+    """
+    os.makedirs(log_dir, exist_ok=True)
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(log_dir, "bot.jsonl"),
+        maxBytes=max_bytes,
+        backupCount=backups,
+        encoding="utf-8"
+    )
+    file_handler.setFormatter(JsonFormatter())
+    handlers = [file_handler]
+
+    if console:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(ConsoleFormatter())
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(CorrelationFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+    # مكتبات الشبكة كثيرة السجلات على مستوى INFO
+    for noisy in ("httpx", "telegram", "aiohttp.access"):
+        logging.getLogger(noisy).setLevel(logging.WARNING)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
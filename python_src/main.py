@@ -1,12 +1,18 @@
 # main.py - الملف الرئيسي للبوت
 import asyncio
+import logging
 import time
 from telegram import Update, Bot
 from telegram.ext import Application, CommandHandler, MessageHandler, filters
+from python_src import metrics
 from python_src.config_manager import ConfigManager
+from python_src.logging_setup import setup_logging
 from python_src.web_server import start_web_server
 from python_src.bot_commands import BotCommands
-from python_src.streaming import BroadcastController
+from python_src.sessions import SessionManager
+from python_src.subscribers import SubscriberStore
+
+logger = logging.getLogger(__name__)
 
 async def main():
     """الدالة الرئيسية"""
@@ -14,6 +20,21 @@ async def main():
     # تحميل الإعدادات
     config = ConfigManager("config.json")
     
+    # التسجيل عبر طابور: الكتابة للملف والطرفية في خيط مستقل
+    log_listener = setup_logging(
+        level=config.get("LOG_LEVEL", "INFO"),
+        max_bytes=int(float(config.get("LOG_MAX_MB", 10)) * 1024 * 1024)
+    )
+    logger.info("=" * 60)
+    logger.info("🚀 تليجرام بوت للبث المباشر - Python + FFmpeg Integration")
+    logger.info("=" * 60)
+    try:
+        await _run(config)
+    finally:
+        log_listener.stop()
+
+async def _run(config):
+    """تشغيل البوت بعد تهيئة الإعدادات والتسجيل"""
     # التحقق من المتغيرات المطلوبة
     if not config.validate_required_vars():
         exit(1)
@@ -23,34 +44,53 @@ async def main():
     
     # المتغيرات المشتركة
     stats = {"clips_sent": 0, "clips_failed": 0, "uptime_start": time.time()}
-    active_users = []
+    subscribers = SubscriberStore(config.get("SUBSCRIBERS_DB", "data/subscribers.db"))
+    subscribers_flusher = asyncio.create_task(subscribers.run_flusher())
+    
+    # مقاييس الأداء (/metrics) وقياس تأخر حلقة الأحداث
+    metrics.register_stats(stats)
+    loop_monitor = asyncio.create_task(metrics.monitor_event_loop())
     
     # إضافة المالك للمشتركين
     owner_id = str(config.get("YOUR_USER_ID"))
-    if owner_id not in active_users:
-        active_users.append(owner_id)
+    subscribers.add(owner_id)
     
     # تعديل معرف القناة إذا لزم الأمر
     channel_id = str(config.get("CHANNEL_ID")).strip()
     if not channel_id.startswith("-100") and not channel_id.startswith("@"):
         if not channel_id.startswith("-"):
             channel_id = f"-100{channel_id}"
-        config.set("CHANNEL_ID", channel_id)
+        # قيمة مشتقة من البيئة: لا تُكتب في config.json
+        config.set("CHANNEL_ID", channel_id, persist=False)
     
-    print(f"👥 المشتركين: {len(active_users)}")
-    print(f"📺 القناة: {channel_id}")
-    print(f"🔧 Architecture: Python + Bash")
+    logger.info(f"👥 المشتركين: {len(subscribers)}")
+    logger.info(f"📺 القناة: {channel_id}")
+    logger.info("🔧 Architecture: Python + FFmpeg")
     
-    # إنشاء متحكم البث
-    broadcast_controller = BroadcastController(config, bot, stats, active_users)
+    # إنشاء جلسات البث (الجلسة الافتراضية من SOURCE_URL/CHANNEL_ID + SESSIONS)
+    sessions = SessionManager(config, bot, stats, subscribers)
+    logger.info(f"📡 الجلسات: {', '.join(sessions.names())}")
     
     # إنشاء معالجات الأوامر
-    bot_commands = BotCommands(config, stats, active_users, broadcast_controller)
+    bot_commands = BotCommands(config, stats, subscribers, sessions.default, sessions)
+    
+    # إعادة تحميل config.json عند تعديله (تُطبق على الجلسات دون إيقاف البث)
+    config_watcher = asyncio.create_task(config.watch())
     
     # تشغيل خادم الويب
-    asyncio.create_task(start_web_server())
+    asyncio.create_task(start_web_server(config))
     
-    # حلقة رئيسية مع إعادة المحاولة
+    # مهام الخلفية تُلغى عند إيقاف البوت (run_flusher يحفظ ما بقي من المشتركين)
+    background = [subscribers_flusher, loop_monitor, config_watcher]
+    try:
+        await _serve(config, bot_commands)
+    finally:
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+
+async def _serve(config, bot_commands):
+    """حلقة البوت الرئيسية مع إعادة المحاولة"""
     while True:
         try:
             application = Application.builder().token(config.get("BOT_TOKEN")).build()
@@ -63,6 +103,12 @@ async def main():
             application.add_handler(CommandHandler("stats", bot_commands.stats_command))
             application.add_handler(CommandHandler("setbottom", bot_commands.setbottom_command))
             application.add_handler(CommandHandler("wbottom", bot_commands.wbottom_command))
+            application.add_handler(CommandHandler("profile", bot_commands.profile_command))
+            application.add_handler(CommandHandler("quality", bot_commands.quality_command))
+            application.add_handler(CommandHandler("sessions", bot_commands.sessions_command))
+            application.add_handler(CommandHandler("session_start", bot_commands.session_start_command))
+            application.add_handler(CommandHandler("session_stop", bot_commands.session_stop_command))
+            application.add_handler(CommandHandler("replay", bot_commands.replay_command))
             application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot_commands.any_message))
             
             # تهيئة البوت
@@ -75,16 +121,16 @@ async def main():
                     allowed_updates=Update.ALL_TYPES
                 )
             
-            print("✅ البوت يعمل")
-            print("⏸️  استخدم /startLIVE للبدء")
-            print("🚀 Python + Bash Integration Active")
+            logger.info("✅ البوت يعمل")
+            logger.info("⏸️  استخدم /startLIVE للبدء")
+            logger.info("🚀 Python + FFmpeg Integration Active")
             
             # انتظار لانهائي
             await asyncio.Event().wait()
             
         except Exception as e:
-            print(f"🚨 خطأ: {str(e)[:100]}")
-            print("🔄 إعادة المحاولة بعد 30ث")
+            logger.error(f"🚨 خطأ: {str(e)[:100]}", exc_info=True)
+            logger.info("🔄 إعادة المحاولة بعد 30ث")
             await asyncio.sleep(30)
 
 if __name__ == "__main__":
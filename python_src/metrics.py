@@ -0,0 +1,295 @@
+# metrics.py - مقاييس الأداء بصيغة Prometheus النصية (بدون مكتبات إضافية)
+import asyncio
+import os
+import resource
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from python_src.encoder_tuning import read_process_cpu_seconds
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """مقياس بأسماء تسميات ثابتة وقيمة لكل مجموعة تسميات"""
+
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        if len(values) != len(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _default(self):
+        # مقياس بلا تسميات يُستخدم مباشرة
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(_format_labels(self.label_names, values), values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        """قيمة تُحسب عند كل قراءة لـ /metrics"""
+        self.function = function
+
+    def get(self):
+        return self.function() if self.function else self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def set_function(self, function):
+        self._default().set_function(function)
+
+    def _render_child(self, labels, values, child):
+        return [f"{self.name}{labels} {_format_value(child.get())}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value):
+        self._default().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10)):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def _render_child(self, labels, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, child.counts):
+            cumulative += count
+            bucket_labels = _format_labels(self.label_names + ("le",), values + (_format_value(bound),))
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Registry:
+    """كل المقاييس المسجلة بترتيب إنشائها"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+RECORD_DURATION = REGISTRY.register(Histogram(
+    "bot_record_duration_seconds", "Media duration of each recorded segment",
+    ["session"], buckets=(1, 2, 4, 6, 8, 10, 12, 15, 20, 30)
+))
+CLIP_BOUNDARIES = REGISTRY.register(Counter(
+    "bot_clip_boundaries_total", "Adaptive clip cuts by reason (scene, silence, target, final, static = skipped)",
+    ["session", "reason"]
+))
+CLIPS_SUPPRESSED = REGISTRY.register(Counter(
+    "bot_clips_suppressed_total", "Clips not uploaded because their fingerprint matched a recent clip",
+    ["session", "reason"]
+))
+CLIPS_DROPPED = REGISTRY.register(Counter(
+    "bot_clips_dropped_total", "Low-latency clips skipped because a newer clip was already waiting", ["session"]
+))
+ENCODE_SPEED = REGISTRY.register(Gauge(
+    "bot_encode_speed_ratio", "Recorder encode speed relative to real time", ["session"]
+))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "bot_queue_depth", "Clips waiting in the send queue", ["session"]
+))
+CLIP_BYTES = REGISTRY.register(Histogram(
+    "bot_clip_bytes", "Size of each prepared clip file", ["session", "tier"],
+    buckets=tuple(mb * 1024 * 1024 for mb in (0.25, 0.5, 1, 2, 4, 8, 16, 20, 32, 50))
+))
+UPLOAD_SECONDS = REGISTRY.register(Histogram(
+    "bot_upload_seconds", "Telegram send latency per destination (upload or file_id)",
+    ["session", "destination", "method"], buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+))
+END_TO_END_SECONDS = REGISTRY.register(Histogram(
+    "bot_capture_to_delivery_seconds", "From the last captured frame of a clip to the end of its fan-out",
+    ["session"], buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 60)
+))
+DELIVERIES = REGISTRY.register(Counter(
+    "bot_deliveries_total", "Per-destination clip delivery outcomes (delivered, failed, retried, expired)",
+    ["session", "outcome"]
+))
+SEND_FAILURES = REGISTRY.register(Counter(
+    "bot_send_failures_total", "Failed Telegram sends by error type", ["session", "error"]
+))
+SPOOL_BYTES = REGISTRY.register(Gauge(
+    "bot_spool_bytes", "Bytes of clip files currently in the spool directory"
+))
+SPOOL_DROPPED = REGISTRY.register(Counter(
+    "bot_spool_dropped_total", "Segments skipped because the spool stayed full", ["session"]
+))
+LOOP_LAG = REGISTRY.register(Gauge(
+    "bot_event_loop_lag_seconds", "Most recent asyncio event loop scheduling delay"
+))
+LOOP_LAG_HISTOGRAM = REGISTRY.register(Histogram(
+    "bot_event_loop_lag_distribution_seconds", "Asyncio event loop scheduling delay",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+))
+PROCESS_RSS = REGISTRY.register(Gauge(
+    "process_resident_memory_bytes", "Resident memory size in bytes"
+))
+PROCESS_CPU = REGISTRY.register(Counter(
+    "process_cpu_seconds_total", "Total user and system CPU time spent in seconds"
+))
+
+
+def read_rss_bytes():
+    """الذاكرة المقيمة للعملية من /proc، أو ذروتها من resource على الأنظمة الأخرى"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _process_cpu_seconds():
+    cpu = read_process_cpu_seconds(os.getpid())
+    return cpu if cpu is not None else time.process_time()
+
+
+PROCESS_RSS.set_function(read_rss_bytes)
+PROCESS_CPU.set_function(_process_cpu_seconds)
+
+
+def register_stats(stats):
+    """عدادات قاموس stats المشترك كمقاييس"""
+    for key, help_text in (
+        ("clips_sent", "Clips delivered"),
+        ("clips_failed", "Recorder failures"),
+    ):
+        counter = REGISTRY.register(Counter(f"bot_{key}_total", help_text))
+        counter.set_function(lambda key=key: stats.get(key, 0))
+
+
+async def monitor_event_loop(interval=0.5):
+    """قياس تأخر حلقة الأحداث: الفرق بين موعد الاستيقاظ المطلوب والفعلي"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        LOOP_LAG.set(lag)
+        LOOP_LAG_HISTOGRAM.observe(lag)
+
+
+def sample_profile(seconds, interval=0.005):
+    """محلل بالعينات: يلتقط مكدسات كل الخيوط كل interval لمدة seconds
+
+    يعمل في خيط منفصل (asyncio.to_thread) فيرى حلقة الأحداث وهي تعمل.
+    يرجع المكدسات بصيغة collapsed (مناسبة لـ flamegraph.pl و speedscope).
+    """
+    own = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    tally = _Tally()
+    samples = 0
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            tally[";".join(reversed(stack))] += 1
+        samples += 1
+        time.sleep(interval)
+
+    lines = [f"{stack} {count}" for stack, count in tally.most_common()]
+    return f"# {samples} samples over {seconds}s every {interval * 1000:.0f}ms\n" + "\n".join(lines) + "\n"
@@ -0,0 +1,145 @@
+# replay.py - حلقة المقاطع الأخيرة المرسلة لاستخراج إعادة (/replay) بالنسخ المباشر
+import bisect
+import os
+from python_src.fmp4 import MemoryClip
+
+
+def clip_bytes(clip):
+    if isinstance(clip, MemoryClip):
+        return clip.size
+    try:
+        return os.path.getsize(clip)
+    except OSError:
+        return 0
+
+
+class ReplayBuffer:
+    """آخر المقاطع (ملفات في مجلد المقاطع أو MemoryClip) مرتبة بموضعها في البث
+
+    الحد بالمدة الإجمالية وبالبايتات؛ الأقدم يُسلم إلى on_evict ليُحذف. الفهرس
+    قائمة بدايات المقاطع فيُبحث عن موضع بـ bisect دون فتح أي ملف. المقاطع
+    المطلوبة لاستخراج جارٍ لا تُحذف حتى ينتهي (pin/unpin)، وتبقى بايتاتها في
+    bytes حتى تُحذف فعلاً. كل المقاطع في الحلقة بنفس مفتاح الترميز (stream_key).
+    """
+
+    def __init__(self, max_seconds=300, max_bytes=150 * 1024 * 1024, on_evict=None):
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.starts = []
+        self.segments = []
+        self.bytes = 0
+        self.stream_key = None
+        self._pins = 0
+        self._deferred = []
+        self._deferred_bytes = 0
+
+    @classmethod
+    def from_config(cls, config, on_evict=None):
+        return cls(
+            max_seconds=float(config.get("REPLAY_SECONDS", 300)),
+            max_bytes=int(float(config.get("REPLAY_MAX_MB", 150)) * 1024 * 1024),
+            on_evict=on_evict
+        )
+
+    def __len__(self):
+        return len(self.segments)
+
+    @property
+    def enabled(self):
+        return self.max_seconds > 0 and self.max_bytes > 0
+
+    def duration(self):
+        return sum(end - start for start, end, _, _ in self.segments)
+
+    def add(self, start, end, clip, stream_key=None):
+        """إضافة مقطع انتهى إرساله؛ يرجع False (ولا يحتفظ به) إذا كانت الحلقة معطلة
+
+        stream_key: إعدادات ترميز المقطع؛ تغيرها يبدأ حلقة جديدة لأن الدمج بالنسخ
+        المباشر يتطلب نفس الترميز في كل المقاطع.
+        """
+        if not self.enabled or end <= start:
+            return False
+        if self.starts and (start < self.starts[-1] or stream_key != self.stream_key):
+            # تشغيل جديد للبث بدأ من الصفر أو ترميز مختلف: ما قبله لا يتصل به
+            self.clear()
+        self.stream_key = stream_key
+        size = clip_bytes(clip)
+        self.starts.append(start)
+        self.segments.append((start, end, clip, size))
+        self.bytes += size
+        self._trim()
+        return True
+
+    def resize(self, max_seconds, max_bytes):
+        """تغيير الحدود أثناء التشغيل (تصغيرها يحذف الأقدم فوراً)"""
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self._trim()
+
+    def _trim(self):
+        # المؤجل حذفه خرج من الحلقة فلا يُحسب في حدها
+        while self.segments and (
+            self.bytes - self._deferred_bytes > self.max_bytes or self.duration() > self.max_seconds
+        ):
+            self._pop_oldest()
+
+    def evict_oldest(self):
+        """حذف أقدم مقطع لإفساح مكان في مجلد المقاطع؛ False إذا لم يتحرر شيء
+
+        أثناء استخراج جارٍ لا يُحذف أي ملف، فلا تُفرغ الحلقة دون فائدة.
+        """
+        if self._pins or not self.segments:
+            return False
+        self._pop_oldest()
+        return True
+
+    def _pop_oldest(self):
+        self.starts.pop(0)
+        _, _, clip, size = self.segments.pop(0)
+        if self._pins:
+            self._deferred.append((clip, size))
+            self._deferred_bytes += size
+        else:
+            self._evict(clip, size)
+
+    def _evict(self, clip, size):
+        self.bytes -= size
+        if self.on_evict:
+            self.on_evict(clip)
+
+    def select(self, seconds, max_bytes=None):
+        """المقاطع التي تغطي آخر seconds ثانية من البث (من المقطع الذي يحوي بدايتها)
+
+        max_bytes: تُترك أقدم المقاطع المختارة حتى يصغر المجموع عنه (حد الرفع).
+        """
+        if not self.segments:
+            return []
+        target = self.segments[-1][1] - seconds
+        index = max(0, bisect.bisect_right(self.starts, target) - 1)
+        if max_bytes is not None:
+            total = sum(size for _, _, _, size in self.segments[index:])
+            while total > max_bytes and index < len(self.segments) - 1:
+                total -= self.segments[index][3]
+                index += 1
+        return [(start, end, clip) for start, end, clip, _ in self.segments[index:]]
+
+    def pin(self):
+        self._pins += 1
+
+    def unpin(self):
+        self._pins -= 1
+        if not self._pins:
+            deferred, self._deferred = self._deferred, []
+            self._deferred_bytes = 0
+            for clip, size in deferred:
+                self._evict(clip, size)
+
+    def clear(self):
+        while self.segments:
+            self._pop_oldest()
+
+    def describe(self):
+        if not self.enabled:
+            return "معطلة"
+        return f"{self.duration():.0f}/{self.max_seconds:.0f}ث | {self.bytes / 1048576:.1f}MB | {len(self)} مقاطع"
@@ -0,0 +1,139 @@
+# sessions.py - جلسات بث متعددة (مصدر ووجهات لكل جلسة) في عملية واحدة
+import asyncio
+import os
+from types import MappingProxyType
+from python_src.clip_spool import ClipSpool
+from python_src.config_manager import validate
+from python_src.dispatcher import SendDispatcher
+from python_src.ffmpeg_runner import FFmpegRunner
+from python_src.streaming import BroadcastController
+from python_src.watermark import WatermarkCache
+
+DEFAULT_SESSION = "main"
+
+
+class SessionConfig:
+    """إعدادات جلسة: قيم الجلسة أولاً ثم الإعدادات العامة"""
+
+    def __init__(self, base, overrides=None):
+        self.base = base
+        self.overrides = dict(overrides or {})
+
+    def get(self, key, default=None):
+        if key in self.overrides:
+            return self.overrides[key]
+        return self.base.get(key, default)
+
+    def snapshot(self):
+        return MappingProxyType({**self.base.snapshot(), **self.overrides})
+
+    def set(self, key, value, persist=True):
+        # الجلسة الافتراضية بلا قيم خاصة تعدل الإعدادات العامة مباشرة
+        if self.overrides:
+            error = validate(key, value)
+            if error:
+                raise ValueError(f"{key}: {error}")
+            self.overrides[key] = value
+        else:
+            self.base.set(key, value, persist)
+
+
+class EncodeBudget:
+    """ميزانية ترميز مشتركة: عدد المرمّزات المتزامنة وتقسيم المعالجات بينها"""
+
+    def __init__(self, max_encoders=0, cpu_count=None):
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self.max_encoders = max_encoders or self.cpu_count
+        self.active = 0
+        self._slots = asyncio.Semaphore(self.max_encoders)
+
+    async def acquire(self):
+        await self._slots.acquire()
+        self.active += 1
+
+    def full(self):
+        return self._slots.locked()
+
+    def release(self):
+        self.active -= 1
+        self._slots.release()
+
+    def cores_per_encoder(self):
+        """حصة كل مرمّز نشط من معالجات الجهاز"""
+        return max(1, self.cpu_count // max(1, self.active))
+
+    def describe(self):
+        return f"{self.active}/{self.max_encoders} مرمّزات على {self.cpu_count} معالجات"
+
+
+class SessionManager:
+    """إدارة جلسات البث بموزع إرسال واحد وميزانية ترميز واحدة"""
+
+    def __init__(self, config, bot, stats, subscribers):
+        self.config = config
+        self.bot = bot
+        self.stats = stats
+        self.subscribers = subscribers
+
+        self.dispatcher = SendDispatcher(
+            max_concurrency=config.get("SEND_CONCURRENCY", 8),
+            global_rate=config.get("SEND_GLOBAL_RATE", 30)
+        )
+        self.encode_budget = EncodeBudget(int(config.get("MAX_ENCODERS", 0)))
+        # مجلد مقاطع واحد بحصة واحدة لكل الجلسات (يُنظف من بقايا التشغيل السابق هنا)
+        self.spool = ClipSpool.from_config(config)
+        self.watermarks = WatermarkCache(FFmpegRunner(), self.spool)
+
+        # الجلسة الافتراضية من SOURCE_URL/CHANNEL_ID، والبقية من SESSIONS
+        self.sessions = {DEFAULT_SESSION: self._create(DEFAULT_SESSION, SessionConfig(config))}
+        for name, overrides in (config.get("SESSIONS") or {}).items():
+            self.sessions[name] = self._create(name, SessionConfig(config, {
+                # جلسات إضافية لا ترسل للمشتركين إلا إذا طُلب ذلك صراحة
+                "SEND_TO_SUBSCRIBERS": False,
+                **overrides
+            }))
+        config.on_change(self._apply_config)
+
+    def _create(self, name, session_config):
+        return BroadcastController(
+            session_config, self.bot, self.stats, self.subscribers,
+            name=name,
+            dispatcher=self.dispatcher,
+            encode_budget=self.encode_budget,
+            watermarks=self.watermarks,
+            spool=self.spool
+        )
+
+    def _apply_config(self, changed):
+        """تمرير المفاتيح المتغيرة لكل جلسة (عدا ما تحدده الجلسة لنفسها)"""
+        for session in self.sessions.values():
+            keys = changed - set(session.config.overrides)
+            if keys:
+                session.apply_config(keys)
+
+    @property
+    def default(self):
+        return self.sessions[DEFAULT_SESSION]
+
+    def get(self, name):
+        return self.sessions.get(name)
+
+    def names(self):
+        return list(self.sessions)
+
+    def running(self):
+        return [name for name, session in self.sessions.items() if session.is_running()]
+
+    async def start(self, name):
+        session = self.sessions[name]
+        if session.is_running():
+            return False
+        await session.start_broadcast()
+        return True
+
+    async def stop(self, name):
+        session = self.sessions[name]
+        if not session.is_running():
+            return False
+        await session.stop_broadcast()
+        return True
@@ -0,0 +1,84 @@
+# source_monitor.py - مراقبة صحة المصدر المباشر وحساب الفجوات
+import logging
+import random
+import time
+from python_src.encoder_tuning import parse_out_time
+
+logger = logging.getLogger(__name__)
+
+
+class SourceMonitor:
+    """يراقب تقدم زمن الوسائط في اتصال المسجل لاكتشاف التوقف وحساب الفجوات
+
+    اتصال المسجل نفسه هو مسبار المصدر: FFmpeg يكتب كتلة تقدم كل 0.5ث،
+    فإذا لم يتقدم out_time خلال stall_seconds يُعتبر المصدر متوقفاً.
+    """
+
+    def __init__(self, stall_seconds=3.0, connect_timeout=15.0, backoff_base=1.0, backoff_max=30.0):
+        self.stall_seconds = stall_seconds
+        self.connect_timeout = connect_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.connected = False
+        self.failures = 0
+        self.stalls = 0
+        self.reconnects = 0
+        self.gaps = 0
+        self.gap_seconds = 0.0
+        self.last_gap = 0.0
+
+        self._last_media = None
+        self._last_advance = time.monotonic()
+        self._gap_started = None
+
+    def connection_started(self):
+        """اتصال جديد بدأ (عملية مسجل جديدة يبدأ زمنها من الصفر)"""
+        self._last_media = None
+        self._last_advance = time.monotonic()
+
+    def connection_lost(self):
+        """انقطع الاتصال أو توقف - تبدأ الفجوة من آخر تقدم للوسائط"""
+        self.connected = False
+        if self._gap_started is None:
+            self._gap_started = self._last_advance
+
+    def on_progress(self, progress):
+        """تسجيل كتلة تقدم من المسجل"""
+        media = parse_out_time(progress)
+        if media is None or (self._last_media is not None and media <= self._last_media):
+            return
+
+        now = time.monotonic()
+        if not self.connected:
+            self.connected = True
+            self.failures = 0
+            if self._gap_started is not None:
+                # زمن البث الحي الذي فات بين آخر وسائط وأول وسائط في الاتصال الجديد
+                self.last_gap = max(0.0, now - self._gap_started - media)
+                self.gap_seconds += self.last_gap
+                self.gaps += 1
+                self.reconnects += 1
+                self._gap_started = None
+                logger.info(f"🔌 عاد المصدر بعد فجوة {self.last_gap:.1f}ث")
+
+        self._last_media = media
+        self._last_advance = now
+
+    def is_stalled(self):
+        """هل توقف تقدم الوسائط أطول من المسموح"""
+        limit = self.stall_seconds if self._last_media is not None else self.connect_timeout
+        return time.monotonic() - self._last_advance > limit
+
+    def next_backoff(self):
+        """مهلة إعادة الاتصال التالية: أسية مع تشويش عشوائي"""
+        self.failures += 1
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (self.failures - 1))
+        return random.uniform(delay / 2, delay)
+
+    def describe(self):
+        state = "🟢" if self.connected else "🔴"
+        return (
+            f"{state} فجوات: {self.gaps} ({self.gap_seconds:.1f}ث)"
+            f" | توقفات: {self.stalls} | إعادة اتصال: {self.reconnects}"
+        )
@@ -1,259 +1,1491 @@
 # streaming.py - نظام البث (Producer/Consumer)
+import logging
 import time
 import asyncio
 import os
-import threading
-from queue import Queue, Empty
-from concurrent.futures import ThreadPoolExecutor
-from telegram import Bot
-from python_src.bash_interface import BashInterface
+from python_src import metrics, utils
+from python_src.clip_planner import AnalysisLog, ClipPlanner
+from python_src.clip_queue import ResizableQueue
+from python_src.clip_spool import ClipSpool
+from python_src.replay import ReplayBuffer
+from python_src.delivery import ClipHandle, DeliveryLedger, RetryEntry, RetryQueue, is_transient
+from python_src.dispatcher import SendDispatcher
+from python_src.ffmpeg_runner import FFmpegRunner, OutputPipe
+from python_src.fingerprint import ClipFingerprint, FingerprintCache
+from python_src.fmp4 import FragmentSplitter, MemoryClip
+from python_src.logging_setup import correlation
+from python_src.source_monitor import SourceMonitor
+from python_src.watermark import WatermarkCache
+from python_src.encoder_tuning import AdaptiveEncoder, parse_out_time, parse_speed
+from python_src.video_processor import (
+    DEFAULT_TIER, RENDITION_LADDER, EncoderSettings, build_compress_command,
+    TELEGRAM_UPLOAD_LIMIT, analysis_filter_graph, build_audio_command, build_concat_command, build_fingerprint_command, build_segment_command, clip_byte_budget, is_telegram_compatible,
+    rendition_tiers, video_kbps_for_budget
+)
+
+logger = logging.getLogger(__name__)
+
+# إعدادات تُطبق بإعادة تشغيل المسجل عند حدود المقطع (دون إيقاف البث)
+RECORDER_KEYS = {
+    "SOURCE_URL", "CLIP_SECONDS", "LOW_LATENCY", "LOW_LATENCY_CLIP_SECONDS", "MEMORY_CLIPS", "CRF", "KEYFRAME_INTERVAL", "ENCODER_PROFILE", "STREAM_COPY",
+    "ADAPTIVE_CLIPS", "ADAPTIVE_STEP_SECONDS", "ADAPTIVE_MAX_SECONDS", "SCENE_THRESHOLD", "STATIC_SCORE", "SKIP_STATIC",
+    "RENDITIONS", "MAX_CLIP_MB", "BOTTOM_WATERMARK_TEXT", "BOTTOM_WATERMARK_ENABLED",
+    "WATERMARK_FONT", "WATERMARK_FONT_SIZE"
+}
+
+class RenditionOutput:
+    """مخرج مستوى إضافي في عملية المسجل وقائمة مقاطعه المكتملة"""
+    
+    def __init__(self, tier, session, run_id, spool):
+        self.tier = tier
+        self.ext = RENDITION_LADDER[tier]["ext"]
+        self.spool = spool
+        self.list_file = spool.path(f"{session}_segments_{run_id}_{tier}.csv")
+        self.output_pattern = spool.path(f"{session}_clip_{run_id}_%05d_{tier}{self.ext}")
+        self.list_offset = 0
+        self.done = set()
+    
+    def path_for(self, name):
+        """ملف هذا المستوى المقابل لمقطع المخرج الرئيسي بنفس الرقم"""
+        return self.spool.path(f"{name[:-len('.mp4')]}_{self.tier}{self.ext}")
+
+
+class RecorderRun:
+    """تشغيل واحد لعملية المسجل وملفاته"""
+    
+    def __init__(self, run_id, spool, session="main"):
+        self.run_id = run_id
+        self.job = None
+        # اسم الجلسة في أسماء الملفات حتى لا تتصادم الجلسات في مجلد المقاطع
+        self.list_file = spool.path(f"{session}_segments_{run_id}.csv")
+        self.output_pattern = spool.path(f"{session}_clip_{run_id}_%05d.mp4")
+        self.list_offset = 0
+        self.base_position = None
+        self.segments = 0
+        # هل يحجز هذا التشغيل مكاناً في ميزانية الترميز المشتركة
+        self.encode_slot = False
+        # مخرجات المستويات الإضافية، ومقاطع رئيسية تنتظر اكتمال مستوياتها
+        self.renditions = []
+        self.pending = []
+        # الزمن الفعلي المقابل لـ PTS صفر في هذا التشغيل (من أول تقدم للمسجل)
+        self.clock_origin = None
+        # إعدادات الترميز التي تحدد توافق مقاطع هذا التشغيل مع غيره في حلقة الإعادة
+        self.stream_key = None
+        # وضع الذاكرة: أنبوب fMP4 ومقسمه والمقاطع المكتملة بانتظار القائمة
+        self.pipe = None
+        self.splitter = None
+        self.reader = None
+        self.ready = None
+        # الحدود التكيفية: ملفات إشارات التحليل ومخطط تجميع المقاطع القصيرة
+        self.scene_file = spool.path(f"{session}_segments_{run_id}_scenes.txt")
+        self.silence_file = spool.path(f"{session}_segments_{run_id}_silence.txt")
+        self.analysis = None
+        self.planner = None
+
+
+def clip_size(clip):
+    """حجم المقطع بالبايت (ملف أو MemoryClip)، 0 إذا لم يوجد"""
+    if isinstance(clip, MemoryClip):
+        return clip.size
+    return os.path.getsize(clip) if os.path.exists(clip) else 0
+
 
 class BroadcastController:
     """المتحكم الرئيسي في البث"""
     
-    def __init__(self, config, bot, stats, active_users):
+    def __init__(self, config, bot, stats, subscribers, name="main", dispatcher=None, encode_budget=None,
+                 watermarks=None, spool=None):
         self.config = config
         self.bot = bot
         self.stats = stats
-        self.active_users = active_users
+        self.subscribers = subscribers
+        self.name = name
+        
+        # مشغل FFmpeg المباشر
+        self.ffmpeg = FFmpegRunner()
+        
+        # موزع الإرسال (تزامن محدود + حدود Telegram) - مشترك بين الجلسات إن وُجد
+        self.dispatcher = dispatcher or SendDispatcher(
+            max_concurrency=self.config.get("SEND_CONCURRENCY", 8),
+            global_rate=self.config.get("SEND_GLOBAL_RATE", 30)
+        )
+        
+        # ميزانية الترميز المشتركة بين الجلسات (None = بلا حد)
+        self.encode_budget = encode_budget
+        
+        # مجلد المقاطع المؤقتة بحصته (مشترك بين الجلسات إن وُجد)
+        self.spool = spool or ClipSpool.from_config(self.config)
+        
+        # أشرطة العلامة المائية المرسومة مسبقاً في مجلد المقاطع (مشتركة بين الجلسات إن وُجدت)
+        self.watermarks = watermarks or WatermarkCache(self.ffmpeg, self.spool)
+        
+        # أسباب قطع المقاطع في الوضع التكيفي ومدة المحتوى الثابت المتخطى
+        self.boundaries = {}
+        self.skipped_seconds = 0.0
         
-        # واجهة Bash
-        self.bash = BashInterface()
+        # بصمات المقاطع الجاهزة بانتظار المستهلك، وذاكرة آخر البصمات المرسلة لكبت المتجمد المتكرر
+        self.fingerprints = {}
+        self.dedup = FingerprintCache.from_config(self.config)
         
-        # حالة البث
+        # آخر المقاطع المرسلة (REPLAY_SECONDS) لأمر /replay - داخل حصة المجلد، ومفتاح
+        # ترميز كل مقطع من المسجل (مقاطع بإعدادات مختلفة لا تُدمج بالنسخ المباشر)
+        self.replay = ReplayBuffer.from_config(self.config, on_evict=self._discard_clip)
+        self.clip_streams = {}
+        
+        # حالة البث (كل شيء يعمل على حلقة asyncio واحدة فلا حاجة للأقفال)
         self.broadcast_running = False
         self.stream_position = 0.0
-        self.stream_lock = threading.Lock()
+        self.clip_counter = 0
+        self.recorder_runs = 0
+        
+        # معلومات ترميز المصدر (تُقرأ مرة واحدة لكل بث، والفشل مرة لكل تشغيل للمسجل)
+        self.source_info = None
+        self.probe_run = None
+        
+        # إعدادات الترميز والمتحكم التكيفي والمسجل الحالي
+        self.encoder = EncoderSettings.from_config(self.config)
+        self.tuner = AdaptiveEncoder(self.encoder)
+        self.recorder = None
+        self.restart_requested = False
+        # مستويات الصوت فقط للتشغيل الحالي (تُستخرج من كل مقطع رئيسي جاهز)
+        self.audio_tiers = []
+        
+        # سجل التسليم لكل وجهة، وطابور إعادة المحاولة للأخطاء المؤقتة
+        self.ledger = DeliveryLedger()
+        self.retries = RetryQueue(max_size=int(self.config.get("RETRY_QUEUE_MAX", 500)))
         
-        # قائمة الانتظار (buffer أصغر لتوفير الذاكرة)
-        self.clip_queue = Queue(maxsize=2)
+        # مراقب صحة المصدر (التوقف والفجوات)
+        self.monitor = SourceMonitor(stall_seconds=float(self.config.get("SOURCE_STALL_SECONDS", 3)))
+        
+        # قائمة الانتظار (عمقها BUFFER_SIZE مقاطع جاهزة أو قيد التجهيز)
+        self.clip_queue = ResizableQueue(self._buffer_size())
+        
+        # مهام البث الخاضعة للإشراف، وحد عمال التجهيز (PRODUCER_WORKERS)
+        self.tasks = []
+        self.prepare_slots = None
         
         # حالة Producer/Consumer
         self.producer_running = False
         self.consumer_running = False
         
-        # إنشاء المجلدات المطلوبة باستخدام Bash
+        # إنشاء المجلدات المطلوبة
         for directory in ["temp_clips", "logs"]:
-            result = self.bash.create_directory(directory)
-            if result["success"]:
-                print(f"📁 {directory}/ جاهز")
-            else:
-                error_msg = result.get("error", "Unknown error")
-                raise RuntimeError(f"فشل إنشاء المجلد {directory}/: {error_msg}")
+            try:
+                utils.create_directory(directory)
+                logger.debug(f"📁 {directory}/ جاهز")
+            except OSError as e:
+                raise RuntimeError(f"فشل إنشاء المجلد {directory}/: {e}")
         
         # التحقق من FFmpeg عند البداية
-        result = self.bash.check_ffmpeg()
-        if result["success"] and result["data"].get("installed"):
-            print(f"✅ FFmpeg متوفر")
+        if utils.check_ffmpeg():
+            logger.info("✅ FFmpeg متوفر")
         else:
-            print(f"⚠️ تحذير: FFmpeg غير متوفر")
+            logger.warning("⚠️ تحذير: FFmpeg غير متوفر")
     
     def is_running(self):
         return self.broadcast_running
     
     def get_stream_position(self):
-        with self.stream_lock:
-            return self.stream_position
+        return self.stream_position
+    
+    def get_source_status(self):
+        return self.monitor.describe()
     
     def get_queue_size(self):
         return self.clip_queue.qsize()
     
-    def stop_broadcast(self):
-        self.broadcast_running = False
+    def get_spool_status(self):
+        return self.spool.describe()
+    
+    def get_boundary_status(self):
+        if not self._adaptive_clips():
+            return "ثابتة"
+        reasons = " | ".join(f"{reason}: {count}" for reason, count in sorted(self.boundaries.items()))
+        return f"{reasons or '-'} | متخطى: {self.skipped_seconds:.0f}ث"
+    
+    def get_dedup_status(self):
+        if not self.config.get("DEDUP_CLIPS", False):
+            return "معطل"
+        return self.dedup.describe()
+    
+    def get_replay_status(self):
+        return self.replay.describe()
+    
+    def get_delivery_status(self):
+        return f"{self.ledger.describe()} | بالانتظار: {len(self.retries)}"
+    
+    def _buffer_size(self):
+        return max(1, int(self.config.get("BUFFER_SIZE", 2)))
+    
+    # config: لقطة الإعدادات للتشغيل أو المقطع الحالي (الإعدادات الحية إن لم تُمرر)
+    def _clip_duration(self, config=None):
+        config = config or self.config.snapshot()
+        if self._low_latency(config):
+            # مقطع أقصر من فترة الإرسال لأبطأ وجهة يتراكم في القائمة فيزيد التأخير بدل أن ينقصه
+            return max(
+                float(config.get("LOW_LATENCY_CLIP_SECONDS", 2)),
+                self.dispatcher.batch_interval(self.get_destinations() + self._subscriber_recipients())
+            )
+        return float(config.get("CLIP_SECONDS", 12))
+    
+    def _low_latency(self, config=None):
+        return bool((config or self.config).get("LOW_LATENCY", False))
+    
+    def _memory_clips(self, config=None):
+        return bool((config or self.config).get("MEMORY_CLIPS", False))
+    
+    def _adaptive_clips(self, config=None):
+        # المقاطع القصيرة في الوضع منخفض التأخير هي نفسها الحدود
+        config = config or self.config
+        return bool(config.get("ADAPTIVE_CLIPS", False)) and not self._low_latency(config)
+    
+    def get_destinations(self):
+        """القنوات الثابتة لهذه الجلسة (DESTINATIONS أو CHANNEL_ID)"""
+        return list(self.config.get("DESTINATIONS") or [self.config.get("CHANNEL_ID")])
+    
+    def _subscriber_recipients(self):
+        if not self.config.get("SEND_TO_SUBSCRIBERS", True):
+            return []
+        return self.subscribers.reachable()
     
     async def start_broadcast(self):
-        """بدء البث"""
+        """بدء البث - يُنشئ مهام المنتج والمستهلك ويعود فوراً"""
+        if self.broadcast_running:
+            return
+        
         self.broadcast_running = True
         self.stream_position = 0.0
+        self.clip_counter = 0
+        self.recorder_runs = 0
+        self.source_info = None
+        self.monitor = SourceMonitor(stall_seconds=float(self.config.get("SOURCE_STALL_SECONDS", 3)))
         
-        # تفريغ القائمة
-        while not self.clip_queue.empty():
-            try:
-                self.clip_queue.get_nowait()
-            except:
-                break
+        # قائمة جديدة بعمق BUFFER_SIZE الحالي
+        self.clip_queue = ResizableQueue(self._buffer_size())
         
-        await self._broadcast_loop()
+        self.tasks = [asyncio.create_task(self._broadcast_loop(), name="broadcast")]
     
-    def _smart_producer(self):
-        """المنتج الذكي - يسجل المقاطع باستخدام Bash"""
-        self.producer_running = True
-        clip_counter = 0
-        # مدة المقطع المحسّنة
-        clip_duration = 12.0
-        failures = 0
+    async def stop_broadcast(self):
+        """إيقاف البث وانتظار إغلاق المسجل وتنظيف المقاطع المعلقة"""
+        self.broadcast_running = False
         
-        print("🎬 المنتج الذكي (Bash): بدء العمل")
+        tasks, self.tasks = self.tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
         
+        self._drain_queue()
+    
+    def _drain_queue(self):
+        """إلغاء تجهيز المقاطع المتبقية في القائمة وحذف ملفاتها"""
+        while not self.clip_queue.empty():
+            task, _, _, _, _ = self.clip_queue.get_nowait()
+            self._cancel_clip(task)
+    
+    def _cancel_clip(self, task):
+        """ترك مقطع في القائمة دون إرسال: إلغاء تجهيزه أو حذف ملفاته الجاهزة"""
+        if task.done() and not task.cancelled() and task.result():
+            self._discard_clips(task.result())
+        else:
+            task.cancel()
+    
+    async def _supervise(self, name, coro_fn):
+        """تشغيل مهمة وإعادة تشغيلها إذا انهارت بخطأ غير متوقع أثناء البث"""
         while self.broadcast_running:
             try:
-                clip_counter += 1
-                
-                with self.stream_lock:
-                    current_position = self.stream_position
-                
-                # استخدام temp_clips بدلاً من /tmp
-                output_path = f"temp_clips/smart_clip_{clip_counter}.mp4"
-                
-                print(f"⏺️  تسجيل #{clip_counter} من [{current_position:.1f}ث] (Bash)")
-                
-                start_time = time.time()
-                
-                # استدعاء Bash لتسجيل المقطع
-                result = self.bash.record_clip(
-                    source_url=self.config.get("SOURCE_URL"),
-                    output_path=output_path,
-                    duration=clip_duration,
-                    watermark_text=self.config.get("BOTTOM_WATERMARK_TEXT", ""),
-                    watermark_enabled=self.config.get("BOTTOM_WATERMARK_ENABLED", True)
-                )
-                
-                elapsed = time.time() - start_time
-                
-                if result["success"] and os.path.exists(output_path) and self.broadcast_running:
-                    with self.stream_lock:
-                        self.stream_position += clip_duration
+                await coro_fn()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"🚨 انهيار {name}: {str(e)[:80]} - إعادة التشغيل", exc_info=True)
+                await asyncio.sleep(1)
+    
+    async def _smart_producer(self):
+        """المنتج الذكي - مسجل FFmpeg دائم يقسم البث إلى مقاطع متتالية"""
+        self.producer_running = True
+        prewarmed = None
+        
+        workers = max(1, int(self.config.get("PRODUCER_WORKERS", 1)))
+        self.prepare_slots = asyncio.Semaphore(workers)
+        
+        logger.info(f"🎬 المنتج الذكي: بدء العمل ({self._clip_duration():.0f}ث × {self._buffer_size()} buffer × {workers} عمال)")
+        
+        try:
+            while self.broadcast_running:
+                run, prewarmed = prewarmed, None
+                self.restart_requested = False
+                try:
+                    if run is None:
+                        # مدة المقطع تُقرأ لكل تشغيل فيُطبق تغييرها عند إعادة التشغيل
+                        run = await self._start_recorder(self._clip_duration())
+                    self.recorder = run.job
                     
-                    self.clip_queue.put((output_path, current_position, clip_counter), timeout=5)
-                    print(f"✅ #{clip_counter} ({elapsed:.1f}ث) → التالي: {self.stream_position:.1f}ث | Q:{self.clip_queue.qsize()}")
-                    failures = 0
-                    # انتظار قصير بعد كل مقطع لتقليل الضغط
-                    time.sleep(1)
-                else:
-                    self.stats["clips_failed"] += 1
-                    failures += 1
-                    error_msg = result.get("data", {}).get("error", "Unknown error") if "data" in result else result.get("error", "Unknown")
-                    print(f"❌ فشل #{clip_counter}: {error_msg}")
+                    while self.broadcast_running and not self.restart_requested:
+                        exited = not run.job.running
+                        
+                        # قراءة المقاطع المكتملة الجديدة من ملف القائمة
+                        await self._collect_segments(run, final=exited)
+                        
+                        if exited or self.monitor.is_stalled():
+                            break
+                        # في الوضع منخفض التأخير يُلتقط المقطع فور إغلاقه
+                        await asyncio.sleep(0.05 if self._low_latency() else 0.2)
+                    
+                    if not self.broadcast_running:
+                        break
+                    
+                    if self.restart_requested:
+                        # إغلاق المقطع الجاري بشكل سليم ثم التقاطه قبل إعادة التشغيل
+                        await run.job.cancel()
+                        await self._collect_segments(run, final=True)
+                        self.monitor.connection_lost()
+                        logger.info("🔁 إعادة تشغيل المسجل بإعدادات جديدة")
+                        continue
+                    
+                    self.monitor.connection_lost()
+                    
+                    if run.job.running:
+                        # توقف المصدر: اتصال جديد يبدأ قبل إغلاق القديم حتى لا ننتظر الاتصال والفحص
+                        self.monitor.stalls += 1
+                        logger.warning(f"⚠️ توقف المصدر في المسجل #{run.run_id} - اتصال بديل")
+                        prewarmed = await self._start_recorder(self._clip_duration(), inherit=run)
+                        await run.job.cancel()
+                        await self._collect_segments(run, final=True)
+                        continue
                     
-                    if failures >= 3:
-                        print("⚠️ فشل متكرر، انتظار 15ث")
-                        time.sleep(15)
-                        failures = 0
-                    else:
-                        time.sleep(3)
+                    # توقف المسجل (انقطاع المصدر أو خطأ في FFmpeg)
+                    result = await run.job.wait()
+                    self.stats["clips_failed"] += 1
+                    delay = self.monitor.next_backoff()
+                    logger.error(
+                        f"❌ توقف المسجل #{run.run_id} بعد {run.segments} مقاطع (رمز {result.returncode}): {result.stderr[-200:]}",
+                        extra={"session": self.name, **result.diagnostics()}
+                    )
+                    logger.info(f"⏳ إعادة الاتصال بعد {delay:.1f}ث")
+                    await asyncio.sleep(delay)
                         
-            except Exception as e:
-                print(f"🚨 خطأ producer: {str(e)[:50]}")
-                failures += 1
-                time.sleep(3 if failures < 3 else 15)
+                except Exception as e:
+                    logger.error(f"🚨 خطأ producer: {str(e)[:50]}", exc_info=True)
+                    await asyncio.sleep(self.monitor.next_backoff())
+                finally:
+                    await self._close_run_shielded(run)
+        finally:
+            await self._close_run_shielded(prewarmed)
+            self.recorder = None
+            self.producer_running = False
+            logger.info("🛑 المنتج: توقف")
+    
+    async def _start_recorder(self, clip_duration, inherit=None):
+        """تشغيل عملية مسجل جديدة متصلة بالمصدر
         
-        self.producer_running = False
-        print("🛑 المنتج: توقف")
+        inherit: تشغيل سابق ينتقل مكانه في ميزانية الترميز إلى التشغيل الجديد
+        (الاتصال البديل لا ينتظر مكاناً يحجزه المسجل الذي سيحل محله).
+        """
+        # لقطة واحدة للإعدادات لكل تشغيل (تعديل config.json أثناء التشغيل لا يخلط القيم)
+        config = self.config.snapshot()
+        self.recorder_runs += 1
+        # رقم فريد بين مرات تشغيل البوت (أسماء ملفات لا تتصادم مع بقايا انهيار سابق)
+        run = RecorderRun(self.spool.next_run_id(), self.spool, self.name)
+        
+        if os.path.exists(run.list_file):
+            os.remove(run.list_file)
+        
+        stream_copy = await self._use_stream_copy()
+        
+        # مستويات الفيديو الإضافية تُنتج من نفس الاتصال وفك الترميز (كملفات مقاطع، فلا تُنتج في وضع الذاكرة)
+        memory = self._memory_clips(config)
+        if memory and rendition_tiers(config)[1:]:
+            logger.warning(f"⚠️ [{self.name}] وضع الذاكرة: المستويات الإضافية معطلة")
+        self.audio_tiers = []
+        for tier in ([] if memory else await self._rendition_tiers()):
+            if RENDITION_LADDER[tier].get("audio_only"):
+                # من المقطع الرئيسي بعد اكتماله: مقسم صوت مستقل لا يقطع عند إطارات الفيديو المفتاحية
+                self.audio_tiers.append(tier)
+                continue
+            run.renditions.append(RenditionOutput(tier, self.name, run.run_id, self.spool))
+            if os.path.exists(run.renditions[-1].list_file):
+                os.remove(run.renditions[-1].list_file)
+        
+        # الحدود التكيفية: المسجل يكتب مقاطع قصيرة ويختار المخطط أين يُجمع بينها
+        segment_duration = clip_duration
+        longest = clip_duration
+        analysis = None
+        if self._adaptive_clips(config) and (memory or run.renditions):
+            logger.warning(f"⚠️ [{self.name}] الحدود التكيفية معطلة مع وضع الذاكرة والمستويات الإضافية")
+        elif self._adaptive_clips(config):
+            segment_duration = float(config.get("ADAPTIVE_STEP_SECONDS", 2))
+            longest = float(config.get("ADAPTIVE_MAX_SECONDS", 20)) + segment_duration
+            analysis = await self._start_analysis(run, config, clip_duration, segment_duration)
+        
+        # سقف VBV من ميزانية الحجم (المقطع قد يطول حتى إطار مفتاحي إضافي)
+        self.encoder.maxrate_kbps = video_kbps_for_budget(
+            clip_byte_budget(config),
+            longest + self.encoder.keyframe_interval
+        )
+        inherited = inherit is not None and inherit.encode_slot
+        try:
+            if not stream_copy or run.renditions:
+                await self._acquire_encode_slot(run, inherit)
+            
+            run.stream_key = self._stream_key(stream_copy)
+            mode = "نسخ مباشر" if stream_copy else self.encoder.describe()
+            if run.renditions or self.audio_tiers:
+                mode += " + " + "/".join([r.tier for r in run.renditions] + self.audio_tiers)
+            if memory:
+                mode += " → ذاكرة"
+            if analysis:
+                mode += " ✂️ تكيفي"
+            logger.info(f"⏺️  [{self.name}] تشغيل المسجل #{run.run_id} من [{self.stream_position:.1f}ث] ({mode})")
+            
+            watermark_image = None if stream_copy else await self._watermark_image()
+            
+            self.monitor.connection_started()
+            
+            if memory:
+                run.pipe = OutputPipe()
+                run.splitter = FragmentSplitter(clip_duration, f"{self.name}_clip_{run.run_id}")
+                # حد المقاطع المكتملة بانتظار القائمة: القارئ يتوقف عنده فيمتلئ الأنبوب وينتظر FFmpeg
+                run.ready = ResizableQueue(self._buffer_size())
+            
+            # اتصال واحد بالمصدر لكل المقاطع بدل FFmpeg جديد لكل مقطع
+            command = build_segment_command(
+                source_url=config.get("SOURCE_URL"),
+                output_pattern=run.output_pattern,
+                list_file=run.list_file,
+                segment_duration=segment_duration,
+                watermark_image=watermark_image,
+                stream_copy=stream_copy,
+                encoder=self.encoder,
+                renditions=[(r.tier, r.output_pattern, r.list_file) for r in run.renditions],
+                low_latency=self._low_latency(config),
+                pipe_output=run.pipe.url if memory else None,
+                analysis=analysis
+            )
+            run.job = await self.ffmpeg.start(
+                command,
+                on_progress=lambda progress: self._on_recorder_progress(run, stream_copy, progress),
+                pass_fds=(run.pipe.write_fd,) if memory else ()
+            )
+            
+            if memory:
+                run.pipe.close_writer()
+                run.reader = asyncio.create_task(self._read_fragments(run))
+        except BaseException:
+            # فشل التشغيل (أو إلغاؤه) لا يترك مكان الترميز محجوزاً ولا الأنبوب مفتوحاً
+            if inherited and run.encode_slot:
+                # الاتصال البديل لم يبدأ: المكان يعود للمسجل الذي كان سيحل محله
+                run.encode_slot = False
+                inherit.encode_slot = True
+            await self._close_run_shielded(run)
+            raise
+        return run
+    
+    async def _start_analysis(self, run, config, clip_duration, step):
+        """تجهيز مخطط الحدود وفرع التحليل (scdet، و silencedetect إن كان للمصدر صوت)"""
+        info = await self._probe_source()
+        silence_file = run.silence_file if info is not None and info.stream("audio") else None
+        for path in (run.scene_file, run.silence_file):
+            if os.path.exists(path):
+                os.remove(path)
+        
+        run.analysis = AnalysisLog(run.scene_file, silence_file)
+        run.planner = ClipPlanner(
+            clip_duration,
+            float(config.get("ADAPTIVE_MAX_SECONDS", 20)),
+            step,
+            static_score=float(config.get("STATIC_SCORE", 0.3)),
+            skip_static=bool(config.get("SKIP_STATIC", True))
+        )
+        return analysis_filter_graph(
+            run.scene_file, silence_file,
+            scene_threshold=float(config.get("SCENE_THRESHOLD", 10))
+        )
+    
+    async def _read_fragments(self, run):
+        """قراءة أنبوب fMP4 للمسجل وتجميع المقاطع المكتملة في run.ready
+        
+        لا يُقرأ جزء جديد حتى يتسع run.ready، فلا تنمو الذاكرة إذا تأخر الإرسال.
+        """
+        reader = await run.pipe.reader()
+        while True:
+            chunk = await reader.read(256 * 1024)
+            if not chunk:
+                break
+            for clip in run.splitter.feed(chunk):
+                await run.ready.put(clip)
+        # خروج المسجل: المقطع الأخير بما وصل من أجزائه
+        tail = run.splitter.flush()
+        if tail:
+            await run.ready.put(tail)
+    
+    def _watermark_enabled(self):
+        return bool(self.config.get("BOTTOM_WATERMARK_ENABLED", True) and self.config.get("BOTTOM_WATERMARK_TEXT", ""))
+    
+    async def _watermark_image(self):
+        """شريط العلامة المائية الحالي (مرسوم مرة واحدة لكل نص) أو None"""
+        if not self._watermark_enabled():
+            return None
+        return await self.watermarks.render(
+            self.config.get("BOTTOM_WATERMARK_TEXT"),
+            fontfile=self.config.get("WATERMARK_FONT") or None,
+            fontsize=int(self.config.get("WATERMARK_FONT_SIZE", 32))
+        )
+    
+    async def refresh_watermark(self):
+        """تطبيق تغيير العلامة: رسم الشريط الآن ثم إعادة تشغيل المسجل ليستخدمه
+        
+        يرجع False إذا كانت العلامة مطلوبة وتعذر رسمها.
+        """
+        image = await self._watermark_image()
+        if self.broadcast_running:
+            self.restart_requested = True
+        return image is not None or not self._watermark_enabled()
+    
+    async def _acquire_encode_slot(self, run, inherit=None):
+        """حجز مكان مرمّز في الميزانية المشتركة وتحديث حصة المعالجات للمتحكم التكيفي"""
+        if self.encode_budget is None:
+            return
+        
+        if inherit is not None and inherit.encode_slot:
+            inherit.encode_slot = False
+        else:
+            if self.encode_budget.full():
+                logger.info(f"⏳ [{self.name}] انتظار مكان ترميز ({self.encode_budget.describe()})")
+            await self.encode_budget.acquire()
+        run.encode_slot = True
+        self.tuner.cpu_count = self.encode_budget.cores_per_encoder()
+    
+    async def _close_run_shielded(self, run):
+        """_close_run حتى نهايته وإن أُلغي المنتج أثناءها، ثم إعادة الإلغاء
+        
+        إيقاف البث قد يلغي المنتج أكثر من مرة؛ قطع الإغلاق يترك FFmpeg وملفاته.
+        """
+        closing = asyncio.ensure_future(self._close_run(run))
+        cancelled = False
+        while True:
+            try:
+                await asyncio.shield(closing)
+                break
+            except asyncio.CancelledError:
+                if closing.done():
+                    raise
+                cancelled = True
+        if cancelled:
+            raise asyncio.CancelledError()
+    
+    async def _close_run(self, run):
+        """إيقاف عملية المسجل وحذف ملف قائمتها وتحرير مكانها في ميزانية الترميز"""
+        if run is None:
+            return
+        try:
+            if run.job is not None:
+                await run.job.cancel()
+            # مقاطع أغلقها المسجل عند إيقافه ولم تُقرأ من قوائمه بعد
+            entries, run.list_offset = self._read_segment_list(run.list_file, run.list_offset)
+            for name, _, _ in entries:
+                self._discard_clip(self.spool.path(name))
+            for rendition in run.renditions:
+                rung_entries, rendition.list_offset = self._read_segment_list(rendition.list_file, rendition.list_offset)
+                for name, _, _ in rung_entries:
+                    self._discard_clip(self.spool.path(name))
+            if run.reader is not None:
+                run.reader.cancel()
+                await asyncio.gather(run.reader, return_exceptions=True)
+            if run.pipe is not None:
+                run.pipe.close()
+            while run.ready is not None and not run.ready.empty():
+                run.ready.get_nowait()
+            for list_file in [run.list_file, run.scene_file, run.silence_file] + [r.list_file for r in run.renditions]:
+                if os.path.exists(list_file):
+                    os.remove(list_file)
+            if run.planner is not None:
+                for name, _, _ in run.planner.take_all():
+                    self._discard_clip(self.spool.path(name))
+            # مقاطع لم تكتمل مستوياتها قبل إيقاف البث
+            for name, _, _ in run.pending:
+                self._discard_clip(self.spool.path(name))
+                for rendition in run.renditions:
+                    self._discard_clip(rendition.path_for(name))
+            run.pending = []
+        finally:
+            if run.encode_slot:
+                run.encode_slot = False
+                self.encode_budget.release()
+    
+    async def _collect_segments(self, run, final=False):
+        """إضافة المقاطع المكتملة الجديدة للتشغيل إلى القائمة
+        
+        المقطع الرئيسي ينتظر حتى تكتمل مقاطع مستوياته بنفس الرقم؛ final بعد
+        خروج المسجل يرسل المتبقي بما اكتمل من مستوياته.
+        """
+        if run.pipe is not None:
+            await self._collect_memory_clips(run, final)
+            return
+        
+        entries, run.list_offset = self._read_segment_list(run.list_file, run.list_offset)
+        if run.planner is not None:
+            run.planner.add(entries)
+            run.analysis.read()
+            for plan in run.planner.plan(run.analysis, final):
+                await self._queue_plan(run, plan)
+            return
+        run.pending.extend(entries)
+        for rendition in run.renditions:
+            rung_entries, rendition.list_offset = self._read_segment_list(rendition.list_file, rendition.list_offset)
+            rendition.done.update(entry[0] for entry in rung_entries)
+        
+        while run.pending:
+            name, seg_start, seg_end = run.pending[0]
+            ready = all(os.path.basename(r.path_for(name)) in r.done for r in run.renditions)
+            if not ready and not final:
+                break
+            run.pending.pop(0)
+            
+            renditions = {}
+            for rendition in run.renditions:
+                rung_path = rendition.path_for(name)
+                if os.path.basename(rung_path) in rendition.done:
+                    rendition.done.discard(os.path.basename(rung_path))
+                    renditions[rendition.tier] = rung_path
+                else:
+                    self._discard_clip(rung_path)
+            
+            await self._queue_from_run(run, self.spool.path(name), seg_start, seg_end, renditions)
+    
+    async def _queue_plan(self, run, plan):
+        """مقطع من مخطط الحدود: تخطي المحتوى الثابت الصامت أو دمج مقاطعه القصيرة بالنسخ المباشر"""
+        paths = [self.spool.path(name) for name, _, _ in plan.segments]
+        reason = "static" if plan.static else plan.reason
+        self.boundaries[reason] = self.boundaries.get(reason, 0) + 1
+        metrics.CLIP_BOUNDARIES.labels(self.name, reason).inc()
+        
+        if plan.static:
+            # لا ترميز إضافي ولا رفع؛ الموضع يتقدم حتى لا تظهر فجوة في أزمنة المقاطع
+            if run.base_position is None:
+                run.base_position = self.stream_position
+            self.stream_position = run.base_position + plan.end
+            self.skipped_seconds += plan.end - plan.start
+            for path in paths:
+                self._discard_clip(path)
+            logger.info(f"⏭️ [{self.name}] تخطي {plan.end - plan.start:.1f}ث ثابتة وصامتة")
+            return
+        
+        clip_path = paths[0] if len(paths) == 1 else await self._join_segments(paths)
+        if clip_path is None:
+            # تعذر الدمج: المقاطع القصيرة تُرسل كما هي
+            for name, seg_start, seg_end in plan.segments:
+                await self._queue_from_run(run, self.spool.path(name), seg_start, seg_end)
+            return
+        await self._queue_from_run(run, clip_path, plan.start, plan.end)
+    
+    async def _join_segments(self, paths):
+        """دمج مقاطع متتالية في ملف واحد بالنسخ المباشر (كلها تبدأ بإطار مفتاحي)"""
+        output_path = f"{paths[0][:-len('.mp4')]}_joined.mp4"
+        list_file = f"{paths[0][:-len('.mp4')]}_joined.txt"
+        self._write_concat_list(list_file, paths)
+        try:
+            result = await self.ffmpeg.run(build_concat_command(list_file, output_path), timeout=30)
+        finally:
+            self._discard_clip(list_file)
+        
+        if not result.success or not clip_size(output_path):
+            logger.warning(f"⚠️ تعذر دمج {len(paths)} مقاطع: {result.error or result.stderr[-100:]}", extra=result.diagnostics())
+            self._discard_clip(output_path)
+            return None
+        for path in paths:
+            self._discard_clip(path)
+        return output_path
+    
+    def _write_concat_list(self, list_file, paths):
+        """ملف قائمة concat (مسارات مطلقة: concat يحسب النسبي من مجلد القائمة)"""
+        with open(list_file, "w") as f:
+            for path in paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+    
+    async def _collect_memory_clips(self, run, final=False):
+        """إضافة المقاطع المكتملة في الذاكرة (وضع MEMORY_CLIPS) إلى القائمة"""
+        while not run.ready.empty():
+            clip = run.ready.get_nowait()
+            await self._queue_from_run(run, clip, clip.start, clip.end)
+        if not final or run.reader is None:
+            return
+        
+        # المسجل خرج: القارئ يكمل ما تبقى في الأنبوب والمقطع الأخير، وينتظر مكاناً في run.ready
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + 5
+        while not (run.reader.done() and run.ready.empty()):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                logger.warning(f"⚠️ أنبوب المسجل #{run.run_id} لم يُغلق")
+                return
+            getter = asyncio.ensure_future(run.ready.get())
+            try:
+                await asyncio.wait([getter, run.reader], timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                if not getter.done():
+                    getter.cancel()
+            if getter.done() and not getter.cancelled():
+                clip = getter.result()
+                await self._queue_from_run(run, clip, clip.start, clip.end)
+        if not run.reader.cancelled() and run.reader.exception() is not None:
+            logger.warning(f"⚠️ قراءة أنبوب المسجل #{run.run_id}: {str(run.reader.exception())[:80]}")
+    
+    async def _queue_from_run(self, run, clip, seg_start, seg_end, renditions=None):
+        """إضافة مقطع من تشغيل المسجل للقائمة بموضعه في البث"""
+        # أزمنة المقاطع هي PTS الحقيقية داخل هذا التشغيل؛ نبدأ من آخر موضع مسجل
+        if run.base_position is None:
+            run.base_position = self.stream_position
+        metrics.RECORD_DURATION.labels(self.name).observe(seg_end - seg_start)
+        captured_at = run.clock_origin + seg_end if run.clock_origin is not None else None
+        self.clip_streams[clip] = run.stream_key
+        # مهمة التجهيز تُنشأ داخل الكتلة فترث معرّف المقطع
+        with correlation(self._clip_id(self.clip_counter + 1)):
+            if await self._queue_segment(clip, run.base_position + seg_start, run.base_position + seg_end,
+                                         self.clip_counter + 1, renditions, captured_at):
+                self.clip_counter += 1
+                run.segments += 1
+    
+    def _on_recorder_progress(self, run, stream_copy, progress):
+        """تمرير تقدم المسجل إلى مراقب المصدر والمتحكم التكيفي"""
+        self.monitor.on_progress(progress)
+        
+        if run.clock_origin is None:
+            media = parse_out_time(progress)
+            if media is not None:
+                # المصدر الحي يُقرأ بالزمن الحقيقي: PTS المقطع + هذا الأصل = لحظة التقاطه
+                run.clock_origin = time.time() - media
+        
+        speed = parse_speed(progress)
+        if speed is not None and run.job is self.recorder:
+            metrics.ENCODE_SPEED.labels(self.name).set(speed)
+        
+        if stream_copy or not self.config.get("ADAPTIVE_ENCODER", True) or run.job is None:
+            return
+        if run.job is self.recorder and self.tuner.observe(progress, run.job.process.pid):
+            self.restart_requested = True
+    
+    def apply_config(self, changed):
+        """تطبيق إعدادات تغيرت أثناء التشغيل (من أمر أو من تعديل config.json)"""
+        if "BUFFER_SIZE" in changed:
+            # التكبير يوقظ المنتج المنتظر، والتصغير يسري على المقطع التالي
+            self.clip_queue.resize(self._buffer_size())
+        if "SOURCE_STALL_SECONDS" in changed:
+            self.monitor.stall_seconds = float(self.config.get("SOURCE_STALL_SECONDS", 3))
+        if "SOURCE_URL" in changed:
+            self.source_info = None
+        if changed & {"DEDUP_HISTORY", "DEDUP_MAX_SUPPRESSED"}:
+            self.dedup = FingerprintCache.from_config(self.config)
+        if changed & {"REPLAY_SECONDS", "REPLAY_MAX_MB"}:
+            limits = ReplayBuffer.from_config(self.config)
+            self.replay.resize(limits.max_seconds, limits.max_bytes)
+        if changed & {"CRF", "KEYFRAME_INTERVAL", "ENCODER_PROFILE"}:
+            self.encoder = EncoderSettings.from_config(self.config)
+            self.tuner = AdaptiveEncoder(self.encoder)
+            if self.encode_budget is not None:
+                self.tuner.cpu_count = self.encode_budget.cores_per_encoder()
+        if changed & RECORDER_KEYS and self.broadcast_running:
+            self.restart_requested = True
+        logger.info(f"🔧 [{self.name}] إعدادات جديدة: {', '.join(sorted(changed))}")
+    
+    def set_encoder_profile(self, profile):
+        """تغيير ملف الترميز أثناء التشغيل (يُطبق بإعادة تشغيل المسجل)
+
+        apply_config يعيد بناء المرمّز مرة واحدة: عبر on_change للإعدادات العامة،
+        أو مباشرة لقيمة خاصة بالجلسة لا تمر بـ on_change.
+        """
+        self.config.set("ENCODER_PROFILE", profile)
+        if "ENCODER_PROFILE" in getattr(self.config, "overrides", {}):
+            self.apply_config({"ENCODER_PROFILE"})
+    
+    def get_encoder_status(self):
+        speed = self.tuner.last_speed
+        load = self.tuner.last_load
+        return (
+            f"{self.encoder.describe()}"
+            f" | speed={speed if speed is not None else '-'}x"
+            f" | load={f'{load:.0%}' if load is not None else '-'}"
+        )
+    
+    async def _use_stream_copy(self):
+        """النسخ المباشر ممكن إذا لم تُطلب علامة مائية وكان المصدر H.264/AAC"""
+        mode = str(self.config.get("STREAM_COPY", "auto")).lower()
+        if mode in ("false", "off", "0"):
+            return False
+        
+        # لا حاجة لأي فلتر إذا كانت العلامة معطلة أو فارغة
+        if self._watermark_enabled():
+            return False
+        
+        info = await self._probe_source()
+        if info is None:
+            return False
+        
+        compatible = is_telegram_compatible(info)
+        logger.info(f"🔍 المصدر: {'نسخ مباشر ⚡' if compatible else 'إعادة ترميز'}")
+        return compatible
+    
+    def _stream_key(self, stream_copy):
+        """ما يجب أن يتطابق لتُدمج مقاطع تشغيلين بالنسخ المباشر (سقف المعدل والخيوط لا يغيران التدفق)"""
+        info = self.source_info if self.source_info is not None and self.source_info.success else None
+        video = (info.stream("video") if info is not None else None) or {}
+        source = (video.get("codec_name"), video.get("width"), video.get("height"))
+        if stream_copy:
+            return ("copy",) + source
+        return ("x264", self.encoder.preset, self.encoder.tune, self.encoder.max_height) + source
+    
+    async def _probe_source(self):
+        """معلومات ترميز المصدر (مرة واحدة لكل بث) أو None إذا تعذر الفحص
+        
+        الفشل يُحفظ حتى التشغيل التالي للمسجل، فلا يُفحص المصدر مع بصمة كل مقطع.
+        """
+        retry = self.source_info is not None and not self.source_info.success and self.probe_run != self.recorder_runs
+        if self.source_info is None or retry:
+            self.source_info = await self.ffmpeg.probe(self.config.get("SOURCE_URL"), timeout=20)
+            self.probe_run = self.recorder_runs
+            if not self.source_info.success:
+                logger.warning(f"⚠️ تعذر فحص المصدر: {self.source_info.error[:80]}", extra={"stderr": self.source_info.error})
+        
+        return self.source_info if self.source_info.success else None
+    
+    async def _rendition_tiers(self):
+        """المستويات الإضافية لهذا التشغيل (مستوى الصوت فقط يحتاج مصدراً بصوت)"""
+        tiers = rendition_tiers(self.config)[1:]
+        if any(RENDITION_LADDER[tier].get("audio_only") for tier in tiers):
+            info = await self._probe_source()
+            # لا صوت يُستخرج من مقاطع مصدر بلا تدفق صوتي (عملية فاشلة لكل مقطع)
+            if info is None or not info.stream("audio"):
+                tiers = [tier for tier in tiers if not RENDITION_LADDER[tier].get("audio_only")]
+        return tiers
+    
+    def get_tiers(self):
+        """مستويات الجودة التي يمكن للمشتركين اختيارها في هذه الجلسة"""
+        return rendition_tiers(self.config)
+    
+    def _read_segment_list(self, list_file, offset):
+        """قراءة الأسطر الجديدة المكتملة من ملف قائمة المقاطع"""
+        if not os.path.exists(list_file):
+            return [], offset
+        
+        with open(list_file, "r") as f:
+            f.seek(offset)
+            data = f.read()
+        
+        entries = []
+        # تجاهل السطر الأخير إن لم يكتمل بعد
+        complete = data[:data.rfind("\n") + 1]
+        for line in complete.splitlines():
+            parts = line.strip().rsplit(",", 2)
+            if len(parts) != 3:
+                continue
+            try:
+                entries.append((parts[0].strip('"'), float(parts[1]), float(parts[2])))
+            except ValueError:
+                continue
+        
+        return entries, offset + len(complete.encode())
+    
+    async def _queue_segment(self, clip_path, start_position, end_position, counter, renditions=None,
+                             captured_at=None):
+        """إضافة مقطع مكتمل إلى قائمة الإرسال (يُجهَّز بالتوازي ويُرسل بالترتيب)
+        
+        captured_at: الزمن الفعلي لالتقاط آخر إطار في المقطع (لقياس التأخير حتى التسليم).
+        """
+        renditions = renditions or {}
+        if clip_size(clip_path) <= 5120:
+            logger.warning(f"⚠️ مقطع صغير أو مفقود: {getattr(clip_path, 'name', clip_path)}")
+            self._discard_clips({DEFAULT_TIER: clip_path, **renditions})
+            return False
+        
+        self.stream_position = end_position
+        
+        # مقاطع الذاكرة بسقف MEMORY_CLIPS_MAX_MB (بما فيها حلقة الإعادة)، وما تجاوزه يُكتب
+        # لملف فيخضع لحصة المجلد كبقية المقاطع
+        if isinstance(clip_path, MemoryClip):
+            held = self.spool.hold(clip_path)
+            while not held and self.replay.evict_oldest():
+                held = self.spool.hold(clip_path)
+            if not held:
+                logger.warning(f"💾 ذاكرة المقاطع ممتلئة ({self.spool.describe()}) - #{counter} إلى ملف")
+                memory_clip, clip_path = clip_path, clip_path.spill(self.spool.path(clip_path.name))
+                self.clip_streams[clip_path] = self.clip_streams.pop(memory_clip, None)
+        
+        # ضغط عكسي: انتظار حذف مقاطع مرسلة إذا امتلأ المجلد، ثم التخطي بدل ملء القرص
+        if not isinstance(clip_path, MemoryClip) and not self.spool.has_space():
+            # البث الحي أولى من حلقة الإعادة
+            while self.replay.evict_oldest() and not self.spool.has_space():
+                pass
+        if not isinstance(clip_path, MemoryClip) and not self.spool.has_space():
+            logger.warning(f"💾 مجلد المقاطع ممتلئ ({self.spool.describe()}) - انتظار #{counter}")
+            if not await self.spool.wait_for_space(end_position - start_position):
+                self.spool.dropped += 1
+                metrics.SPOOL_DROPPED.labels(self.name).inc()
+                logger.warning(f"⏭️ تخطي #{counter}: لم تتحرر مساحة خلال مدة مقطع")
+                self._discard_clips({DEFAULT_TIER: clip_path, **renditions})
+                return False
+        
+        # التجهيز يبدأ فوراً، والقائمة تحفظ ترتيب المقاطع عبر المهمة
+        task = asyncio.create_task(self._prepare_clip(clip_path, renditions, self.config.snapshot()))
+        try:
+            await self.clip_queue.put((task, start_position, end_position, counter, captured_at))
+            metrics.QUEUE_DEPTH.labels(self.name).set(self.clip_queue.qsize())
+        except asyncio.CancelledError:
+            task.cancel()
+            self._discard_clips({DEFAULT_TIER: clip_path, **renditions})
+            raise
+        
+        logger.info(f"✅ #{counter} ({end_position - start_position:.1f}ث) → التالي: {end_position:.1f}ث | Q:{self.clip_queue.qsize()}")
+        return True
+    
+    async def _prepare_clip(self, clip_path, renditions, config):
+        """تجهيز المقطع قبل الإرسال وحساب بصمته (DEDUP_CLIPS) بالتوازي مع المقاطع الأخرى
+        
+        config: لقطة إعدادات واحدة للمقطع كله. يرجع ملفات المقطع حسب المستوى
+        {المستوى: المسار} أو None إذا كان المقطع تالفاً.
+        """
+        clips = await self._prepare_files(clip_path, renditions, config)
+        if clips and self.audio_tiers and not isinstance(clips[DEFAULT_TIER], MemoryClip):
+            try:
+                await self._extract_audio(clips)
+            except asyncio.CancelledError:
+                self._discard_clips(clips)
+                raise
+        if clips and config.get("DEDUP_CLIPS", False):
+            try:
+                fingerprint = await self._fingerprint(clips[DEFAULT_TIER])
+            except asyncio.CancelledError:
+                self._discard_clips(clips)
+                raise
+            if fingerprint is not None:
+                self.fingerprints[clips[DEFAULT_TIER]] = fingerprint
+        return clips
+    
+    async def _extract_audio(self, clips):
+        """إضافة مستويات الصوت فقط إلى clips من المقطع الرئيسي الجاهز (بنفس حدوده)"""
+        clip_path = clips[DEFAULT_TIER]
+        for tier in self.audio_tiers:
+            spec = RENDITION_LADDER[tier]
+            audio_path = f"{os.path.splitext(clip_path)[0]}_{tier}{spec['ext']}"
+            try:
+                async with self.prepare_slots:
+                    result = await self.ffmpeg.run(build_audio_command(clip_path, audio_path, spec["audio_kbps"]))
+            except asyncio.CancelledError:
+                self._discard_clip(audio_path)
+                raise
+            if result.success and clip_size(audio_path) > 1024:
+                clips[tier] = audio_path
+                metrics.CLIP_BYTES.labels(self.name, tier).observe(clip_size(audio_path))
+            else:
+                logger.warning(f"⚠️ تعذر استخراج مستوى {tier}: {result.stderr[-100:]}", extra=result.diagnostics())
+                self._discard_clip(audio_path)
+    
+    async def _fingerprint(self, clip_path):
+        """بصمة المقطع من إطاراته المفتاحية وطاقة صوته، أو None إذا تعذر حسابها"""
+        info = await self._probe_source()
+        pipes = [OutputPipe() for _ in range(2 if info is not None and info.stream("audio") else 1)]
+        job = spilled = None
+        if isinstance(clip_path, MemoryClip):
+            spilled = clip_path = clip_path.spill(self.spool.path(clip_path.name))
+        try:
+            async with self.prepare_slots:
+                job = await self.ffmpeg.start(
+                    build_fingerprint_command(clip_path, *(pipe.url for pipe in pipes)),
+                    pass_fds=[pipe.write_fd for pipe in pipes]
+                )
+                for pipe in pipes:
+                    pipe.close_writer()
+                readers = [await pipe.reader() for pipe in pipes]
+                # القراءة من الأنبوبين معاً حتى لا يمتلئ أحدهما فيتوقف FFmpeg
+                data = await asyncio.wait_for(asyncio.gather(*(reader.read() for reader in readers)), 30)
+                result = await job.wait(5)
+        except (FileNotFoundError, asyncio.TimeoutError) as e:
+            logger.warning(f"⚠️ تعذر حساب البصمة: {type(e).__name__}")
+            return None
+        finally:
+            if job is not None:
+                await job.cancel()
+            for pipe in pipes:
+                pipe.close()
+            if spilled:
+                self._discard_clip(spilled)
+        
+        if not result.success:
+            logger.warning(f"⚠️ تعذر حساب البصمة: {result.stderr[-100:]}", extra=result.diagnostics())
+            return None
+        return ClipFingerprint.from_raw(*data)
+    
+    async def _prepare_files(self, clip_path, renditions, config):
+        """ملفات المقطع الجاهزة: فحصه وضغطه إن تجاوز الميزانية"""
+        renditions = dict(renditions or {})
+        budget = clip_byte_budget(config)
+        if isinstance(clip_path, MemoryClip):
+            # مدة المقطع معروفة من أجزائه؛ ما تجاوز الميزانية (نادر) يُكتب لملف ليُعاد ضغطه
+            if clip_path.size <= budget:
+                return self._ready_clips(clip_path, renditions)
+            memory_clip, clip_path = clip_path, clip_path.spill(self.spool.path(clip_path.name))
+            self._discard_clip(memory_clip)
+        
+        if self._low_latency(config) and os.path.getsize(clip_path) <= budget:
+            # المقطع يظهر في القائمة بعد إغلاقه، ومقطع قصير ضمن الميزانية: لا حاجة لعملية ffprobe
+            return self._ready_clips(clip_path, renditions)
+        
+        try:
+            async with self.prepare_slots:
+                info = await self.ffmpeg.probe(clip_path)
+        except asyncio.CancelledError:
+            self._discard_clips({DEFAULT_TIER: clip_path, **renditions})
+            raise
+        
+        if not info.success or not info.duration:
+            logger.warning(f"⚠️ مقطع تالف: {clip_path} {info.error[:50]}", extra={"clip": clip_path, "stderr": info.error})
+            self._discard_clips({DEFAULT_TIER: clip_path, **renditions})
+            return None
+        
+        if info.size > budget:
+            # يحدث غالباً في النسخ المباشر حيث لا يتحكم المسجل بالمعدل
+            try:
+                clip_path = await self._fit_to_budget(clip_path, info, budget)
+            except asyncio.CancelledError:
+                self._discard_clips(renditions)
+                raise
+            if clip_path is None:
+                self._discard_clips(renditions)
+                return None
+        
+        return self._ready_clips(clip_path, renditions)
+    
+    def _ready_clips(self, clip_path, renditions):
+        """ملفات المقطع الجاهزة للإرسال حسب المستوى"""
+        # مستويات أصغر من الرئيسي دائماً؛ يكفي استبعاد الفارغ منها
+        for tier, path in list(renditions.items()):
+            if not os.path.exists(path) or os.path.getsize(path) <= 1024:
+                self._discard_clip(path)
+                del renditions[tier]
+        
+        clips = {DEFAULT_TIER: clip_path, **renditions}
+        for tier, path in clips.items():
+            metrics.CLIP_BYTES.labels(self.name, tier).observe(clip_size(path))
+        return clips
+    
+    async def _fit_to_budget(self, clip_path, info, budget):
+        """إعادة ترميز مقطع أكبر من الميزانية بسقف معدل محسوب من مدته الفعلية"""
+        fitted_path = clip_path.replace(".mp4", "_fit.mp4")
+        maxrate = video_kbps_for_budget(budget, info.duration)
+        logger.info(f"📦 مقطع أكبر من الميزانية ({info.size / 1048576:.1f}MB) → {maxrate}kbps")
+        
+        try:
+            async with self.prepare_slots:
+                result = await self.ffmpeg.run(build_compress_command(
+                    clip_path, fitted_path,
+                    crf=self.encoder.crf,
+                    preset=self.encoder.preset,
+                    maxrate_kbps=maxrate
+                ))
+        except asyncio.CancelledError:
+            self._discard_clip(fitted_path)
+            raise
+        finally:
+            self._discard_clip(clip_path)
+        
+        if not result.success or not os.path.exists(fitted_path) or os.path.getsize(fitted_path) > budget:
+            logger.error(f"❌ تعذر ضغط المقطع ضمن الميزانية: {result.stderr[-100:]}", extra=result.diagnostics())
+            self._discard_clip(fitted_path)
+            return None
+        
+        return fitted_path
+    
+    def _discard_clip(self, clip_path):
+        """حذف مقطع لن يُرسل أو انتهى إرساله (مقاطع الذاكرة تُحرر بانتهاء مراجعها)"""
+        self.fingerprints.pop(clip_path, None)
+        self.clip_streams.pop(clip_path, None)
+        if isinstance(clip_path, MemoryClip):
+            self.spool.release(clip_path)
+        else:
+            self.spool.discard(clip_path)
+    
+    def _discard_clips(self, clips):
+        """حذف ملفات كل مستويات المقطع"""
+        for clip_path in clips.values():
+            self._discard_clip(clip_path)
     
     async def _smart_consumer(self):
         """المستهلك الذكي - يرسل المقاطع"""
         self.consumer_running = True
-        print("📤 المستهلك الذكي: بدء الإرسال")
+        logger.info("📤 المستهلك الذكي: بدء الإرسال")
         
         while self.broadcast_running:
             try:
-                try:
-                    clip_path, position, counter = self.clip_queue.get(timeout=1)
-                except Empty:
-                    await asyncio.sleep(0.3)
-                    continue
+                task, start_position, end_position, counter, captured_at = await self.clip_queue.get()
+                metrics.QUEUE_DEPTH.labels(self.name).set(self.clip_queue.qsize())
                 
-                print(f"📤 إرسال #{counter} (من {position:.1f}ث)")
+                if self._is_stale(captured_at):
+                    # متأخرون عن البث بمقطع كامل ومقطع أحدث ينتظر: القديم يُترك بدل تراكم التأخير
+                    metrics.CLIPS_DROPPED.labels(self.name).inc()
+                    logger.info(f"⏭️ تخطي #{counter}: متأخر {time.time() - captured_at:.1f}ث ومقطع أحدث جاهز")
+                    self._cancel_clip(task)
+                    continue
                 
-                try:
-                    await self._send_clip(clip_path)
-                except Exception as e:
-                    print(f"❌ خطأ إرسال #{counter}: {str(e)[:50]}")
-                finally:
-                    # حذف الملف فوراً لتحرير الذاكرة
-                    try:
-                        if os.path.exists(clip_path):
-                            os.remove(clip_path)
-                            print(f"🗑️ تم حذف #{counter}")
-                    except:
-                        pass
+                with correlation(self._clip_id(counter)):
+                    await self._consume_clip(task, start_position, end_position, counter, captured_at)
                 
-                sleep_time = self.config.get("SLEEP_BETWEEN", 0)
+                # الإيقاف بين المقاطع يضيف تأخيراً متراكماً فلا يُطبق في الوضع منخفض التأخير
+                sleep_time = 0 if self._low_latency() else self.config.get("SLEEP_BETWEEN", 0)
                 if sleep_time > 0:
                     await asyncio.sleep(sleep_time)
                     
+            except asyncio.CancelledError:
+                self.consumer_running = False
+                logger.info("🛑 المستهلك: توقف")
+                raise
             except Exception as e:
-                print(f"🚨 خطأ consumer: {str(e)[:50]}")
+                logger.error(f"🚨 خطأ consumer: {str(e)[:50]}", exc_info=True)
                 await asyncio.sleep(1)
         
         self.consumer_running = False
-        print("🛑 المستهلك: توقف")
+        logger.info("🛑 المستهلك: توقف")
     
-    async def _send_clip(self, clip_path):
-        """إرسال مقطع للقناة والمشتركين"""
-        if not os.path.exists(clip_path):
+    def _is_stale(self, captured_at):
+        """الوضع منخفض التأخير: هل تأخر المقطع أكثر من مدته وفي القائمة مقطع أحدث"""
+        if not self._low_latency() or captured_at is None or self.clip_queue.empty():
             return False
+        return time.time() - captured_at > self._clip_duration()
+    
+    def _clip_id(self, counter):
+        """معرّف ربط المقطع في السجلات (من التسجيل حتى الإرسال)"""
+        return f"{self.name}#{counter}"
+    
+    async def _consume_clip(self, task, start_position, end_position, counter, captured_at=None):
+        """انتظار تجهيز مقطع ثم إرساله وحذف ملفاته"""
+        # انتظار انتهاء تجهيز المقطع (غالباً جاهز مسبقاً)
+        clips = await task
+        if not clips:
+            return
+        
+        # المقارنة بترتيب الإرسال (البصمات تُحسب بالتوازي ولكن الذاكرة تُحدث هنا فقط)
+        fingerprint = self.fingerprints.pop(clips[DEFAULT_TIER], None)
+        if fingerprint is not None:
+            reason = self.dedup.check(fingerprint)
+            if reason:
+                metrics.CLIPS_SUPPRESSED.labels(self.name, reason).inc()
+                logger.info(f"🧬 كبت #{counter}: متجمد (مطابق لمقطع حديث)")
+                self._discard_clips(clips)
+                return
+        
+        logger.info(f"📤 إرسال #{counter} (من {start_position:.1f}ث)")
+        
+        # الملفات تبقى ما دامت هناك إعادة محاولة معلقة لأي وجهة
+        handle = ClipHandle(self._clip_id(counter), clips, self._release_clip, start_position, end_position)
+        try:
+            if await self._send_clip(handle) and captured_at is not None:
+                # من التقاط آخر إطار حتى اكتمال التوزيع (لا يشمل تأخير المصدر نفسه)
+                latency = time.time() - captured_at
+                self.stats["last_latency_seconds"] = round(latency, 2)
+                metrics.END_TO_END_SECONDS.labels(self.name).observe(latency)
+                logger.info(f"⏱️ #{counter}: {latency:.2f}ث من الالتقاط حتى التسليم")
+        except Exception as e:
+            logger.error(f"❌ خطأ إرسال #{counter}: {str(e)[:50]}", exc_info=True)
+        finally:
+            handle.release()
+    
+    def _release_clip(self, handle):
+        """آخر مرجع للمقطع تحرر: المستوى الافتراضي لحلقة الإعادة وحذف بقية المستويات
+        
+        مقطع أعيد ضغطه (_fit) ليس من المسجل فلا مفتاح له ولا يدخل الحلقة.
+        """
+        clips = dict(handle.clips)
+        clip_path = clips.get(DEFAULT_TIER)
+        stream_key = self.clip_streams.pop(clip_path, None)
+        if stream_key is not None and clip_size(clip_path) and self.replay.add(handle.start, handle.end, clip_path, stream_key):
+            del clips[DEFAULT_TIER]
+        self._discard_clips(clips)
+        self.ledger.clip_finished(handle.clip_id)
+        logger.debug(f"🗑️ تم حذف {handle.clip_id}")
+    
+    async def _send_clip(self, handle):
+        """إرسال مقطع للقنوات والمشتركين (رفع مرة واحدة لكل مستوى ثم إعادة استخدام file_id)
         
+        يرجع True إذا وصل المقطع لوجهة واحدة على الأقل.
+        """
+        clips = handle.clips
+        clip_path = clips.get(DEFAULT_TIER)
+        if not clip_path or not clip_size(clip_path):
+            return False
+        
+        start_time = time.monotonic()
+        
+        # القنوات تستقبل المستوى الافتراضي، وكل مشترك المستوى الذي اختاره إن توفر
+        groups = {DEFAULT_TIER: self.get_destinations()}
+        for user_id in self._subscriber_recipients():
+            tier = self.subscribers.tier(user_id)
+            groups.setdefault(tier if tier in clips else DEFAULT_TIER, []).append(user_id)
+        
+        total = sum(len(chats) for chats in groups.values())
         success_count = 0
+        for tier, chats in groups.items():
+            success_count += await self._deliver_tier(handle, tier, chats)
+        
+        # clips_sent يزيد عند أول تسليم ناجح للمقطع (هنا أو في إعادة محاولة لاحقة)
+        elapsed = time.monotonic() - start_time
+        self.stats["last_delivery_seconds"] = round(elapsed, 2)
+        logger.info(f"📊 [{self.name}] {success_count}/{total} في {elapsed:.2f}ث ({len(groups)} مستويات)")
+        
+        # لا نحذف الملفات هنا، ستُحذف في consumer
+        return success_count > 0
+    
+    async def _deliver_tier(self, handle, tier, chats):
+        """رفع ملف المستوى لأول محادثة تقبله ثم إرساله للبقية بـ file_id - يرجع عدد الناجح"""
+        clip_path = handle.clips[tier]
+        audio = RENDITION_LADDER.get(tier, {}).get("audio_only", False)
+        chats = list(chats)
+        sent = 0
+        file_id = None
         
-        # إرسال للقناة
+        # الرفع الوحيد للملف: أول محادثة ينجح الرفع إليها (القنوات أولاً) توفر file_id للبقية
+        while not file_id and chats:
+            chat_id = chats.pop(0)
+            try:
+                file_id = await self.dispatcher.send(
+                    chat_id,
+                    self._timed("upload", lambda chat_id: self._upload_clip(chat_id, clip_path, audio))
+                )
+                if file_id:
+                    handle.file_ids[tier] = file_id
+                sent += 1
+                self._delivered(handle, chat_id)
+                logger.debug(f"✅ رفع {tier} → {chat_id}")
+            except Exception as e:
+                self._delivery_failed(handle, tier, chat_id, e)
+                logger.error(f"❌ رفع {tier} → {chat_id}: {str(e)[:50]}")
+        
+        # إرسال للبقية بالتوازي بدون رفع: Telegram يعيد استخدام الملف المخزن لديه
+        if file_id and chats:
+            batch = await self.dispatcher.dispatch(
+                chats,
+                self._timed("file_id", lambda chat_id: self._send_file_id(chat_id, file_id, audio))
+            )
+            sent += batch.sent
+            for chat_id, value in batch.results.items():
+                if isinstance(value, Exception):
+                    self._delivery_failed(handle, tier, chat_id, value)
+                else:
+                    self._delivered(handle, chat_id)
+            if batch.errors:
+                logger.warning(f"⚠️ أخطاء الإرسال ({tier}): {batch.errors}")
+        
+        return sent
+    
+    def _delivered(self, handle, chat_id, attempts=1):
+        """تسجيل تسليم ناجح في سجل التسليم وحالة المشترك"""
+        self.subscribers.record_delivery(chat_id)
+        metrics.DELIVERIES.labels(self.name, "delivered").inc()
+        if self.ledger.delivered(handle.clip_id, chat_id, time.monotonic() - handle.started_at, attempts):
+            self.stats["clips_sent"] += 1
+    
+    def _delivery_failed(self, handle, tier, chat_id, error, attempts=1):
+        """خطأ مؤقت → طابور إعادة المحاولة (ضمن المهلة)، وإلا فشل نهائي"""
+        if is_transient(error):
+            entry = RetryEntry(handle, tier, chat_id, handle.started_at + self._retry_deadline())
+            entry.attempts = attempts
+            if self.retries.push(entry):
+                self.ledger.retrying(handle.clip_id, chat_id, error, attempts)
+                metrics.DELIVERIES.labels(self.name, "retried").inc()
+                return
+            # لا وقت أو محاولات متبقية لمقطع حي
+            status = "expired"
+        else:
+            status = "failed"
+        self.subscribers.record_delivery(chat_id, error)
+        self.ledger.failed(handle.clip_id, chat_id, error, attempts, status)
+        metrics.DELIVERIES.labels(self.name, status).inc()
+    
+    def _retry_deadline(self):
+        return float(self.config.get("RETRY_DEADLINE_SECONDS", 30))
+    
+    async def _retry_worker(self):
+        """إعادة محاولة الوجهات المؤجلة بترتيب استحقاقها (بـ file_id إن وُجد بدل إعادة الرفع)"""
+        while self.broadcast_running:
+            entry = await self.retries.next_due()
+            handle = entry.handle
+            try:
+                with correlation(handle.clip_id):
+                    await self._retry_delivery(entry)
+            finally:
+                handle.release()
+    
+    async def _retry_delivery(self, entry):
+        handle = entry.handle
+        attempts = entry.attempts + 1
+        audio = RENDITION_LADDER.get(entry.tier, {}).get("audio_only", False)
+        file_id = handle.file_ids.get(entry.tier)
         try:
-            with open(clip_path, "rb") as f:
-                await self.bot.send_video(
-                    chat_id=self.config.get("CHANNEL_ID"),
-                    video=f,
-                    supports_streaming=True,
-                    read_timeout=300,
-                    write_timeout=300
+            if file_id:
+                await self.dispatcher.send(
+                    entry.chat_id,
+                    self._timed("retry", lambda chat_id: self._send_file_id(chat_id, file_id, audio))
                 )
-            success_count += 1
-            print("✅ القناة")
+            else:
+                file_id = await self.dispatcher.send(
+                    entry.chat_id,
+                    self._timed("retry", lambda chat_id: self._upload_clip(chat_id, handle.clips[entry.tier], audio))
+                )
+                if file_id:
+                    handle.file_ids[entry.tier] = file_id
         except Exception as e:
-            print(f"❌ القناة: {str(e)[:50]}")
+            logger.warning(f"🔁 محاولة {attempts} → {entry.chat_id}: {str(e)[:50]}")
+            self._delivery_failed(handle, entry.tier, entry.chat_id, e, attempts)
+            return
+        logger.info(f"🔁 تسليم متأخر → {entry.chat_id} (محاولة {attempts})")
+        self._delivered(handle, entry.chat_id, attempts)
+    
+    def _expire_retries(self):
+        """إيقاف البث: المحاولات المعلقة تُسجل منتهية وتُحرر مقاطعها"""
+        for entry in self.retries.clear():
+            self.ledger.failed(entry.handle.clip_id, entry.chat_id, None, entry.attempts, "expired")
+            metrics.DELIVERIES.labels(self.name, "expired").inc()
+            entry.handle.release()
+    
+    def _timed(self, method, send_fn):
+        """تغليف دالة إرسال لقياس زمنها وتصنيف أخطائها في المقاييس"""
+        destinations = set(map(str, self.get_destinations()))
         
-        # إرسال للمشتركين
-        for user_id in self.active_users:
+        async def timed(chat_id):
+            # المشتركون يُجمعون في تسمية واحدة حتى لا يتضخم عدد السلاسل
+            destination = str(chat_id) if str(chat_id) in destinations else "subscribers"
+            start_time = time.monotonic()
             try:
-                with open(clip_path, "rb") as f:
-                    await self.bot.send_video(
-                        chat_id=user_id,
+                return await send_fn(chat_id)
+            except Exception as e:
+                metrics.SEND_FAILURES.labels(self.name, type(e).__name__).inc()
+                raise
+            finally:
+                metrics.UPLOAD_SECONDS.labels(self.name, destination, method).observe(time.monotonic() - start_time)
+        return timed
+    
+    def _record_batch(self, batch):
+        """تحديث حالة المشتركين من نتائج دفعة إرسال"""
+        for chat_id, value in batch.results.items():
+            self.subscribers.record_delivery(chat_id, value if isinstance(value, Exception) else None)
+    
+    async def _upload_clip(self, chat_id, clip_path, audio=False):
+        """رفع ملف المقطع إلى محادثة وإرجاع file_id الخاص به"""
+        if isinstance(clip_path, MemoryClip):
+            # الرفع من الذاكرة مباشرة (bytes لا تُنسخ)، والمدة معروفة لأن moov الفارغ لا يحملها
+            message = await self.bot.send_video(
+                chat_id=chat_id,
+                video=clip_path.data,
+                filename=clip_path.name,
+                duration=round(clip_path.end - clip_path.start),
+                supports_streaming=True,
+                read_timeout=300,
+                write_timeout=300
+            )
+        else:
+            with open(clip_path, "rb") as f:
+                if audio:
+                    message = await self.bot.send_audio(
+                        chat_id=chat_id,
+                        audio=f,
+                        read_timeout=300,
+                        write_timeout=300
+                    )
+                else:
+                    message = await self.bot.send_video(
+                        chat_id=chat_id,
                         video=f,
                         supports_streaming=True,
                         read_timeout=300,
                         write_timeout=300
                     )
-                success_count += 1
-            except:
-                pass
-            await asyncio.sleep(0.1)
         
-        self.stats["clips_sent"] += 1
-        print(f"📊 {success_count}/{len(self.active_users) + 1}")
+        # قد يحفظ Telegram الملف كفيديو أو صوت أو كمستند أو كصورة متحركة
+        media = message.video or message.audio or message.document or message.animation
+        return media.file_id if media else None
+    
+    async def send_replay(self, chat_id, seconds):
+        """دمج آخر seconds ثانية من حلقة الإعادة بالنسخ المباشر وإرسالها إلى chat_id
+        
+        يرجع مدة الإعادة المرسلة، أو None إذا كانت الحلقة فارغة أو فشل الدمج.
+        """
+        segments = self.replay.select(seconds, max_bytes=TELEGRAM_UPLOAD_LIMIT)
+        if not segments:
+            return None
         
-        # لا نحذف الملف هنا، سيُحذف في consumer
-        return success_count > 0
+        stamp = f"{self.name}_replay_{int(time.time() * 1000)}"
+        list_file = self.spool.path(f"{stamp}.txt")
+        output_path = self.spool.path(f"{stamp}.mp4")
+        spilled = []
+        
+        # المقاطع المختارة لا تُحذف من الحلقة حتى ينتهي الدمج
+        self.replay.pin()
+        try:
+            paths = []
+            for _, _, clip in segments:
+                if isinstance(clip, MemoryClip):
+                    clip = clip.spill(self.spool.path(f"{stamp}_{clip.name}"))
+                    spilled.append(clip)
+                paths.append(clip)
+            self._write_concat_list(list_file, paths)
+            result = await self.ffmpeg.run(build_concat_command(list_file, output_path), timeout=30)
+        finally:
+            self.replay.unpin()
+            for path in spilled + [list_file]:
+                self._discard_clip(path)
+        
+        try:
+            if not result.success or not clip_size(output_path):
+                logger.error(f"❌ تعذر دمج الإعادة: {result.error or result.stderr[-100:]}", extra=result.diagnostics())
+                return None
+            await self.dispatcher.send(
+                chat_id,
+                self._timed("replay", lambda chat_id: self._upload_clip(chat_id, output_path))
+            )
+        finally:
+            self._discard_clip(output_path)
+        
+        duration = segments[-1][1] - segments[0][0]
+        logger.info(f"⏪ [{self.name}] إعادة {duration:.1f}ث ({len(segments)} مقاطع) → {chat_id}")
+        return duration
+    
+    def _send_file_id(self, chat_id, file_id, audio=False):
+        """إعادة إرسال ملف مخزن لدى Telegram"""
+        if audio:
+            return self.bot.send_audio(chat_id=chat_id, audio=file_id)
+        return self.bot.send_video(chat_id=chat_id, video=file_id, supports_streaming=True)
     
     async def _send_start_message(self):
         """إرسال رسالة بداية البث"""
-        try:
-            await self.bot.send_message(
-                chat_id=self.config.get("CHANNEL_ID"),
-                text="🎬 البث الذكي بدأ\n✨ Python + Bash 🚀"
-            )
-        except:
-            pass
+        text = "🎬 البث الذكي بدأ\n✨ Python + FFmpeg 🚀"
         
-        for user_id in self.active_users:
-            try:
-                await self.bot.send_message(
-                    chat_id=user_id,
-                    text="🎬 البث الذكي بدأ\n✨ Python + Bash 🚀"
-                )
-            except:
-                pass
-            await asyncio.sleep(0.1)
+        batch = await self.dispatcher.dispatch(
+            self.get_destinations() + self._subscriber_recipients(),
+            lambda chat_id: self.bot.send_message(chat_id=chat_id, text=text)
+        )
+        self._record_batch(batch)
+        logger.info(f"📣 رسالة البداية: {batch.sent}/{batch.total} في {batch.elapsed:.2f}ث")
     
     async def _broadcast_loop(self):
-        """حلقة البث الرئيسية"""
-        print("🎬 بدء البث الذكي (Python + Bash)...")
+        """حلقة البث الرئيسية - المنتج والمستهلك كمهمتين على نفس الحلقة"""
+        logger.info(f"🎬 [{self.name}] بدء البث الذكي (Python + FFmpeg)...")
         await self._send_start_message()
-        await asyncio.sleep(1)
         
-        executor = ThreadPoolExecutor(max_workers=3)
-        loop = asyncio.get_event_loop()
+        tasks = [
+            asyncio.create_task(self._supervise("producer", self._smart_producer), name="producer"),
+            asyncio.create_task(self._supervise("consumer", self._smart_consumer), name="consumer"),
+            asyncio.create_task(self._supervise("retry", self._retry_worker), name="retry"),
+        ]
         
-        # تشغيل Producer في thread منفصل
-        loop.run_in_executor(executor, self._smart_producer)
-        
-        # تشغيل Consumer
-        await self._smart_consumer()
+        stopping = False
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            # gather ألغى المهام بنفسه؛ إلغاؤها مرة ثانية يقطع إغلاق المسجل في المنتج
+            stopping = True
+            raise
+        finally:
+            if not stopping:
+                # انتهت إحدى المهام أو انهارت: إيقاف البقية معاً
+                for task in tasks:
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._expire_retries()
@@ -0,0 +1,177 @@
+# subscribers.py - سجل المشتركين (ذاكرة + SQLite)
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from telegram.error import BadRequest, Forbidden
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """حالة مشترك واحد"""
+
+    __slots__ = ("user_id", "blocked", "joined_at", "last_delivery", "failures", "tier")
+
+    def __init__(self, user_id, blocked=False, joined_at=None, last_delivery=None, failures=0, tier=None):
+        self.user_id = user_id
+        self.blocked = bool(blocked)
+        self.joined_at = joined_at or time.time()
+        self.last_delivery = last_delivery
+        self.failures = failures
+        # مستوى الجودة المختار (None = المستوى الافتراضي)
+        self.tier = tier
+
+
+class SubscriberStore:
+    """مشتركون في قاموس للوصول O(1)، تُكتب تغييراتهم دفعة واحدة إلى SQLite (WAL)"""
+
+    def __init__(self, db_path="data/subscribers.db", flush_interval=2.0):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self._users = {}
+        self._dirty = set()
+        self._db_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS subscribers ("
+            " user_id TEXT PRIMARY KEY,"
+            " blocked INTEGER NOT NULL DEFAULT 0,"
+            " joined_at REAL,"
+            " last_delivery REAL,"
+            " failures INTEGER NOT NULL DEFAULT 0,"
+            " tier TEXT)"
+        )
+        # قواعد بيانات أنشئت قبل إضافة مستويات الجودة
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(subscribers)")}
+        if "tier" not in columns:
+            self._db.execute("ALTER TABLE subscribers ADD COLUMN tier TEXT")
+        self._db.commit()
+
+        for row in self._db.execute("SELECT user_id, blocked, joined_at, last_delivery, failures, tier FROM subscribers"):
+            self._users[row[0]] = Subscriber(*row)
+
+    def __contains__(self, user_id):
+        user = self._users.get(str(user_id))
+        return user is not None and not user.blocked
+
+    def __len__(self):
+        return sum(1 for user in self._users.values() if not user.blocked)
+
+    def __iter__(self):
+        return iter(self.reachable())
+
+    def get(self, user_id):
+        return self._users.get(str(user_id))
+
+    def reachable(self):
+        """المشتركون الذين يمكن الإرسال إليهم"""
+        return [user_id for user_id, user in self._users.items() if not user.blocked]
+
+    def add(self, user_id):
+        """إضافة مشترك (أو إعادة تفعيله) - يرجع True إذا كان جديداً أو محظوراً سابقاً"""
+        user_id = str(user_id)
+        user = self._users.get(user_id)
+        if user is not None and not user.blocked:
+            return False
+
+        if user is None:
+            self._users[user_id] = Subscriber(user_id)
+        else:
+            user.blocked = False
+            user.failures = 0
+        self._dirty.add(user_id)
+        return True
+
+    def tier(self, user_id):
+        """مستوى الجودة المختار للمحادثة أو None"""
+        user = self._users.get(str(user_id))
+        return user.tier if user is not None else None
+
+    def set_tier(self, user_id, tier):
+        """تغيير مستوى الجودة لمشترك موجود - يرجع False إذا لم يكن مشتركاً"""
+        user = self._users.get(str(user_id))
+        if user is None:
+            return False
+        user.tier = tier
+        self._dirty.add(user.user_id)
+        return True
+
+    def record_delivery(self, user_id, error=None):
+        """تسجيل نتيجة إرسال، وحظر المحادثات التي لم تعد متاحة"""
+        user = self._users.get(str(user_id))
+        if user is None:
+            return
+
+        if error is None:
+            user.last_delivery = time.time()
+            user.failures = 0
+        else:
+            user.failures += 1
+            if self.is_unreachable(error):
+                user.blocked = True
+                logger.info(f"🚫 حذف مشترك غير متاح: {user.user_id}")
+        self._dirty.add(user.user_id)
+
+    @staticmethod
+    def is_unreachable(error):
+        """البوت محظور أو المحادثة غير موجودة"""
+        if isinstance(error, Forbidden):
+            return True
+        return isinstance(error, BadRequest) and "chat not found" in str(error).lower()
+
+    def flush(self):
+        """كتابة التغييرات المعلقة دفعة واحدة"""
+        return self._write(self._take_dirty())
+
+    def _take_dirty(self):
+        """صفوف المشتركين المتغيرين - تُؤخذ في خيط حلقة الأحداث الذي يعدلهم"""
+        dirty, self._dirty = self._dirty, set()
+        return [
+            (u.user_id, int(u.blocked), u.joined_at, u.last_delivery, u.failures, u.tier)
+            for u in (self._users[user_id] for user_id in dirty)
+        ]
+
+    def _write(self, rows):
+        if not rows:
+            return 0
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT INTO subscribers (user_id, blocked, joined_at, last_delivery, failures, tier)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(user_id) DO UPDATE SET"
+                " blocked=excluded.blocked, last_delivery=excluded.last_delivery,"
+                " failures=excluded.failures, tier=excluded.tier",
+                rows
+            )
+            self._db.commit()
+        return len(rows)
+
+    async def run_flusher(self):
+        """مهمة خلفية تكتب التغييرات كل flush_interval ثانية خارج حلقة الأحداث
+
+        الخيط يكتب صفوفاً منسوخة فقط، فلا يقرأ _users و _dirty أثناء تعديلها.
+        """
+        write = None
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                rows = self._take_dirty()
+                write = asyncio.ensure_future(asyncio.to_thread(self._write, rows))
+                try:
+                    await asyncio.shield(write)
+                except sqlite3.Error as e:
+                    # تُعاد المحاولة في الدفعة التالية
+                    self._dirty.update(row[0] for row in rows)
+                    logger.warning(f"⚠️ فشل حفظ المشتركين: {str(e)[:50]}")
+        finally:
+            # الدفعة الأخيرة تُكتب بعد انتهاء الجارية حتى لا تكتب القديمة فوقها
+            if write is not None and not write.done():
+                await asyncio.wait([write])
+            self.flush()
@@ -0,0 +1,38 @@
+# utils.py - دوال مساعدة للنظام
+import glob
+import logging
+import os
+import shutil
+
+
+def create_directory(dir_path):
+    """إنشاء مجلد إن لم يكن موجوداً"""
+    os.makedirs(dir_path, exist_ok=True)
+    return dir_path
+
+
+def check_disk_space(path="."):
+    """المساحة المتاحة بالميجابايت"""
+    return shutil.disk_usage(path).free // (1024 * 1024)
+
+
+def check_ffmpeg():
+    """مسار FFmpeg إن كان متوفراً، وإلا None"""
+    return shutil.which("ffmpeg")
+
+
+def cleanup_temp_files(temp_dir="temp_clips", pattern="*_clip_*"):
+    """حذف الملفات المؤقتة المطابقة للنمط وإرجاع عدد المحذوف (افتراضياً مقاطع مجلد SPOOL_DIR)"""
+    deleted = 0
+    for path in glob.glob(os.path.join(temp_dir, pattern)):
+        try:
+            os.remove(path)
+            deleted += 1
+        except OSError:
+            pass
+    return deleted
+
+
+def log_message(message, level="INFO"):
+    """تسجيل رسالة عبر نظام التسجيل (طابور غير حاجب إلى logs/bot.jsonl)"""
+    logging.getLogger("bot").log(logging.getLevelName(level.upper()), message)
@@ -0,0 +1,459 @@
+# video_processor.py - بناء أوامر FFmpeg لمعالجة الفيديو
+import copy
+
+# ترتيب إعدادات x264 من الأسرع إلى الأبطأ
+PRESET_LADDER = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium"]
+
+# أقصى ارتفاع للصورة عند التخفيض التلقائي (None = دقة المصدر)
+HEIGHT_LADDER = [None, 720, 540, 360]
+
+# حد رفع الملفات لبوتات Telegram
+TELEGRAM_UPLOAD_LIMIT = 50 * 1024 * 1024
+
+# معدل الصوت الثابت (kbps)
+AUDIO_KBPS = 128
+
+# ملفات الترميز: الأولوية للتأخير أو التوازن أو الحجم
+ENCODER_PROFILES = {
+    "latency": {"preset": "ultrafast", "tune": "zerolatency", "crf_offset": 0},
+    "balanced": {"preset": "veryfast", "tune": "zerolatency", "crf_offset": 0},
+    "size": {"preset": "medium", "tune": None, "crf_offset": 2},
+}
+
+# المستوى الافتراضي: مخرج المسجل الرئيسي (دقة المصدر أو ما يحدده المتحكم التكيفي)
+DEFAULT_TIER = "hd"
+
+# مستويات إضافية تُنتج من نفس فك الترميز (split) في عملية المسجل نفسها
+RENDITION_LADDER = {
+    "720p": {"height": 720, "ext": ".mp4"},
+    "480p": {"height": 480, "ext": ".mp4"},
+    "360p": {"height": 360, "ext": ".mp4"},
+    "audio": {"audio_only": True, "audio_kbps": 64, "ext": ".m4a"},
+}
+
+
+class EncoderSettings:
+    """إعدادات ترميز x264 الحالية (قابلة للتعديل من المتحكم التكيفي)"""
+
+    def __init__(self, profile="balanced", crf=26, keyframe_interval=2, threads=1, max_height=None):
+        if profile not in ENCODER_PROFILES:
+            raise ValueError(f"Unknown encoder profile: {profile}")
+
+        spec = ENCODER_PROFILES[profile]
+        self.profile = profile
+        self.preset = spec["preset"]
+        self.base_preset = spec["preset"]
+        self.tune = spec["tune"]
+        self.crf = int(crf) + spec["crf_offset"]
+        self.keyframe_interval = float(keyframe_interval)
+        self.threads = int(threads)
+        self.max_height = max_height
+        # سقف معدل الفيديو (VBV) لضمان حجم المقطع، None = بدون سقف
+        self.maxrate_kbps = None
+
+    @classmethod
+    def from_config(cls, config, profile=None):
+        return cls(
+            profile=profile or config.get("ENCODER_PROFILE", "balanced"),
+            crf=config.get("CRF", 26),
+            keyframe_interval=config.get("KEYFRAME_INTERVAL", 2)
+        )
+
+    def for_height(self, height):
+        """نسخة من الإعدادات بدقة مستوى أدنى (خيط واحد يكفي للدقة الصغيرة)"""
+        rendition = copy.copy(self)
+        rendition.max_height = height
+        rendition.threads = 1
+        return rendition
+
+    def describe(self):
+        height = f"{self.max_height}p" if self.max_height else "source"
+        cap = f" ≤{self.maxrate_kbps}k" if self.maxrate_kbps else ""
+        return f"{self.profile}: {self.preset} crf={self.crf}{cap} threads={self.threads} {height}"
+
+
+def clip_byte_budget(config):
+    """أقصى حجم مسموح للمقطع بالبايت (MAX_CLIP_MB بحد أقصى حد Telegram)"""
+    budget = int(float(config.get("MAX_CLIP_MB", 20)) * 1024 * 1024)
+    return min(budget, TELEGRAM_UPLOAD_LIMIT)
+
+
+def video_kbps_for_budget(budget_bytes, duration, overhead=0.92):
+    """معدل الفيديو (kbps) الذي يُبقي مقطعاً بهذه المدة تحت الميزانية
+
+    overhead يترك هامشاً لحاوية MP4 وتجاوز VBV اللحظي.
+    """
+    total_kbps = budget_bytes * 8 / 1000 / max(duration, 0.1) * overhead
+    return max(int(total_kbps - AUDIO_KBPS), 100)
+
+
+def watermark_overlay():
+    """تركيب شريط العلامة المائية (الإدخال الثاني) متحركاً من اليمين إلى اليسار"""
+    return "overlay=x=W-mod(100*t\\,W+w):y=H-h-80:eof_action=repeat"
+
+
+def build_watermark_command(text_file, output_path, width, height, fontsize=32, fontfile=None):
+    """أمر رسم نص العلامة مرة واحدة في شريط PNG شفاف
+
+    النص يُقرأ من ملف (textfile) مع expansion=none فلا يحتاج تهريباً، ومسارا
+    الملفين يُهربان كأي قيمة فلتر.
+    """
+    font = f":fontfile={filter_value(fontfile)}" if fontfile else ""
+    return [
+        "-y", "-loglevel", "error",
+        "-f", "lavfi",
+        "-i", f"color=c=black@0.0:s={width}x{height},format=rgba",
+        "-vf", (
+            f"drawtext=textfile={filter_value(text_file)}:expansion=none{font}:fontsize={fontsize}:"
+            "x=4:y=(h-th)/2:fontcolor=white@0.95:borderw=0.8:bordercolor=black@0.6"
+        ),
+        "-frames:v", "1",
+        output_path
+    ]
+
+
+def input_args(source_url, low_latency=False):
+    """معاملات الإدخال لبث مباشر مع إعادة الاتصال
+
+    low_latency: بدون تخزين مؤقت للإدخال وفحص أقصر للمصدر عند الاتصال.
+    """
+    args = [
+        "-reconnect", "1",
+        "-reconnect_streamed", "1",
+        "-reconnect_delay_max", "5",
+        "-timeout", "10000000",
+    ]
+    if low_latency:
+        args += [
+            "-fflags", "+genpts+igndts+discardcorrupt+nobuffer",
+            "-flags", "low_delay",
+            "-probesize", "1000000",
+            "-analyzeduration", "1000000",
+        ]
+    else:
+        args += ["-fflags", "+genpts+igndts+discardcorrupt"]
+    return args + ["-i", source_url]
+
+
+def rendition_tiers(config):
+    """المستويات المتاحة للمشتركين: الافتراضي ثم مستويات RENDITIONS المعروفة"""
+    return [DEFAULT_TIER] + [tier for tier in config.get("RENDITIONS") or [] if tier in RENDITION_LADDER]
+
+
+def audio_args(kbps=AUDIO_KBPS):
+    """معاملات ترميز الصوت AAC"""
+    return [
+        "-c:a", "aac",
+        "-b:a", f"{kbps}k",
+        "-ar", "44100",
+        "-ac", "2",
+    ]
+
+
+def encode_args(segment_duration, settings=None):
+    """معاملات الترميز H.264/AAC المتوافقة مع Telegram"""
+    settings = settings or EncoderSettings()
+    # إطار مفتاحي كل KEYFRAME_INTERVAL، ويُقص المقطع عند أول إطار مفتاحي بعد مدته
+    keyframe_interval = min(settings.keyframe_interval, segment_duration)
+
+    args = [
+        "-async", "1",
+        "-vsync", "passthrough",
+        "-c:v", "libx264",
+        "-preset", settings.preset,
+    ]
+    if settings.tune:
+        args += ["-tune", settings.tune]
+    args += ["-crf", str(settings.crf)]
+    if settings.maxrate_kbps:
+        # CRF مع سقف VBV: الجودة ثابتة ما دام الحجم ضمن الميزانية
+        args += [
+            "-maxrate", f"{settings.maxrate_kbps}k",
+            "-bufsize", f"{settings.maxrate_kbps}k",
+        ]
+    args += [
+        "-sc_threshold", "0",
+        "-force_key_frames", f"expr:gte(t,n_forced*{keyframe_interval})",
+        "-threads", str(settings.threads),
+        "-pix_fmt", "yuv420p",
+    ]
+    args += audio_args()
+    args += [
+        "-avoid_negative_ts", "make_zero",
+        "-max_delay", "0"
+    ]
+    return args
+
+
+def scale_filter(settings):
+    """فلتر تخفيض الدقة إلى max_height (بدون تكبير) أو None"""
+    if settings and settings.max_height:
+        return f"scale=-2:'min(ih,{settings.max_height})'"
+    return None
+
+
+def ladder_filter_graph(branches, watermark=False):
+    """filter_complex لفك ترميز واحد: العلامة المائية مرة واحدة ثم split لكل مخرج
+
+    branches: إعدادات كل مخرج فيديو بالترتيب؛ watermark: شريط العلامة هو الإدخال الثاني.
+    يرجع (الرسم، تسمية مخرج كل فرع).
+    """
+    head = []
+    if watermark:
+        head.append(watermark_overlay())
+    if len(branches) > 1:
+        head.append(f"split={len(branches)}" + "".join(f"[v{i}]" for i in range(len(branches))))
+        chains = [f"[0:v]{'[1:v]' if watermark else ''}{','.join(head)}"]
+    else:
+        chains = [f"[0:v]{'[1:v]' if watermark else ''}{','.join(head) or 'null'}[v0]"]
+
+    labels = []
+    for i, settings in enumerate(branches):
+        scale = scale_filter(settings)
+        if scale:
+            chains.append(f"[v{i}]{scale}[o{i}]")
+            labels.append(f"[o{i}]")
+        else:
+            labels.append(f"[v{i}]")
+    return ";".join(chains), labels
+
+
+def filter_value(value):
+    """تهريب قيمة خيار فلتر (مثل مسار ملف) على مستويي الخيار ورسم الفلاتر"""
+    for char in "\\':":
+        value = value.replace(char, "\\" + char)
+    for char in "\\'[],;":
+        value = value.replace(char, "\\" + char)
+    return value
+
+
+def analysis_filter_graph(scene_file, silence_file=None, scene_threshold=10, silence_db=-45, height=90, fps=5):
+    """فرع تحليل خفيف من نفس اتصال المسجل: تغير المشهد (scdet) والصمت (silencedetect)
+
+    نسخة مصغرة بمعدل إطارات منخفض؛ الإشارات تُكتب بـ metadata=print دون تخزين
+    مؤقت (direct) والأزمنة من صفر التشغيل كأزمنة قائمة المقاطع.
+    يرجع (الرسم، تسميات مخرجاته) لتوجيهها إلى analysis_output_args.
+    """
+    chains = [
+        f"[0:v:0]setpts=PTS-STARTPTS,fps={fps},scale=-2:{height},scdet=threshold={scene_threshold},"
+        f"metadata=mode=print:file={filter_value(scene_file)}:direct=1[scan_v]"
+    ]
+    labels = ["[scan_v]"]
+    if silence_file:
+        chains.append(
+            f"[0:a:0]asetpts=PTS-STARTPTS,aresample=8000,silencedetect=noise={silence_db}dB:duration=0.5,"
+            f"ametadata=mode=print:file={filter_value(silence_file)}:direct=1[scan_a]"
+        )
+        labels.append("[scan_a]")
+    return ";".join(chains), labels
+
+
+def analysis_output_args(labels):
+    """مخرج null لفرع التحليل (الإطارات لا تُرمّز ولا تُكتب)"""
+    args = []
+    for label in labels:
+        args += ["-map", label]
+    return args + ["-c:v", "wrapped_avframe", "-c:a", "pcm_s16le", "-f", "null", "-"]
+
+
+def segment_args(output_pattern, list_file, segment_duration, low_latency=False):
+    """معاملات segment muxer لمخرج واحد مع قائمة CSV للمقاطع المكتملة
+
+    low_latency: بدون faststart (نقل moov يعيد كتابة الملف قبل ظهوره في القائمة،
+    ولا فائدة منه لمقطع مدته ثانيتان).
+    """
+    args = [
+        "-f", "segment",
+        "-segment_time", str(segment_duration),
+        "-segment_format", "mp4",
+    ]
+    if not low_latency:
+        args += ["-segment_format_options", "movflags=+faststart"]
+    return args + [
+        "-reset_timestamps", "1",
+        "-segment_list", list_file,
+        "-segment_list_type", "csv",
+        output_pattern
+    ]
+
+
+def fragmented_args(output):
+    """مخرج MP4 مجزأ (fMP4) إلى أنبوب: moov فارغ في البداية وجزء عند كل إطار مفتاحي
+
+    لا يحتاج faststart ولا ملفاً؛ FragmentSplitter يجمع الأجزاء في مقاطع.
+    """
+    return [
+        "-f", "mp4",
+        "-movflags", "+frag_keyframe+empty_moov+default_base_moof",
+        "-flush_packets", "1",
+        output
+    ]
+
+
+def copy_args():
+    """معاملات النسخ المباشر بدون ترميز (القص يقع على الإطارات المفتاحية للمصدر)"""
+    return [
+        "-map", "0:v:0",
+        "-map", "0:a:0?",
+        "-c", "copy",
+        # AAC القادم من MPEG-TS/HLS يحتاج تحويل ADTS ليُحفظ داخل MP4
+        "-bsf:a", "aac_adtstoasc",
+        "-avoid_negative_ts", "make_zero"
+    ]
+
+
+def is_telegram_compatible(info):
+    """هل ترميز المصدر (من ProbeResult) صالح للإرسال إلى Telegram بدون إعادة ترميز"""
+    video = info.stream("video")
+    audio = info.stream("audio")
+
+    if not video or video.get("codec_name") != "h264":
+        return False
+    if video.get("pix_fmt") not in ("yuv420p", "yuvj420p"):
+        return False
+    if audio and audio.get("codec_name") != "aac":
+        return False
+    return True
+
+
+def build_segment_command(source_url, output_pattern, list_file, segment_duration,
+                          watermark_image=None, stream_copy=False, encoder=None, renditions=None,
+                          low_latency=False, pipe_output=None, analysis=None):
+    """أمر المسجل الدائم: اتصال واحد بالمصدر ومقاطع MP4 متتالية عبر segment muxer
+
+    كل مقطع مكتمل يُضاف إلى list_file بصيغة CSV (الاسم,البداية,النهاية).
+    مع stream_copy تُنسخ التدفقات كما هي ولا تُطبق العلامة المائية.
+    watermark_image: شريط PNG للعلامة (من WatermarkCache) يُركب بـ overlay.
+    renditions: [(المستوى، نمط المخرج، ملف القائمة)] مستويات فيديو إضافية من RENDITION_LADDER
+    تُقسم على نفس أزمنة المخرج الرئيسي ومن نفس فك الترميز (مستوى الصوت فقط يُستخرج
+    من المقطع الرئيسي بعد اكتماله، build_audio_command).
+    low_latency: مقاطع قصيرة يبدأ كل منها بإطار مفتاحي (GOP = مدة المقطع) فيُغلق
+    المقطع فور وصول إطاره المفتاحي التالي.
+    pipe_output: مخرج رئيسي fMP4 إلى أنبوب (pipe:N) بدل ملفات المقاطع.
+    analysis: (الرسم، التسميات) من analysis_filter_graph يُضاف إلى نفس فك الترميز.
+    """
+    args = ["-y", "-loglevel", "error"] + input_args(source_url, low_latency)
+    renditions = renditions or []
+
+    encoder = encoder or EncoderSettings()
+    if low_latency:
+        encoder = copy.copy(encoder)
+        encoder.keyframe_interval = segment_duration
+        # بدون lookahead حتى لا ينتظر المرمّز إطارات بعد نهاية المقطع
+        encoder.tune = encoder.tune or "zerolatency"
+    rung_settings = {
+        tier: encoder.for_height(RENDITION_LADDER[tier]["height"])
+        for tier, _, _ in renditions if not RENDITION_LADDER[tier].get("audio_only")
+    }
+    branches = ([] if stream_copy else [encoder]) + list(rung_settings.values())
+    watermark = bool(watermark_image and branches)
+
+    labels = []
+    if watermark:
+        # صورة واحدة تُفك مرة واحدة ويكرر overlay آخر إطار منها
+        args += ["-i", watermark_image]
+    graphs = []
+    if branches:
+        graph, labels = ladder_filter_graph(branches, watermark)
+        graphs.append(graph)
+    if analysis:
+        graphs.append(analysis[0])
+    if graphs:
+        args += ["-filter_complex", ";".join(graphs)]
+    labels = iter(labels)
+
+    if stream_copy:
+        args += copy_args()
+    else:
+        args += ["-map", next(labels), "-map", "0:a:0?"] + encode_args(segment_duration, encoder)
+    if pipe_output:
+        args += fragmented_args(pipe_output)
+    else:
+        args += segment_args(output_pattern, list_file, segment_duration, low_latency)
+
+    for tier, rung_pattern, rung_list in renditions:
+        if tier not in rung_settings:
+            # مقسم صوت مستقل يقطع عند المدة بالضبط لا عند إطارات الفيديو المفتاحية
+            raise ValueError(f"Audio-only tier {tier} is extracted from finished clips")
+        args += ["-map", next(labels), "-map", "0:a:0?"] + encode_args(segment_duration, rung_settings[tier])
+        args += segment_args(rung_pattern, rung_list, segment_duration, low_latency)
+    if analysis:
+        args += analysis_output_args(analysis[1])
+    return args
+
+
+def build_concat_command(list_file, output_path):
+    """أمر دمج مقاطع متتالية (ملف قائمة concat) بالنسخ المباشر دون إعادة ترميز
+
+    مقاطع المسجل تبدأ كلها بإطار مفتاحي وبنفس الترميز فتتصل دون فك.
+    """
+    return [
+        "-y", "-loglevel", "error",
+        "-f", "concat", "-safe", "0",
+        "-i", list_file,
+        "-map", "0:v:0",
+        "-map", "0:a:0?",
+        "-c", "copy",
+        "-movflags", "+faststart",
+        output_path
+    ]
+
+
+def build_audio_command(input_path, output_path, kbps):
+    """أمر استخراج مستوى الصوت فقط من مقطع مكتمل (بنفس حدوده تماماً)"""
+    return [
+        "-y", "-loglevel", "error",
+        "-i", input_path,
+        "-map", "0:a:0",
+        "-vn"
+    ] + audio_args(kbps) + [
+        "-movflags", "+faststart",
+        output_path
+    ]
+
+
+def build_fingerprint_command(input_path, frames_output, audio_output=None, size=16):
+    """أمر استخراج مادة البصمة: الإطارات المفتاحية فقط مصغرة رمادية، وصوت أحادي بمعدل منخفض
+
+    skip_frame=nokey يفك الإطارات المفتاحية وحدها (مرة كل KEYFRAME_INTERVAL)
+    فالكلفة جزء صغير من فك المقطع كاملاً.
+    """
+    args = [
+        "-y", "-loglevel", "error",
+        "-skip_frame", "nokey",
+        "-i", input_path,
+        "-map", "0:v:0",
+        "-vf", f"scale={size}:{size},format=gray",
+        "-vsync", "passthrough",
+        "-f", "rawvideo",
+        frames_output
+    ]
+    if audio_output:
+        args += [
+            "-map", "0:a:0",
+            "-ac", "1",
+            "-ar", "4000",
+            "-f", "s16le",
+            audio_output
+        ]
+    return args
+
+
+def build_compress_command(input_path, output_path, crf=28, preset="faster", maxrate_kbps=None):
+    """أمر ضغط فيديو موجود (مع سقف معدل اختياري لميزانية الحجم)"""
+    args = [
+        "-y", "-loglevel", "error",
+        "-i", input_path,
+        "-c:v", "libx264",
+        "-crf", str(crf),
+        "-preset", preset,
+    ]
+    if maxrate_kbps:
+        args += ["-maxrate", f"{maxrate_kbps}k", "-bufsize", f"{maxrate_kbps}k"]
+    args += [
+        "-pix_fmt", "yuv420p",
+        "-c:a", "copy",
+        "-movflags", "+faststart",
+        output_path
+    ]
+    return args
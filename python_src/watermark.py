@@ -0,0 +1,70 @@
+# watermark.py - شريط العلامة المائية المرسوم مسبقاً (PNG شفاف) مع ذاكرة LRU
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from python_src.video_processor import build_watermark_command
+
+logger = logging.getLogger(__name__)
+
+
+class WatermarkCache:
+    """يرسم نص العلامة مرة واحدة لكل (نص، خط، حجم) ويحتفظ بآخر max_entries شريطاً
+
+    المسجل يركب الشريط بـ overlay بدل drawtext الذي يرسم المحارف في كل إطار.
+    الأشرطة في مجلد المقاطع (ClipSpool) فتدخل في حصته وتنظيفه بعد الانهيار.
+    """
+
+    def __init__(self, ffmpeg, spool, max_entries=8):
+        self.ffmpeg = ffmpeg
+        self.spool = spool
+        self.max_entries = max(1, max_entries)
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def key(text, fontfile=None, fontsize=32):
+        return hashlib.sha1(f"{text}\0{fontfile or ''}\0{fontsize}".encode()).hexdigest()[:16]
+
+    @staticmethod
+    def strip_size(text, fontsize=32):
+        """أبعاد الشريط: عرض تقديري يتسع للنص (الهامش الشفاف الزائد لا يظهر)"""
+        width = int(len(text) * fontsize * 0.7) + 16
+        height = int(fontsize * 1.6)
+        # yuv420p يحتاج أبعاداً زوجية
+        return width + width % 2, height + height % 2
+
+    async def render(self, text, fontfile=None, fontsize=32):
+        """مسار شريط PNG للنص (من الذاكرة أو برسمه الآن) أو None إذا فشل الرسم"""
+        key = self.key(text, fontfile, fontsize)
+        path = self._entries.get(key)
+        if path and os.path.exists(path):
+            self._entries.move_to_end(key)
+            return path
+
+        text_file = self.spool.path(f"watermark_{key}.txt")
+        path = self.spool.path(f"watermark_{key}.png")
+        with open(text_file, "w", encoding="utf-8") as f:
+            f.write(text)
+
+        width, height = self.strip_size(text, fontsize)
+        try:
+            result = await self.ffmpeg.run(
+                build_watermark_command(text_file, path, width, height, fontsize, fontfile),
+                timeout=30
+            )
+        finally:
+            os.remove(text_file)
+
+        if not result.success or not os.path.exists(path):
+            logger.warning(f"⚠️ فشل رسم العلامة المائية: {result.error or result.stderr[-100:]}", extra=result.diagnostics())
+            return None
+
+        self._entries[key] = path
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.spool.discard(evicted)
+        return path
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,5 +1,14 @@
 # web_server.py - خادم الويب
+import asyncio
+import hmac
+import logging
 from aiohttp import web
+from python_src import metrics
+
+logger = logging.getLogger(__name__)
+
+# تحليل واحد في كل مرة (المحلل يلتقط كل الخيوط)
+_profile_lock = asyncio.Lock()
 
 async def handle_health(request):
     """معالج صفحة الصحة"""
@@ -14,20 +23,52 @@ async def handle_health(request):
         <div style="text-align:center;">
             <h1 style="font-size:36px;margin:0;">🤖 is bot live</h1>
             <p style="font-size:18px;margin:10px 0 0 0;">by: @xl9rr</p>
-            <p style="font-size:14px;color:#666;margin:10px 0 0 0;">Python + Bash Integration</p>
+            <p style="font-size:14px;color:#666;margin:10px 0 0 0;">Python + FFmpeg Integration</p>
         </div>
     </body>
     </html>
     """
     return web.Response(text=html, content_type='text/html')
 
-async def start_web_server():
+async def handle_metrics(request):
+    """مقاييس الأداء بصيغة Prometheus"""
+    return web.Response(
+        text=metrics.REGISTRY.render(),
+        content_type='text/plain',
+        headers={'X-Content-Type-Options': 'nosniff'}
+    )
+
+async def handle_profile(request):
+    """تحليل بالعينات للعملية العاملة لمدة ?seconds=N (للمالك عبر DEBUG_TOKEN)"""
+    config = request.app['config']
+    token = config.get("DEBUG_TOKEN", "") if config else ""
+    supplied = request.query.get('token') or request.headers.get('X-Debug-Token', '')
+    # compare_digest يرفض نص str غير ASCII بـ TypeError؛ المقارنة بالبايتات تعطي 404 كأي رمز خاطئ
+    if not token or not hmac.compare_digest(supplied.encode(), token.encode()):
+        raise web.HTTPNotFound()
+
+    try:
+        seconds = min(max(float(request.query.get('seconds', 10)), 1), 120)
+    except ValueError:
+        raise web.HTTPBadRequest(text="seconds must be a number")
+
+    if _profile_lock.locked():
+        raise web.HTTPConflict(text="profile already running")
+    async with _profile_lock:
+        # العينات تُجمع في خيط منفصل بينما تستمر حلقة الأحداث في العمل
+        profile = await asyncio.to_thread(metrics.sample_profile, seconds)
+    return web.Response(text=profile, content_type='text/plain')
+
+async def start_web_server(config=None):
     """تشغيل خادم الويب"""
     app = web.Application()
+    app['config'] = config
     app.router.add_get('/', handle_health)
     app.router.add_get('/health', handle_health)
+    app.router.add_get('/metrics', handle_metrics)
+    app.router.add_get('/debug/profile', handle_profile)
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, '0.0.0.0', 5000, reuse_address=True, reuse_port=True)
     await site.start()
-    print(f"🌐 Web Server: http://0.0.0.0:5000")
+    logger.info("🌐 Web Server: http://0.0.0.0:5000")
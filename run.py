@@ -10,7 +10,5 @@ from python_src.main import main
 import asyncio
 
 if __name__ == "__main__":
-    print("=" * 60)
-    print("🚀 تليجرام بوت للبث المباشر - Python + Bash Integration")
-    print("=" * 60)
+    # الشعار يُكتب عبر التسجيل بعد تهيئته في main()
     asyncio.run(main())
@@ -0,0 +1,62 @@
+# conftest.py - متحكم بث بإعدادات ومجلد مؤقتين ومسجل وهمي (بلا FFmpeg ولا Telegram)
+import asyncio
+import os
+import pytest
+
+
+class FakeBot:
+    async def send_message(self, chat_id, text):
+        return None
+
+
+class FakeSubscribers:
+    def reachable(self):
+        return []
+
+    def record_delivery(self, chat_id, error):
+        pass
+
+
+class FakeJob:
+    """عملية مسجل تحتاج وقتاً لتغلق، وتكتب آخر مقطع في القائمة عند إيقافها كما يفعل FFmpeg"""
+
+    def __init__(self, run):
+        self.run = run
+        self.running = True
+        self.closed = False
+
+    async def cancel(self, grace=5):
+        if not self.running:
+            return
+        await asyncio.sleep(0.2)
+        clip = self.run.output_pattern % 1
+        with open(clip, "wb") as f:
+            f.write(b"\0" * 8192)
+        with open(self.run.list_file, "a") as f:
+            f.write(f"{os.path.basename(clip)},0.000000,2.000000\n")
+        self.running = False
+        self.closed = True
+
+
+@pytest.fixture
+def controller(tmp_path, monkeypatch):
+    pytest.importorskip("telegram")
+    from python_src.clip_spool import ClipSpool
+    from python_src.config_manager import ConfigManager
+    from python_src.streaming import BroadcastController, RecorderRun
+
+    monkeypatch.chdir(tmp_path)
+    config = ConfigManager(str(tmp_path / "config.json"))
+    config.set("CHANNEL_ID", "-1001", persist=False)
+    spool = ClipSpool(str(tmp_path / "spool"))
+    controller = BroadcastController(config, FakeBot(), {"clips_sent": 0, "clips_failed": 0}, FakeSubscribers(), spool=spool)
+
+    async def start_recorder(clip_duration, inherit=None):
+        run = RecorderRun(spool.next_run_id(), spool, controller.name)
+        run.job = FakeJob(run)
+        controller.started.append(run)
+        return run
+
+    controller.started = []
+    controller._start_recorder = start_recorder
+    return controller
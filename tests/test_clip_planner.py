@@ -0,0 +1,94 @@
+# test_clip_planner.py - حدود المقاطع التكيفية من إشارات تغير المشهد والصمت
+from python_src.clip_planner import AnalysisLog, ClipPlanner
+
+
+def scene_lines(until, score=5.0, cuts=()):
+    """مخرجات metadata=print لفرع scdet: إطار كل 0.5ث وتغيرات مشهد عند cuts"""
+    lines = []
+    for i in range(int(until * 2) + 1):
+        time = i / 2
+        lines += [f"frame:{i}    pts:{i * 45000}  pts_time:{time}", f"lavfi.scd.score={score}"]
+        if time in cuts:
+            lines.append(f"lavfi.scd.time={time}")
+    return "\n".join(lines) + "\n"
+
+
+def analysis(tmp_path, until, score=5.0, cuts=(), silences=None):
+    scene_file = tmp_path / "scenes.txt"
+    scene_file.write_text(scene_lines(until, score, cuts))
+    silence_file = None
+    if silences is not None:
+        silence_file = tmp_path / "silence.txt"
+        text = ""
+        for start, end in silences:
+            text += f"frame:0 pts:0 pts_time:{start}\nlavfi.silence_start={start}\n"
+            if end is not None:
+                text += f"frame:0 pts:0 pts_time:{end}\nlavfi.silence_end={end}\n"
+        silence_file.write_text(text)
+    log = AnalysisLog(str(scene_file), str(silence_file) if silence_file else None)
+    log.read()
+    return log
+
+
+def segments(count, step=2):
+    return [(f"main_clip_1_{i:05d}.mp4", i * step, (i + 1) * step) for i in range(count)]
+
+
+def planner():
+    return ClipPlanner(target=6, max_seconds=12, step=2)
+
+
+def test_cut_at_scene_change(tmp_path):
+    clips = planner()
+    clips.add(segments(7))
+    plans = clips.plan(analysis(tmp_path, 16, cuts=(8.0,)))
+    assert [(p.start, p.end, p.reason) for p in plans][0] == (0, 8, "scene")
+
+
+def test_cut_at_silence(tmp_path):
+    clips = planner()
+    clips.add(segments(5))
+    plans = clips.plan(analysis(tmp_path, 12, silences=[(5.5, 6.5)]))
+    assert (plans[0].end, plans[0].reason) == (6, "silence")
+
+
+def test_target_cut_without_signals(tmp_path):
+    clips = planner()
+    clips.add(segments(7))
+    plans = clips.plan(analysis(tmp_path, 16))
+    assert (plans[0].start, plans[0].end, plans[0].reason) == (0, 6, "target")
+    # البقية (6..14) تنتظر مقاطع أو إشارات أخرى
+    assert [s[1] for s in clips.segments] == [6, 8, 10, 12]
+
+
+def test_waits_for_analysis_and_flushes_on_final(tmp_path):
+    clips = planner()
+    clips.add(segments(3))
+    log = analysis(tmp_path, 4, cuts=(6.0,))
+    # التحليل لم يصل بعد إلى ما بعد الحد
+    assert clips.plan(log) == []
+    plans = clips.plan(log, final=True)
+    assert [(p.start, p.end, p.reason) for p in plans] == [(0, 6, "final")]
+    assert clips.take_all() == []
+
+
+def test_static_silent_clip_is_marked(tmp_path):
+    clips = planner()
+    clips.add(segments(4))
+    plans = clips.plan(analysis(tmp_path, 12, score=0.1, silences=[(0.0, None)]), final=True)
+    assert plans[0].static
+
+
+def test_reads_only_complete_lines(tmp_path):
+    scene_file = tmp_path / "scenes.txt"
+    scene_file.write_text("frame:0 pts:0 pts_time:1.5\nlavfi.scd.sco")
+    log = AnalysisLog(str(scene_file))
+    log.read()
+    assert log.scores == []
+    with open(scene_file, "a") as f:
+        f.write("re=7.5\nlavfi.scd.time=1.5\n")
+    log.read()
+    assert (log.score_times, log.scores, log.cuts) == ([1.5], [7.5], [1.5])
+    assert log.scene_cut_near(2.0, 1.0) and not log.scene_cut_near(3.0, 1.0)
+    log.forget(2.0)
+    assert log.scores == [] and log.cuts == []
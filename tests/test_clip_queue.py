@@ -0,0 +1,67 @@
+# test_clip_queue.py - قائمة المقاطع بحد قابل للتغيير
+import asyncio
+
+import pytest
+
+from python_src.clip_queue import ResizableQueue
+
+
+def test_fifo_and_get_nowait():
+    async def scenario():
+        queue = ResizableQueue(3)
+        for item in (1, 2, 3):
+            await queue.put(item)
+        assert queue.full() and queue.qsize() == 3
+        assert await queue.get() == 1
+        assert queue.get_nowait() == 2
+        assert queue.get_nowait() == 3
+        assert queue.empty()
+        with pytest.raises(asyncio.QueueEmpty):
+            queue.get_nowait()
+
+    asyncio.run(scenario())
+
+
+def test_resize_wakes_blocked_putter():
+    async def scenario():
+        queue = ResizableQueue(1)
+        await queue.put("a")
+        putter = asyncio.create_task(queue.put("b"))
+        await asyncio.sleep(0.01)
+        assert not putter.done()
+        queue.resize(2)
+        await asyncio.wait_for(putter, 1)
+        assert queue.qsize() == 2
+
+    asyncio.run(scenario())
+
+
+def test_shrink_blocks_until_drained():
+    async def scenario():
+        queue = ResizableQueue(3)
+        for item in range(3):
+            await queue.put(item)
+        queue.resize(1)
+        putter = asyncio.create_task(queue.put(3))
+        await queue.get()
+        await asyncio.sleep(0.01)
+        assert not putter.done()
+        await queue.get()
+        await queue.get()
+        await asyncio.wait_for(putter, 1)
+        assert queue.get_nowait() == 3
+
+    asyncio.run(scenario())
+
+
+def test_get_waits_for_put_and_cancelled_getter_passes_wakeup():
+    async def scenario():
+        queue = ResizableQueue(2)
+        first = asyncio.create_task(queue.get())
+        second = asyncio.create_task(queue.get())
+        await asyncio.sleep(0.01)
+        await queue.put("x")
+        first.cancel()
+        assert await asyncio.wait_for(second, 1) == "x"
+
+    asyncio.run(scenario())
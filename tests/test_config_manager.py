@@ -0,0 +1,95 @@
+# test_config_manager.py - التحقق من القيم واللقطات والحفظ وإعادة التحميل
+import asyncio
+import json
+import os
+
+import pytest
+
+from python_src.config_manager import DEFAULT_CONFIG, ConfigManager, validate
+
+
+@pytest.mark.parametrize("key, value", [
+    ("CLIP_SECONDS", 0),
+    ("CLIP_SECONDS", "12"),
+    ("BUFFER_SIZE", 2.5),
+    ("BUFFER_SIZE", True),
+    ("LOW_LATENCY", 1),
+    ("ENCODER_PROFILE", "ultra"),
+    ("RENDITIONS", ["480p", "4k"]),
+    ("RENDITIONS", "480p"),
+    ("LOG_LEVEL", "TRACE"),
+])
+def test_invalid_values(key, value):
+    assert validate(key, value)
+
+
+@pytest.mark.parametrize("key, value", [
+    ("CLIP_SECONDS", 6.5),
+    ("BUFFER_SIZE", 3),
+    ("LOW_LATENCY", True),
+    ("RENDITIONS", ["480p", "audio"]),
+    ("CHANNEL_ID", -1001),
+    ("SOME_UNKNOWN_KEY", object()),
+])
+def test_valid_values(key, value):
+    assert validate(key, value) is None
+
+
+def test_set_validates_and_persists(tmp_path):
+    path = tmp_path / "config.json"
+    config = ConfigManager(str(path))
+    with pytest.raises(ValueError):
+        config.set("BUFFER_SIZE", 0)
+    assert config.get("BUFFER_SIZE") == DEFAULT_CONFIG["BUFFER_SIZE"]
+
+    snapshot = config.snapshot()
+    config.set("BUFFER_SIZE", 7)
+    config.set("CHANNEL_ID", "-1009", persist=False)
+    # اللقطة القديمة لا تتغير
+    assert snapshot["BUFFER_SIZE"] == DEFAULT_CONFIG["BUFFER_SIZE"]
+    assert config.get("BUFFER_SIZE") == 7
+    assert json.loads(path.read_text()) == {"BUFFER_SIZE": 7}
+    assert not os.path.exists(f"{path}.tmp")
+
+
+def test_reload_skips_invalid_values_and_notifies(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"CLIP_SECONDS": 10}))
+    config = ConfigManager(str(path))
+    changes = []
+    config.on_change(changes.append)
+
+    path.write_text(json.dumps({"CLIP_SECONDS": 8, "BUFFER_SIZE": -1}))
+    assert config.reload() == {"CLIP_SECONDS"}
+    assert config.get("BUFFER_SIZE") == DEFAULT_CONFIG["BUFFER_SIZE"]
+    assert changes == [{"CLIP_SECONDS"}]
+
+    # ملف تالف أثناء التحرير: تبقى الإعدادات الحالية
+    path.write_text("{")
+    assert config.reload() == set()
+    assert config.get("CLIP_SECONDS") == 8
+
+
+def test_set_keeps_corrupt_file(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text('{"CLIP_SECONDS": 10,')
+    config = ConfigManager(str(path))
+
+    # القيمة تسري للتشغيل الحالي، والملف التالف لا يُستبدل بمفتاح واحد
+    config.set("BUFFER_SIZE", 5)
+    assert config.get("BUFFER_SIZE") == 5
+    assert path.read_text() == '{"CLIP_SECONDS": 10,'
+
+
+def test_set_saves_off_the_event_loop(tmp_path):
+    path = tmp_path / "config.json"
+    config = ConfigManager(str(path))
+
+    async def scenario():
+        config.set("BUFFER_SIZE", 4)
+        config.set("BUFFER_SIZE", 6)
+        assert config.get("BUFFER_SIZE") == 6
+        await asyncio.gather(*config._saves)
+
+    asyncio.run(scenario())
+    assert json.loads(path.read_text()) == {"BUFFER_SIZE": 6}
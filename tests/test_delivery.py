@@ -0,0 +1,104 @@
+# test_delivery.py - سجل التسليم وطابور إعادة المحاولة ومراجع المقاطع
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("telegram")
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+from python_src.delivery import ClipHandle, DeliveryLedger, RetryEntry, RetryQueue, is_transient
+
+
+def handle(released=None):
+    return ClipHandle("main#1", {"hd": "clip.mp4"}, lambda h: released.append(h.clip_id) if released is not None else None)
+
+
+def test_transient_errors():
+    assert is_transient(TimedOut())
+    assert is_transient(NetworkError("reset"))
+    assert is_transient(RetryAfter(5))
+    assert not is_transient(BadRequest("bad"))
+    assert not is_transient(Forbidden("blocked"))
+    assert not is_transient(ValueError())
+
+
+def test_handle_released_after_last_reference():
+    released = []
+    clip = handle(released)
+    clip.acquire()
+    clip.release()
+    assert released == []
+    clip.release()
+    assert released == ["main#1"]
+
+
+def test_retry_queue_limits():
+    released = []
+    queue = RetryQueue(max_size=1, base_delay=1.0, max_attempts=3)
+    clip = handle(released)
+    far = time.monotonic() + 60
+    assert queue.push(RetryEntry(clip, "hd", "-1001", far))
+    # الطابور ممتلئ
+    assert not queue.push(RetryEntry(clip, "hd", "-1002", far))
+    assert len(queue) == 1
+
+    queue = RetryQueue(base_delay=1.0, max_attempts=3)
+    exhausted = RetryEntry(clip, "hd", "-1001", far)
+    exhausted.attempts = 3
+    assert not queue.push(exhausted)
+    # المحاولة التالية بعد المهلة: المقطع فقد قيمته
+    assert not queue.push(RetryEntry(clip, "hd", "-1001", time.monotonic() + 0.5))
+
+    # كل جدولة تحجز مرجعاً للمقطع
+    clip.release()
+    assert released == []
+
+
+def test_retry_queue_orders_by_due_time():
+    async def scenario():
+        queue = RetryQueue(base_delay=0.01)
+        clip = handle()
+        late = RetryEntry(clip, "hd", "late", time.monotonic() + 10)
+        late.attempts = 3
+        early = RetryEntry(clip, "hd", "early", time.monotonic() + 10)
+        queue.push(late)
+        queue.push(early)
+        first = await asyncio.wait_for(queue.next_due(), 1)
+        second = await asyncio.wait_for(queue.next_due(), 1)
+        return [first.chat_id, second.chat_id]
+
+    assert asyncio.run(scenario()) == ["early", "late"]
+
+
+def test_retry_queue_wakes_on_push_and_clears():
+    async def scenario():
+        queue = RetryQueue(base_delay=0.01)
+        waiter = asyncio.create_task(queue.next_due())
+        await asyncio.sleep(0.01)
+        queue.push(RetryEntry(handle(), "hd", "-1001", time.monotonic() + 10))
+        entry = await asyncio.wait_for(waiter, 1)
+        queue.push(RetryEntry(handle(), "hd", "-1002", time.monotonic() + 10))
+        return entry.chat_id, [e.chat_id for e in queue.clear()], len(queue)
+
+    assert asyncio.run(scenario()) == ("-1001", ["-1002"], 0)
+
+
+def test_ledger_outcomes_and_rates():
+    ledger = DeliveryLedger(max_clips=2)
+    assert ledger.success_rate() is None
+    assert ledger.delivered("a", "-1001", 0.5)
+    assert not ledger.delivered("a", "42", 0.7)
+    ledger.retrying("b", "-1001", TimedOut(), 1)
+    ledger.failed("b", "-1001", TimedOut(), 2, "expired")
+    ledger.clip_finished("a")
+    ledger.clip_finished("b")
+    assert ledger.outcome("b")["-1001"] == ("expired", None, 2, "TimedOut")
+    assert ledger.clips_delivered == 1 and ledger.clips_undelivered == 1
+    assert ledger.counts == {"delivered": 2, "failed": 0, "expired": 1, "retried": 1}
+    assert ledger.success_rate() == pytest.approx(2 / 3)
+    # الأقدم يخرج من السجل
+    ledger.failed("c", "-1001", Forbidden("blocked"))
+    assert list(ledger.clips) == ["b", "c"]
+    assert "p50" in ledger.describe()
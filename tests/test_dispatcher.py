@@ -0,0 +1,74 @@
+# test_dispatcher.py - حدود الإرسال: دلو الرموز و SendDispatcher
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("telegram")
+
+from telegram.error import RetryAfter
+
+from python_src.dispatcher import SendDispatcher, TokenBucket
+
+
+def test_batch_interval_follows_slowest_chat():
+    dispatcher = SendDispatcher(global_rate=30, per_chat_rate=1.0)
+    assert dispatcher.batch_interval([]) == 0.0
+    assert dispatcher.batch_interval(["123"]) == pytest.approx(1.0)
+    # القنوات والمجموعات: 20 رسالة في الدقيقة
+    assert dispatcher.batch_interval(["123", "-100200"]) == pytest.approx(3.0)
+
+
+def test_batch_interval_limited_by_global_rate():
+    dispatcher = SendDispatcher(global_rate=30, per_chat_rate=1.0)
+    chats = [str(user_id) for user_id in range(150)]
+    assert dispatcher.batch_interval(chats) == pytest.approx(5.0)
+
+
+def test_token_bucket_spaces_acquires():
+    async def scenario():
+        bucket = TokenBucket(rate=20, capacity=1)
+        started = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    # الرمز الأول فوري ثم رمز كل 50ms
+    assert 0.09 <= asyncio.run(scenario()) < 0.3
+
+
+def test_token_bucket_pause():
+    async def scenario():
+        bucket = TokenBucket(rate=1000, capacity=5)
+        bucket.pause(0.1)
+        started = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.09
+
+
+def test_send_retries_after_retry_after():
+    calls = []
+
+    async def send_fn(chat_id):
+        calls.append(chat_id)
+        if len(calls) == 1:
+            raise RetryAfter(0.05)
+        return "ok"
+
+    dispatcher = SendDispatcher(per_chat_rate=1000)
+    assert asyncio.run(dispatcher.send("42", send_fn)) == "ok"
+    assert calls == ["42", "42"]
+
+
+def test_dispatch_collects_results_and_errors():
+    async def send_fn(chat_id):
+        if chat_id == "7":
+            raise ValueError("boom")
+        return chat_id
+
+    batch = asyncio.run(SendDispatcher(per_chat_rate=1000).dispatch(["5", "6", "7"], send_fn))
+    assert (batch.sent, batch.failed, batch.total) == (2, 1, 3)
+    assert batch.errors == {"ValueError": 1}
+    assert batch.results["5"] == "5"
@@ -0,0 +1,105 @@
+# test_fingerprint.py - كبت المقاطع المتجمدة المتكررة دون المحتوى المتحرك
+import asyncio
+
+import numpy as np
+
+from python_src.ffmpeg_runner import ProbeResult
+from python_src.fingerprint import FRAME_SIZE, ClipFingerprint, FingerprintCache
+
+
+def frames(count, square_from=None, level=128):
+    """إطارات رمادية بتخطيط ثابت (نصف أيسر فاتح) ومربع صغير يتحرك من square_from"""
+    video = np.zeros((count, FRAME_SIZE, FRAME_SIZE), dtype=np.uint8)
+    video[:, :, :FRAME_SIZE // 2] = level
+    if square_from is not None:
+        for i in range(count):
+            x = (square_from + i) % (FRAME_SIZE - 4)
+            video[i, 10:14, x:x + 4] = 255
+    return video.tobytes()
+
+
+def tone(seconds=1, amplitude=8000):
+    samples = (amplitude * np.sin(np.arange(8000 * seconds) * 0.3)).astype("<i2")
+    return samples.tobytes()
+
+
+def test_moving_clip_with_fixed_layout_is_not_suppressed():
+    cache = FingerprintCache()
+    clips = [ClipFingerprint.from_raw(frames(12, square_from=start), tone()) for start in (0, 3, 6, 9)]
+    assert not clips[0].frozen
+    assert [cache.check(clip) for clip in clips] == [None] * 4
+    assert cache.suppressed == 0
+
+
+def test_repeated_frozen_clip_is_suppressed():
+    cache = FingerprintCache()
+    first = ClipFingerprint.from_raw(frames(12), tone())
+    assert first.frozen
+    assert cache.check(first) is None
+    assert cache.check(ClipFingerprint.from_raw(frames(12), tone())) == "frozen"
+    # صورة ثابتة مختلفة تُرسل
+    assert cache.check(ClipFingerprint.from_raw(frames(12, level=0))) is None
+
+
+def test_frozen_audio_change_is_sent():
+    cache = FingerprintCache()
+    cache.check(ClipFingerprint.from_raw(frames(12), tone(amplitude=8000)))
+    assert cache.check(ClipFingerprint.from_raw(frames(12), tone(amplitude=500))) is None
+
+
+def test_one_clip_sent_after_max_suppressed():
+    cache = FingerprintCache(max_suppressed=2)
+    results = [cache.check(ClipFingerprint.from_raw(frames(12), tone())) for _ in range(5)]
+    assert results == [None, "frozen", "frozen", None, "frozen"]
+
+
+def test_from_raw_without_frames():
+    assert ClipFingerprint.from_raw(b"") is None
+    fingerprint = ClipFingerprint.from_raw(frames(1))
+    assert fingerprint.motion is None and fingerprint.energy is None
+    assert fingerprint.bits.shape == (4, FRAME_SIZE * FRAME_SIZE)
+
+
+def test_single_keyframe_clip_is_never_suppressed():
+    cache = FingerprintCache()
+    # إطار مفتاحي واحد لكل مقطع قصير: الحركة غير معروفة وإن تطابق الـ hash
+    results = [cache.check(ClipFingerprint.from_raw(frames(1), tone())) for _ in range(3)]
+    assert results == [None] * 3
+
+
+def still(mask):
+    """صورة ثابتة بتخطيط مختلف لكل قناع (الـ hash لا يتأثر بالسطوع وحده)"""
+    video = np.zeros((4, FRAME_SIZE, FRAME_SIZE), dtype=np.uint8)
+    video[(slice(None),) + mask] = 200
+    return ClipFingerprint.from_raw(video.tobytes())
+
+
+def test_lru_keeps_recent_entries_only():
+    cache = FingerprintCache(size=2)
+    left, top, corner = np.s_[:, :8], np.s_[:8, :], np.s_[:8, :8]
+    for mask in (left, top, corner):
+        assert cache.check(still(mask)) is None
+    # الثالثة أخرجت الأولى من الذاكرة فلا تُكبت عند عودتها، والأحدث تُكبت
+    assert cache.check(still(left)) is None
+    assert cache.check(still(corner)) == "frozen"
+
+
+def test_failed_source_probe_is_cached_per_recorder_run(controller):
+    calls = []
+
+    async def probe(target, timeout=15):
+        calls.append(target)
+        return ProbeResult(success=False, error="timeout")
+
+    controller.ffmpeg.probe = probe
+
+    async def scenario():
+        # بصمات عدة مقاطع في نفس التشغيل: فحص واحد فاشل
+        assert await controller._probe_source() is None
+        assert await controller._probe_source() is None
+        assert len(calls) == 1
+        controller.recorder_runs += 1
+        assert await controller._probe_source() is None
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,88 @@
+# test_fmp4.py - تقسيم fMP4 من الأنبوب: إخراج المقطع فور اكتمال مدته
+import struct
+
+from python_src.fmp4 import FragmentSplitter, read_fragment_duration, read_fragment_time
+
+TIMESCALE = 1000
+TRACK = 1
+
+
+def box(kind, payload=b""):
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def full_box(kind, payload, flags=0, version=0):
+    return box(kind, struct.pack(">I", (version << 24) | flags) + payload)
+
+
+def init_segment(default_duration=0):
+    trak = box(b"trak", (
+        full_box(b"tkhd", struct.pack(">IIII", 0, 0, TRACK, 0))
+        + box(b"mdia", (
+            full_box(b"mdhd", struct.pack(">III", 0, 0, TIMESCALE))
+            + full_box(b"hdlr", struct.pack(">I4s", 0, b"vide"))
+        ))
+    ))
+    mvex = box(b"mvex", full_box(b"trex", struct.pack(">IIIII", TRACK, 1, default_duration, 0, 0)))
+    return box(b"ftyp", b"isom") + box(b"moov", trak + mvex)
+
+
+def fragment(start, durations=None, count=0):
+    """moof+mdat بـ tfdt=start؛ durations لكل عينة في trun، وإلا count عينة بالمدة الافتراضية"""
+    if durations is not None:
+        trun = full_box(b"trun", struct.pack(">I", len(durations)) + b"".join(
+            struct.pack(">I", d) for d in durations), flags=0x100)
+    else:
+        trun = full_box(b"trun", struct.pack(">I", count))
+    traf = box(b"traf", (
+        full_box(b"tfhd", struct.pack(">I", TRACK))
+        + full_box(b"tfdt", struct.pack(">Q", start), version=1)
+        + trun
+    ))
+    return box(b"moof", full_box(b"mfhd", struct.pack(">I", 1)) + traf) + box(b"mdat", b"\0" * 32)
+
+
+def gop(start):
+    """جزء بطول 2ث (50 إطاراً × 40ms)"""
+    return fragment(start, durations=[40] * 50)
+
+
+def test_fragment_time_and_duration():
+    moof = gop(4000)[:-40]
+    assert read_fragment_time(moof, TRACK) == 4000
+    assert read_fragment_duration(moof, TRACK) == 2000
+    assert read_fragment_duration(fragment(0, count=25)[:-40], TRACK, default_duration=40) == 1000
+    assert read_fragment_time(moof, 2) is None
+
+
+def test_clip_emitted_after_last_mdat_of_its_span():
+    splitter = FragmentSplitter(6, "main_clip_1")
+    assert splitter.feed(init_segment()) == []
+    assert splitter.feed(gop(0)) == []
+    assert splitter.feed(gop(2000)) == []
+    # الجزء الثالث يكمل 6ث: المقطع يخرج مع mdat دون انتظار moof الجزء الرابع
+    clips = splitter.feed(gop(4000))
+    assert len(clips) == 1
+    clip = clips[0]
+    assert (clip.name, clip.start, clip.end) == ("main_clip_1_00001.mp4", 0.0, 6.0)
+    assert clip.data.startswith(init_segment())
+    assert clip.size == len(init_segment()) + 3 * len(gop(0))
+
+
+def test_partial_boxes_across_reads():
+    splitter = FragmentSplitter(4, "clip")
+    data = init_segment() + gop(0) + gop(2000) + gop(4000)
+    clips = []
+    for offset in range(0, len(data), 7):
+        clips += splitter.feed(data[offset:offset + 7])
+    assert [(c.start, c.end) for c in clips] == [(0.0, 4.0)]
+    tail = splitter.flush()
+    assert (tail.name, tail.start, tail.end) == ("clip_00002.mp4", 4.0, 6.0)
+    assert splitter.flush() is None
+
+
+def test_default_duration_from_trex():
+    splitter = FragmentSplitter(2, "clip")
+    splitter.feed(init_segment(default_duration=40))
+    clips = splitter.feed(fragment(0, count=25) + fragment(1000, count=25))
+    assert [(c.start, c.end) for c in clips] == [(0.0, 2.0)]
@@ -0,0 +1,24 @@
+# test_logging_setup.py - الاستثناء يصل إلى سطر JSON كحقل منفصل عبر الطابور
+import json
+import logging
+
+from python_src.logging_setup import setup_logging
+
+
+def test_exception_reaches_json_field(tmp_path):
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    listener = setup_logging(log_dir=str(tmp_path), console=False)
+    try:
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("test").error("❌ فشل %s", "المقطع", exc_info=True)
+    finally:
+        listener.stop()
+        root.handlers[:] = handlers
+        root.setLevel(level)
+
+    entry = json.loads((tmp_path / "bot.jsonl").read_text(encoding="utf-8").splitlines()[-1])
+    assert entry["msg"] == "❌ فشل المقطع"
+    assert "ValueError: boom" in entry["exc"]
@@ -0,0 +1,42 @@
+# test_low_latency.py - مدة المقطع لا تقل عن فترة الإرسال، والمقاطع المتأخرة تُترك للأحدث
+import asyncio
+import os
+import time
+
+
+def test_clip_duration_not_below_send_interval(controller):
+    controller.config.set("LOW_LATENCY", True, persist=False)
+    controller.config.set("LOW_LATENCY_CLIP_SECONDS", 2, persist=False)
+    # قناة: رسالة كل 3 ثوان
+    assert controller._clip_duration() == 3.0
+    controller.config.set("LOW_LATENCY_CLIP_SECONDS", 5, persist=False)
+    assert controller._clip_duration() == 5.0
+
+
+def test_consumer_skips_stale_clip(controller, tmp_path):
+    controller.config.set("LOW_LATENCY", True, persist=False)
+    consumed = []
+
+    async def consume_clip(task, start, end, counter, captured_at=None):
+        consumed.append(counter)
+
+    controller._consume_clip = consume_clip
+    stale = tmp_path / "stale.mp4"
+    stale.write_bytes(b"\0" * 16)
+
+    async def scenario():
+        ready = asyncio.get_running_loop().create_future()
+        ready.set_result({"hd": str(stale)})
+        fresh = asyncio.get_running_loop().create_future()
+        fresh.set_result({"hd": str(tmp_path / "fresh.mp4")})
+        controller.broadcast_running = True
+        await controller.clip_queue.put((ready, 0.0, 3.0, 1, time.time() - 10))
+        await controller.clip_queue.put((fresh, 3.0, 6.0, 2, time.time()))
+        consumer = asyncio.create_task(controller._smart_consumer())
+        await asyncio.sleep(0.05)
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert consumed == [2]
+    assert not os.path.exists(stale)
@@ -0,0 +1,55 @@
+# test_memory_clips.py - مقاطع الذاكرة: ضغط عكسي على أنبوب المسجل وسقف بايتات
+import asyncio
+
+from python_src.clip_queue import ResizableQueue
+from python_src.clip_spool import ClipSpool
+from python_src.fmp4 import FragmentSplitter, MemoryClip
+from test_fmp4 import gop, init_segment
+
+
+class FakePipe:
+    def __init__(self, data):
+        self.stream = asyncio.StreamReader()
+        self.stream.feed_data(data)
+        self.stream.feed_eof()
+
+    async def reader(self):
+        return self.stream
+
+
+def test_memory_cap_hold_and_release(tmp_path):
+    spool = ClipSpool(str(tmp_path / "spool"), max_memory_bytes=100)
+    first = MemoryClip("a.mp4", b"\0" * 60, 0, 2)
+    second = MemoryClip("b.mp4", b"\0" * 60, 2, 4)
+    assert spool.hold(first)
+    assert not spool.hold(second)
+    assert spool.memory_bytes == 60
+    spool.release(first)
+    spool.release(first)
+    assert spool.memory_bytes == 0
+    assert spool.hold(second)
+
+
+def test_reader_waits_for_room_in_ready(controller):
+    from python_src.streaming import RecorderRun
+
+    async def scenario():
+        run = RecorderRun(controller.spool.next_run_id(), controller.spool, controller.name)
+        run.pipe = FakePipe(init_segment() + b"".join(gop(i * 2000) for i in range(4)))
+        run.splitter = FragmentSplitter(2, "main_clip_1")
+        run.ready = ResizableQueue(1)
+        queued = []
+
+        async def queue_from_run(run, clip, seg_start, seg_end, renditions=None):
+            queued.append((seg_start, seg_end))
+
+        controller._queue_from_run = queue_from_run
+        run.reader = asyncio.create_task(controller._read_fragments(run))
+        await asyncio.sleep(0.05)
+        # مقطع واحد ينتظر القائمة والقارئ متوقف عن قراءة الباقي
+        assert run.ready.qsize() == 1 and not run.reader.done()
+        await controller._collect_memory_clips(run, final=True)
+        assert run.reader.done()
+        return queued
+
+    assert asyncio.run(scenario()) == [(0.0, 2.0), (2.0, 4.0), (4.0, 6.0), (6.0, 8.0)]
@@ -0,0 +1,54 @@
+# test_recorder_start.py - فشل تشغيل المسجل لا يترك مكان الترميز محجوزاً
+import asyncio
+
+import pytest
+
+pytest.importorskip("telegram")
+
+from python_src.sessions import EncodeBudget
+from python_src.streaming import BroadcastController
+
+
+def _failing_start(controller, error):
+    async def probe_source():
+        return None
+
+    async def use_stream_copy():
+        return False
+
+    async def watermark_image():
+        raise error
+
+    controller.config.set("RENDITIONS", [], persist=False)
+    controller._probe_source = probe_source
+    controller._use_stream_copy = use_stream_copy
+    controller._watermark_image = watermark_image
+
+
+def test_failed_start_releases_the_encode_slot(controller):
+    controller.encode_budget = EncodeBudget(max_encoders=1, cpu_count=2)
+    _failing_start(controller, OSError("font"))
+
+    async def scenario():
+        with pytest.raises(OSError):
+            await BroadcastController._start_recorder(controller, 2.0)
+        assert controller.encode_budget.active == 0
+        # المكان متاح للتشغيل التالي
+        await asyncio.wait_for(controller.encode_budget.acquire(), 1)
+
+    asyncio.run(scenario())
+
+
+def test_failed_prewarm_returns_the_inherited_slot(controller):
+    budget = controller.encode_budget = EncodeBudget(max_encoders=1, cpu_count=2)
+    _failing_start(controller, OSError("font"))
+
+    async def scenario():
+        previous = await controller._start_recorder(2.0)
+        await budget.acquire()
+        previous.encode_slot = True
+        with pytest.raises(OSError):
+            await BroadcastController._start_recorder(controller, 2.0, inherit=previous)
+        assert previous.encode_slot and budget.active == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,54 @@
+# test_renditions.py - مستوى الصوت فقط يُستخرج من المقطع الرئيسي فيطابق حدوده
+import asyncio
+
+import pytest
+
+from python_src.video_processor import build_audio_command, build_segment_command
+
+
+def test_recorder_has_no_audio_segment_muxer():
+    command = build_segment_command("src", "main_%05d.mp4", "main.csv", 6, renditions=[("480p", "r_%05d.mp4", "r.csv")])
+    assert command.count("segment") == 2
+    with pytest.raises(ValueError):
+        build_segment_command("src", "main_%05d.mp4", "main.csv", 6, renditions=[("audio", "a_%05d.m4a", "a.csv")])
+
+
+def test_audio_command_reads_finished_clip():
+    command = build_audio_command("main_clip_1_00001.mp4", "main_clip_1_00001_audio.m4a", 64)
+    assert command[command.index("-i") + 1] == "main_clip_1_00001.mp4"
+    assert command[-1] == "main_clip_1_00001_audio.m4a"
+    assert "-vn" in command and "64k" in command
+
+
+class FakeResult:
+    def __init__(self, success):
+        self.success = success
+        self.stderr = "" if success else "no audio"
+
+    def diagnostics(self):
+        return {}
+
+
+def test_extract_audio_from_main_clip(controller, tmp_path):
+    clip = tmp_path / "main_clip_1_00001.mp4"
+    clip.write_bytes(b"\0" * 8192)
+    commands = []
+
+    async def run(args, on_progress=None, timeout=None):
+        commands.append(args)
+        with open(args[-1], "wb") as f:
+            f.write(b"\0" * 2048)
+        return FakeResult(True)
+
+    controller.ffmpeg.run = run
+    controller.audio_tiers = ["audio"]
+
+    async def scenario():
+        controller.prepare_slots = asyncio.Semaphore(1)
+        clips = {"hd": str(clip)}
+        await controller._extract_audio(clips)
+        return clips
+
+    clips = asyncio.run(scenario())
+    assert clips["audio"] == str(tmp_path / "main_clip_1_00001_audio.m4a")
+    assert commands[0][commands[0].index("-i") + 1] == str(clip)
@@ -0,0 +1,113 @@
+# test_replay.py - حلقة الإعادة: الحدود والبحث بـ bisect والتثبيت أثناء الاستخراج
+import os
+
+from python_src.replay import ReplayBuffer
+
+
+def filled(max_seconds=100, max_bytes=10_000):
+    evicted = []
+    return ReplayBuffer(max_seconds, max_bytes, on_evict=evicted.append), evicted
+
+
+def clip(tmp_path, index, size=100):
+    path = tmp_path / f"main_clip_1_{index:05d}.mp4"
+    path.write_bytes(b"\0" * size)
+    return str(path)
+
+
+def add_clips(buffer, tmp_path, count, first=0, length=10):
+    """مقاطع متتالية بطول length من الموضع first * length"""
+    for i in range(first, first + count):
+        buffer.add(i * length, (i + 1) * length, clip(tmp_path, i))
+
+
+def names(selection):
+    return [start for start, _, _ in selection]
+
+
+def test_select_covers_requested_seconds(tmp_path):
+    buffer, _ = filled()
+    add_clips(buffer, tmp_path, 6)
+    # آخر 25ث من 60: من المقطع الذي يحوي 35
+    assert names(buffer.select(25)) == [30, 40, 50]
+    assert names(buffer.select(30)) == [30, 40, 50]
+    assert names(buffer.select(1000)) == [0, 10, 20, 30, 40, 50]
+    assert names(buffer.select(25, max_bytes=200)) == [40, 50]
+    assert ReplayBuffer().select(10) == []
+
+
+def test_duration_and_byte_limits_evict_oldest(tmp_path):
+    buffer, evicted = filled(max_seconds=30, max_bytes=10_000)
+    add_clips(buffer, tmp_path, 5)
+    assert len(buffer) == 3 and buffer.duration() == 30
+    assert evicted == [clip(tmp_path, 0), clip(tmp_path, 1)]
+
+    buffer.resize(30, 150)
+    assert len(buffer) == 1 and buffer.bytes == 100
+    assert buffer.starts == [40]
+
+
+def test_pinned_clips_are_evicted_after_unpin(tmp_path):
+    buffer, evicted = filled(max_seconds=20)
+    add_clips(buffer, tmp_path, 2)
+    buffer.pin()
+    add_clips(buffer, tmp_path, 2, first=2)
+    # خرجت من الحلقة لكن ملفاتها تبقى حتى ينتهي الاستخراج الجاري
+    assert len(buffer) == 2 and evicted == []
+    buffer.unpin()
+    assert evicted == [clip(tmp_path, 0), clip(tmp_path, 1)]
+
+
+def test_new_broadcast_run_clears_buffer(tmp_path):
+    buffer, evicted = filled()
+    add_clips(buffer, tmp_path, 3)
+    assert buffer.add(0, 10, clip(tmp_path, 9))
+    assert len(buffer) == 1 and len(evicted) == 3
+
+
+def test_disabled_buffer_keeps_nothing(tmp_path):
+    buffer = ReplayBuffer(max_seconds=0)
+    assert not buffer.enabled
+    assert not buffer.add(0, 10, str(tmp_path / "x.mp4"))
+    assert buffer.describe() == "معطلة"
+
+
+def test_pinned_bytes_stay_counted_until_deleted(tmp_path):
+    buffer, evicted = filled(max_seconds=20)
+    add_clips(buffer, tmp_path, 2)
+    buffer.pin()
+    # ضغط المجلد أثناء الدمج لا يفرغ الحلقة: لا شيء يُحذف قبل unpin
+    assert not buffer.evict_oldest()
+    add_clips(buffer, tmp_path, 2, first=2)
+    assert len(buffer) == 2 and buffer.bytes == 400
+    buffer.unpin()
+    assert buffer.bytes == 200 and len(evicted) == 2
+    assert buffer.evict_oldest() and buffer.bytes == 100
+
+
+def test_encoder_change_starts_a_new_buffer(tmp_path):
+    buffer, evicted = filled()
+    for i in range(2):
+        buffer.add(i * 10, (i + 1) * 10, clip(tmp_path, i), ("x264", "veryfast"))
+    # preset جديد من المتحكم التكيفي: المقاطع السابقة لا تُدمج معه بالنسخ المباشر
+    buffer.add(20, 30, clip(tmp_path, 2), ("x264", "faster"))
+    assert len(buffer) == 1 and len(evicted) == 2
+    assert names(buffer.select(1000)) == [20]
+
+
+def test_only_recorder_clips_enter_the_replay(controller):
+    from python_src.delivery import ClipHandle
+    from python_src.video_processor import DEFAULT_TIER
+
+    recorded = controller.spool.path("main_clip_1_00001.mp4")
+    fitted = controller.spool.path("main_clip_1_00002_fit.mp4")
+    for path in (recorded, fitted):
+        with open(path, "wb") as f:
+            f.write(b"\0" * 8192)
+    controller.clip_streams[recorded] = ("x264", "veryfast")
+
+    controller._release_clip(ClipHandle("a", {DEFAULT_TIER: recorded}, None, 0, 10))
+    # مقطع أعيد ضغطه لا مفتاح ترميز له: يُحذف بدل دمجه مع مقاطع المسجل
+    controller._release_clip(ClipHandle("b", {DEFAULT_TIER: fitted}, None, 10, 20))
+    assert len(controller.replay) == 1 and os.path.exists(recorded)
+    assert not os.path.exists(fitted)
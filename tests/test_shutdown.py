@@ -0,0 +1,19 @@
+# test_shutdown.py - إيقاف البث يغلق المسجل وينظف ملفاته حتى مع الإلغاء المزدوج
+import asyncio
+import os
+
+
+def test_stop_broadcast_closes_recorder(controller):
+    async def scenario():
+        await controller.start_broadcast()
+        await asyncio.sleep(0.3)
+        await controller.stop_broadcast()
+
+    asyncio.run(scenario())
+
+    assert len(controller.started) == 1
+    run = controller.started[0]
+    assert run.job.closed
+    assert not controller.producer_running
+    assert not os.path.exists(run.list_file)
+    assert not os.path.exists(run.output_pattern % 1)
@@ -0,0 +1,30 @@
+# test_subscribers.py - كتابة تغييرات المشتركين دفعات من خيط مستقل
+import asyncio
+
+import pytest
+
+pytest.importorskip("telegram")
+
+from python_src.subscribers import SubscriberStore
+
+
+def test_flusher_writes_rows_taken_on_the_loop(tmp_path):
+    path = str(tmp_path / "subscribers.db")
+
+    async def scenario():
+        store = SubscriberStore(path, flush_interval=0.01)
+        flusher = asyncio.create_task(store.run_flusher())
+        for user_id in range(500):
+            store.add(user_id)
+            if user_id % 50 == 0:
+                await asyncio.sleep(0.01)
+        store.set_tier("7", "480p")
+        # الإلغاء يكتب ما بقي بعد انتهاء الدفعة الجارية
+        flusher.cancel()
+        await asyncio.gather(flusher, return_exceptions=True)
+        assert not store._dirty
+
+    asyncio.run(scenario())
+    reopened = SubscriberStore(path)
+    assert len(reopened) == 500
+    assert reopened.tier("7") == "480p"
@@ -0,0 +1,13 @@
+# test_utils.py - حذف ملفات المقاطع المتبقية
+from python_src import utils
+
+
+def test_cleanup_temp_files_matches_spool_layout(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    spool = tmp_path / "temp_clips"
+    spool.mkdir()
+    for name in ("main_clip_3_00001.mp4", "news_clip_4_00002_audio.m4a", "main_segments_3.csv", ".run_sequence"):
+        (spool / name).write_bytes(b"x")
+    assert utils.cleanup_temp_files() == 2
+    assert sorted(p.name for p in spool.iterdir()) == [".run_sequence", "main_segments_3.csv"]
+    assert utils.cleanup_temp_files(str(spool), "*_segments_*") == 1
@@ -0,0 +1,40 @@
+# test_watermark.py - أشرطة العلامة المائية في مجلد المقاطع وتهريب مساراتها
+import asyncio
+
+from python_src.clip_spool import ClipSpool
+from python_src.ffmpeg_runner import JobResult
+from python_src.video_processor import build_watermark_command, filter_value
+from python_src.watermark import WatermarkCache
+
+
+class FakeFFmpeg:
+    """يكتب ملف الشريط (آخر معامل) بدل تشغيل FFmpeg"""
+
+    async def run(self, args, timeout=None):
+        with open(args[-1], "wb") as f:
+            f.write(b"\x89PNG" + b"\0" * 2048)
+        return JobResult(success=True, returncode=0, elapsed=0.0)
+
+
+def test_command_escapes_paths():
+    text_file, fontfile = "C:/tmp/wm's.txt", "/fonts/a:b.ttf"
+    args = build_watermark_command(text_file, "out.png", 100, 50, fontfile=fontfile)
+    graph = args[args.index("-vf") + 1]
+    assert f"textfile={filter_value(text_file)}:" in graph
+    assert f":fontfile={filter_value(fontfile)}:" in graph
+    assert fontfile not in graph
+
+
+def test_strips_live_in_the_spool(tmp_path):
+    spool = ClipSpool(str(tmp_path / "spool"))
+    cache = WatermarkCache(FakeFFmpeg(), spool, max_entries=1)
+
+    first = asyncio.run(cache.render("one"))
+    assert first.startswith(spool.directory)
+    assert spool.usage() > 2048
+    asyncio.run(cache.render("two"))
+    # الأقدم يُحذف عند تجاوز max_entries
+    assert not (tmp_path / "spool" / first.rsplit("/", 1)[-1]).exists()
+
+    # تنظيف ما بعد الانهيار يشمل الأشرطة
+    assert ClipSpool(spool.directory).swept == 1
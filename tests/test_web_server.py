@@ -0,0 +1,21 @@
+# test_web_server.py - رمز /debug/profile الخاطئ يعطي 404 دائماً
+import asyncio
+
+import pytest
+
+web = pytest.importorskip("aiohttp.web")
+
+from python_src.web_server import handle_profile
+
+
+class FakeRequest:
+    def __init__(self, token=None, header=""):
+        self.app = {"config": {"DEBUG_TOKEN": "secret"}}
+        self.query = {"token": token} if token is not None else {}
+        self.headers = {"X-Debug-Token": header} if header else {}
+
+
+@pytest.mark.parametrize("token", ["wrong", "سر", "é" * 6, ""])
+def test_wrong_token_is_not_found(token):
+    with pytest.raises(web.HTTPNotFound):
+        asyncio.run(handle_profile(FakeRequest(token)))